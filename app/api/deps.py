@@ -1,12 +1,11 @@
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.db.session import open_db
 
 def get_db():
     """
     Dependency function to get a DB session.
+    Yields the in-memory reference snapshot, the shared read-only DuckDBReader or a new
+    SQLAlchemy session for the request (see `open_db`).
     """
-    db = SessionLocal()
-    try:
+    with open_db() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,8 +1,10 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import predictions
+from app.api.v1.endpoints import jobs, predictions
 
 api_router = APIRouter()
 
 # Include the router from the predictions endpoint
 # The prefix /predict will be added to the main API_V1_STR prefix
-api_router.include_router(predictions.router, prefix="/predict", tags=["predictions"])
\ No newline at end of file
+api_router.include_router(predictions.router, prefix="/predict", tags=["predictions"])
+# Asynchronous image analysis: submit a job, then poll (or long-poll) for its result
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
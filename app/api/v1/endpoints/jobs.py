@@ -0,0 +1,62 @@
+import asyncio
+import time
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.image_preprocess import ImageRejectedError, read_image_info
+from app.services.job_queue import FINISHED_STATUSES, STATUS_QUEUED, QueueFullError, get_job_queue
+from app.schemas.job import JobStatus, JobSubmitted
+from app.schemas.prediction import PredictionResponse
+from app.core.config import settings
+
+router = APIRouter()
+
+
+@router.post("", response_model=JobSubmitted, status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    """
+    Queues a label image for analysis by the job workers (see job_worker.py) and returns
+    immediately. Poll the returned status URL for the result.
+    """
+    image_bytes = await file.read()
+    try:
+        # Refuse oversized or non-image payloads now rather than in the worker
+        read_image_info(image_bytes)
+        job_id = await run_in_threadpool(get_job_queue().submit, image_bytes)
+    except ImageRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many jobs are waiting, please retry shortly.",
+            headers={"Retry-After": str(settings.OCR_RETRY_AFTER_SECONDS)}
+        )
+    return JobSubmitted(job_id=job_id, status=STATUS_QUEUED, status_url=f"{settings.API_V1_STR}/jobs/{job_id}")
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish before answering (long-poll).")
+):
+    """Returns the job's status, and its result once done. 404 if unknown or expired."""
+    queue = get_job_queue()
+    deadline = time.monotonic() + min(wait, settings.JOB_MAX_WAIT_SECONDS)
+    while True:
+        job = await run_in_threadpool(queue.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        if job["status"] in FINISHED_STATUSES or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+
+    return JobStatus(
+        job_id=job["id"],
+        status=job["status"],
+        attempts=job["attempts"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        result=PredictionResponse.model_validate_json(job["result"]) if job["result"] else None,
+        error=job["error"]
+    )
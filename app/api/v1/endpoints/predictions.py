@@ -8,26 +8,44 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
+import json
 import time
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Body
+from collections import OrderedDict
+from typing import AsyncIterator, List, Literal, Optional, Tuple
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Body, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 # Import all our services and schemas
-from app.services.ocr import extract_text_from_image
+from app.services.ocr import OcrQueueFullError, get_ocr_executor
+from app.services.image_preprocess import ImageRejectedError, read_image_info
 from app.services.parser import parse_ingredients
-from app.crud.carciscan import get_cid_by_synonym, get_smiles_by_cid
-from app.services.descriptors import calculate_rdkit_descriptors
-from app.services.predictor import predict_carcinogenicity, predict_route
+from app.crud.carciscan import get_stored_predictions
+from app.services.matcher import resolve_ingredients
+from app.services.descriptors import calculate_rdkit_descriptors_batch
+from app.services.descriptor_store import get_stored_descriptors
+from app.services.predictor import (
+    get_active_models,
+    get_model_feature_names,
+    predict_carcinogenicity_batch,
+    predict_route_batch,
+)
 from app.services.analyzer import get_practical_advice
-from app.services.matcher import find_best_synonym_match
+from app.services.result_cache import IngredientResultCache, get_ingredient_cache, ingredient_key
+from app.services.single_flight import SingleFlight, get_ingredient_flight
 from app.api.deps import get_db
+from app.db.reference_store import snapshot_version
 from app.schemas.prediction import (
     PredictionResponse,
     IngredientDetails,
     PredictionDetails,
-    OcrResult
+    OcrResult,
+    PracticalAdvice,
+    ProcessingTimings
 )
+from app.core.config import settings
 from app.core.constants import IARC_EVIDENCE
 
 router = APIRouter()
@@ -36,114 +54,340 @@ router = APIRouter()
 class TextInput(BaseModel):
     text: str
 
+
+# Pydantic model for batch text input
+class BatchTextInput(BaseModel):
+    texts: List[str]
+
+def _build_prediction_details(carc_pred_dict: Optional[dict], route_pred_dict: Optional[dict]) -> Optional[PredictionDetails]:
+    """
+    Turns the raw carcinogenicity and route predictions for one ingredient into
+    a PredictionDetails object, or None if either model failed.
+    """
+    if not (carc_pred_dict and route_pred_dict):
+        return None
+
+    predicted_group = carc_pred_dict.get("prediction")
+    raw_confidence = carc_pred_dict.get("confidence_scores", {}).get(predicted_group, 0)
+
+    # raw_confidence is expected to be 0..1; convert to percent float (0..100)
+    try:
+        conf_val = float(raw_confidence)
+        if conf_val <= 1.0:
+            conf_pct = conf_val * 100.0
+        else:
+            conf_pct = conf_val
+    except Exception:
+        conf_pct = 0.0
+
+    return PredictionDetails(
+        carcinogenicity_group=predicted_group,
+        evidence=carc_pred_dict.get("evidence"),
+        confidence=conf_pct,
+        route_of_exposure=route_pred_dict.get("prediction", [])
+    )
+
+
+# Results with these statuses are final for a given database and model version, so they
+# can be cached. "Prediction model failed" may be transient and is always recomputed.
+CACHEABLE_STATUSES = {
+    "Success",
+    "Synonym not found in database",
+    "SMILES not found in database",
+    "Could not calculate molecular descriptors",
+}
+
+
 # Shared helper function to process ingredients
 def process_ingredients(ingredient_names: list, db: Session):
-    # 3. Loop through ingredients and process each one
-    final_ingredient_details = []
-    for name in ingredient_names:
+    """
+    Returns the IngredientDetails of every ingredient, in order. Results come from the
+    ingredient result cache where possible; each distinct missing name is computed once,
+    shared with any concurrent request that needs it at the same time.
+
+    The models are resolved once, so a model swap mid-request never scores part of
+    the ingredients (or keys their cache entries) with a different version.
+    """
+    models = get_active_models()
+    cache = get_ingredient_cache()
+    flight = get_ingredient_flight() if settings.INGREDIENT_SINGLE_FLIGHT_ENABLED else None
+    if cache is None and flight is None:
+        return _process_ingredients_uncached(ingredient_names, db, models)
+
+    # Results are shared per model version and reference data version, so requests still
+    # reading a replaced in-memory snapshot never mix with those reading the new one
+    version = (models["version"], snapshot_version(db))
+    final_ingredient_details: List[Optional[IngredientDetails]] = [None] * len(ingredient_names)
+    misses = {}  # ingredient key -> (name, positions)
+    for position, name in enumerate(ingredient_names):
+        cached = cache.get(name, version) if cache is not None else None
+        if cached is not None:
+            final_ingredient_details[position] = cached.model_copy(update={"name": name})
+        else:
+            misses.setdefault(ingredient_key(name), (name, []))[1].append(position)
+
+    if misses:
+        resolved = _resolve_ingredient_misses(misses, db, models, version, cache, flight)
+        for key, (_, positions) in misses.items():
+            for position in positions:
+                final_ingredient_details[position] = resolved[key].model_copy(
+                    update={"name": ingredient_names[position]}
+                )
+
+    return final_ingredient_details
+
+
+def _resolve_ingredient_misses(misses: dict, db: Session, models: dict, version: tuple,
+                               cache: Optional[IngredientResultCache], flight: Optional[SingleFlight]) -> dict:
+    """
+    Computes the IngredientDetails of every missed ingredient key. Keys already being
+    computed by another request are waited for instead of computed again; the keys this
+    request leads are computed together in one batch, before waiting on anything, so
+    two requests can never end up waiting on each other.
+    """
+    if flight is None:
+        leading, futures = list(misses), {}
+    else:
+        leading, futures = [], {}
+        for key in misses:
+            futures[key], is_leader = flight.acquire((key, version))
+            if is_leader:
+                leading.append(key)
+
+    resolved = {}
+    if leading:
+        try:
+            computed = _process_ingredients_uncached([misses[key][0] for key in leading], db, models)
+        except BaseException as e:
+            if flight is not None:
+                for key in leading:
+                    flight.complete((key, version), exception=e)
+            raise
+        for key, details in zip(leading, computed):
+            # Cache first, so requests arriving after the flight ends hit the cache
+            if cache is not None and details.status in CACHEABLE_STATUSES:
+                cache.put(misses[key][0], version, details)
+            if flight is not None:
+                flight.complete((key, version), details)
+            resolved[key] = details
+
+    for key, future in futures.items():
+        if key not in resolved:
+            resolved[key] = future.result()
+    return resolved
+
+
+def _process_ingredients_uncached(ingredient_names: list, db: Session, models: dict):
+    # 3. Resolve every ingredient down to a descriptor dict. Ingredients that drop out
+    #    early get their final IngredientDetails right away; the rest wait for step 7.
+    final_ingredient_details: List[Optional[IngredientDetails]] = [None] * len(ingredient_names)
+    pending = []  # (position, name, matched_name, cid, smiles)
+
+    # 4-5. Fuzzy lookup for CID, matched name and SMILES, for all ingredients in one query
+    resolved = resolve_ingredients(db, ingredient_names)
+    for position, (name, match_result) in enumerate(zip(ingredient_names, resolved)):
         print(f"--- Processing ingredient: {name} ---")
         
-        # 4. Fuzzy Lookup for CID and Matched Name
-        match_result = find_best_synonym_match(name, db)
         if not match_result:
-            final_ingredient_details.append(
-                IngredientDetails(
-                    name=name,
-                    prediction_details=None,
-                    matched_name=None,
-                    pubchem_url=None,
-                    status="Synonym not found in database"
-                )
+            final_ingredient_details[position] = IngredientDetails(
+                name=name,
+                prediction_details=None,
+                matched_name=None,
+                pubchem_url=None,
+                status="Synonym not found in database"
             )
             continue
             
         # Unpack the result
-        matched_name, cid = match_result
-        print(f"Fuzzy match found: '{name}' -> '{matched_name}' with CID {cid}")
+        matched_name, cid, score, smiles = match_result
+        print(f"Fuzzy match found: '{name}' -> '{matched_name}' with CID {cid} (Score: {score:.2f})")
         
-        # 5. Lookup SMILES
-        smiles = get_smiles_by_cid(db, cid)
         if not smiles:
-            final_ingredient_details.append(
-                IngredientDetails(
-                    name=name,
-                    prediction_details=None,
-                    matched_name=matched_name,
-                    pubchem_url=None,
-                    status="SMILES not found in database"
-                )
+            final_ingredient_details[position] = IngredientDetails(
+                name=name,
+                prediction_details=None,
+                matched_name=matched_name,
+                pubchem_url=None,
+                status="SMILES not found in database"
             )
             continue
             
-        # 6. Calculate Descriptors
-        descriptor_dict = calculate_rdkit_descriptors(smiles)
-        if not descriptor_dict:
-            final_ingredient_details.append(
-                IngredientDetails(
-                    name=name,
-                    prediction_details=None,
-                    matched_name=matched_name,
-                    pubchem_url=f"https://pubchem.ncbi.nlm.nih.gov/compound/{cid}",
-                    status="Could not calculate molecular descriptors"
-                )
-            )
+        pending.append((position, name, matched_name, cid, smiles))
+
+    # 6a. Use predictions precomputed by score_all_cids.py for the request's model version;
+    #     only the remaining CIDs go through live inference
+    stored_predictions = get_stored_predictions(db, [entry[3] for entry in pending], models["version"])
+    feature_names = get_model_feature_names(models)
+    live = []  # (position, name, matched_name, cid, smiles, stored_features)
+    for position, name, matched_name, cid, smiles in pending:
+        stored = stored_predictions.get(cid)
+        if stored is None:
+            # 6b. Use precomputed descriptors from the store when available
+            live.append((position, name, matched_name, cid, smiles, get_stored_descriptors(cid, feature_names)))
             continue
-            
-        # 7. Predict
-        carc_pred_dict = predict_carcinogenicity(descriptor_dict)
-        route_pred_dict = predict_route(descriptor_dict)
-        
-        # 8. Structure the result for this ingredient
-        prediction_details = None
-        if carc_pred_dict and route_pred_dict:
-            predicted_group = carc_pred_dict.get("prediction")
-            raw_confidence = carc_pred_dict.get("confidence_scores", {}).get(predicted_group, 0)
-            
-            # raw_confidence is expected to be 0..1; convert to percent float (0..100)
-            try:
-                conf_val = float(raw_confidence)
-                if conf_val <= 1.0:
-                    conf_pct = conf_val * 100.0
-                else:
-                    conf_pct = conf_val
-            except Exception:
-                conf_pct = 0.0
-                
-            prediction_details = PredictionDetails(
-                carcinogenicity_group=predicted_group,
-                evidence=carc_pred_dict.get("evidence"),
-                confidence=conf_pct,
-                route_of_exposure=route_pred_dict.get("prediction", [])
-            )
-            status = "Success"
+        if stored.status == "ok":
+            prediction_details = _build_prediction_details(stored.carcinogenicity, stored.route)
+            status = "Success" if prediction_details else "Prediction model failed"
         else:
-            status = "Prediction model failed"
-            
-        final_ingredient_details.append(
-            IngredientDetails(
+            prediction_details, status = None, "Could not calculate molecular descriptors"
+        final_ingredient_details[position] = IngredientDetails(
+            name=name,
+            prediction_details=prediction_details,
+            matched_name=matched_name,
+            pubchem_url=f"https://pubchem.ncbi.nlm.nih.gov/compound/{cid}",
+            status=status
+        )
+    pending = live
+
+    # 6c. Calculate descriptors for every CID missing from the store in one batch
+    misses = [entry for entry in pending if entry[5] is None]
+    computed = calculate_rdkit_descriptors_batch([entry[4] for entry in misses], feature_names)
+    computed_by_position = {entry[0]: descriptor_dict for entry, descriptor_dict in zip(misses, computed)}
+
+    resolved_pending = []  # (position, name, matched_name, cid, descriptor_dict)
+    for position, name, matched_name, cid, _, stored in pending:
+        descriptor_dict = stored if stored is not None else computed_by_position[position]
+        if not descriptor_dict:
+            final_ingredient_details[position] = IngredientDetails(
                 name=name,
-                prediction_details=prediction_details,
+                prediction_details=None,
                 matched_name=matched_name,
                 pubchem_url=f"https://pubchem.ncbi.nlm.nih.gov/compound/{cid}",
-                status=status
+                status="Could not calculate molecular descriptors"
             )
+            continue
+        resolved_pending.append((position, name, matched_name, cid, descriptor_dict))
+    pending = resolved_pending
+
+    # 7. Predict, running each model once over all resolved ingredients
+    descriptor_dicts = [entry[4] for entry in pending]
+    carc_predictions = predict_carcinogenicity_batch(descriptor_dicts, models["carcinogenicity"])
+    route_predictions = predict_route_batch(descriptor_dicts, models["route"])
+
+    # 8. Structure the result for each ingredient
+    for (position, name, matched_name, cid, _), carc_pred_dict, route_pred_dict in zip(
+        pending, carc_predictions, route_predictions
+    ):
+        prediction_details = _build_prediction_details(carc_pred_dict, route_pred_dict)
+        status = "Success" if prediction_details else "Prediction model failed"
+        final_ingredient_details[position] = IngredientDetails(
+            name=name,
+            prediction_details=prediction_details,
+            matched_name=matched_name,
+            pubchem_url=f"https://pubchem.ncbi.nlm.nih.gov/compound/{cid}",
+            status=status
         )
     
     return final_ingredient_details
 
-@router.post("/predict", response_model=PredictionResponse)
-async def predict_from_image(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    start_time = time.time()
-    
-    # 1. OCR
+# Streaming responses: selected with ?stream=ndjson|sse or an Accept header
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+StreamFormat = Literal["ndjson", "sse"]
+
+
+def _stream_format(request: Request, stream: Optional[StreamFormat]) -> Optional[str]:
+    """The requested streaming format, or None for a regular JSON response."""
+    if stream:
+        return stream
+    accept = request.headers.get("accept", "")
+    for stream_format, media_type in STREAM_MEDIA_TYPES.items():
+        if media_type in accept:
+            return stream_format
+    return None
+
+
+def _stream_event(stream_format: str, event: str, data: dict) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+
+
+async def _stream_prediction(stream_format: str, ocr_result: OcrResult, db: Session, start_time: float,
+                             ocr_time: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Streams one analysis as events: "ocr_result" first, then one "ingredient" event
+    ({"index", "ingredient"}) per ingredient as soon as it is scored, and finally
+    "summary", holding the practical advice, processing time and timings.
+
+    Ingredients are processed in chunks that start at a single ingredient and double up
+    to STREAM_MAX_CHUNK_SIZE, so the first result only waits for one ingredient while
+    later ones still share bulk queries. Errors after the first event are reported as an
+    "error" event, since the status code has already been sent.
+    """
+    yield _stream_event(stream_format, "ocr_result", ocr_result.model_dump(mode="json"))
+
+    ingredient_names = ocr_result.ingredients
+    final_ingredient_details: List[IngredientDetails] = []
+    ingredients_start = time.time()
+    chunk_size = 1
     try:
-        image_bytes = await file.read()
-        raw_text = extract_text_from_image(image_bytes)
+        while len(final_ingredient_details) < len(ingredient_names):
+            chunk = ingredient_names[len(final_ingredient_details):len(final_ingredient_details) + chunk_size]
+            chunk_details = await run_in_threadpool(process_ingredients, chunk, db)
+            for details in chunk_details:
+                yield _stream_event(stream_format, "ingredient", {
+                    "index": len(final_ingredient_details),
+                    "ingredient": details.model_dump(mode="json"),
+                })
+                final_ingredient_details.append(details)
+            chunk_size = min(chunk_size * 2, max(settings.STREAM_MAX_CHUNK_SIZE, 1))
+        ingredients_time = round(time.time() - ingredients_start, 3)
+
+        # Validated the same way the response model validates it in the non-streaming response
+        practical_advice = PracticalAdvice.model_validate(get_practical_advice(final_ingredient_details))
+    except Exception as e:
+        yield _stream_event(stream_format, "error", {"detail": f"Error during ingredient processing: {e}"})
+        return
+
+    yield _stream_event(stream_format, "summary", {
+        "success": True,
+        "message": "Analysis complete.",
+        "practical_advice": practical_advice.model_dump(mode="json"),
+        "processing_time": round(time.time() - start_time, 2),
+        "timings": ProcessingTimings(
+            ocr=ocr_time, ocr_cache_hit=ocr_result.cache_hit, ingredients=ingredients_time
+        ).model_dump(mode="json"),
+    })
+
+
+def _streaming_response(stream_format: str, events: AsyncIterator[str]) -> StreamingResponse:
+    # Keep proxies from buffering the stream
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events, media_type=STREAM_MEDIA_TYPES[stream_format], headers=headers)
+
+
+async def read_label(image_bytes: bytes) -> Tuple[OcrResult, float]:
+    """
+    OCR and ingredient parsing of one label image. Returns the OcrResult and the seconds
+    spent on OCR. Raises HTTPException for rejected images, labels without readable
+    ingredients (4xx) and OCR failures or a full OCR queue (5xx).
+    """
+    # 1. OCR, on the OCR worker pool so the event loop stays free for other requests
+    try:
+        # Refuse oversized or non-image payloads from their header, before any decoding
+        read_image_info(image_bytes)
+        ocr_executor = await run_in_threadpool(get_ocr_executor)
+        ocr_start = time.time()
+        ocr_output = await ocr_executor.submit(image_bytes)
+        ocr_time = round(time.time() - ocr_start, 3)
+        raw_text = ocr_output.text
         if not raw_text:
             raise HTTPException(status_code=400, detail="Could not extract text from the image.")
+    except HTTPException:
+        raise
+    except ImageRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except OcrQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="OCR is at capacity, please retry shortly.",
+            headers={"Retry-After": str(settings.OCR_RETRY_AFTER_SECONDS)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during image processing: {e}")
     
@@ -152,10 +396,16 @@ async def predict_from_image(
     if not ingredient_names:
         raise HTTPException(status_code=400, detail="Could not parse any ingredients from the extracted text.")
     
-    ocr_result = OcrResult(text=raw_text, ingredients=ingredient_names)
-    
-    # 3. Process ingredients using shared helper function
-    final_ingredient_details = process_ingredients(ingredient_names, db)
+    return OcrResult(text=raw_text, ingredients=ingredient_names, cache_hit=ocr_output.cache_hit), ocr_time
+
+
+async def analyze_ingredients(ocr_result: OcrResult, db: Session, start_time: float,
+                              ocr_time: Optional[float] = None) -> PredictionResponse:
+    """Scores the parsed ingredients of a label and builds the full PredictionResponse."""
+    # 3. Process ingredients using shared helper function (off the event loop)
+    ingredients_start = time.time()
+    final_ingredient_details = await run_in_threadpool(process_ingredients, ocr_result.ingredients, db)
+    ingredients_time = round(time.time() - ingredients_start, 3)
     
     # 9. Get practical advice
     practical_advice = get_practical_advice(final_ingredient_details)
@@ -168,12 +418,45 @@ async def predict_from_image(
         ocr_result=ocr_result,
         ingredients=final_ingredient_details,
         processing_time=processing_time,
-        practical_advice=practical_advice
+        practical_advice=practical_advice,
+        timings=ProcessingTimings(ocr=ocr_time, ocr_cache_hit=ocr_result.cache_hit, ingredients=ingredients_time)
     )
 
+
+async def analyze_image(image_bytes: bytes, db: Session) -> PredictionResponse:
+    """The complete /predict analysis of one label image. Raises HTTPException like `read_label`."""
+    start_time = time.time()
+    ocr_result, ocr_time = await read_label(image_bytes)
+    return await analyze_ingredients(ocr_result, db, start_time, ocr_time)
+
+
+@router.post("/predict", response_model=PredictionResponse)
+async def predict_from_image(
+    request: Request,
+    file: UploadFile = File(...),
+    stream: Optional[StreamFormat] = Query(None, description="Stream the results as NDJSON or server-sent events."),
+    db: Session = Depends(get_db)
+):
+    start_time = time.time()
+    try:
+        image_bytes = await file.read()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during image processing: {e}")
+
+    ocr_result, ocr_time = await read_label(image_bytes)
+
+    stream_format = _stream_format(request, stream)
+    if stream_format:
+        return _streaming_response(
+            stream_format, _stream_prediction(stream_format, ocr_result, db, start_time, ocr_time)
+        )
+    return await analyze_ingredients(ocr_result, db, start_time, ocr_time)
+
 @router.post("/predict-text", response_model=PredictionResponse)
 async def predict_from_text(
+    request: Request,
     text_input: TextInput,
+    stream: Optional[StreamFormat] = Query(None, description="Stream the results as NDJSON or server-sent events."),
     db: Session = Depends(get_db)
 ):
     start_time = time.time()
@@ -184,20 +467,143 @@ async def predict_from_text(
         raise HTTPException(status_code=400, detail="Could not parse any ingredients from the provided text.")
     
     ocr_result = OcrResult(text=text_input.text, ingredients=ingredient_names)
+
+    stream_format = _stream_format(request, stream)
+    if stream_format:
+        return _streaming_response(stream_format, _stream_prediction(stream_format, ocr_result, db, start_time))
     
-    # 2. Process ingredients using shared helper function
-    final_ingredient_details = process_ingredients(ingredient_names, db)
-    
-    # 3. Get practical advice
-    practical_advice = get_practical_advice(final_ingredient_details)
-    
-    # 4. Calculate processing time and return response
-    processing_time = round(time.time() - start_time, 2)
-    return PredictionResponse(
-        success=True,
-        message="Analysis complete.",
-        ocr_result=ocr_result,
-        ingredients=final_ingredient_details,
-        processing_time=processing_time,
-        practical_advice=practical_advice
-    )
+    # 2-4. Process ingredients, get practical advice and build the response
+    return await analyze_ingredients(ocr_result, db, start_time)
+
+
+def _analyze_text_chunk(texts: List[Optional[str]], db: Session, resolved: OrderedDict) -> List[PredictionResponse]:
+    """
+    Analyzes a chunk of ingredient-list texts. The ingredient names of the whole chunk
+    are deduplicated (by ingredient key) and every name not yet in `resolved`, the
+    batch-wide results so far, is resolved and scored in a single `process_ingredients`
+    call. `resolved` is kept to `settings.BATCH_MAX_RESOLVED_INGREDIENTS` entries, least
+    recently used first out. A text that is None (an unreadable input line) or has no
+    parsable ingredients gets an unsuccessful response. `processing_time` is the chunk's
+    time per text.
+    """
+    start_time = time.time()
+    parsed = [parse_ingredients(text) if text is not None else [] for text in texts]
+
+    chunk_details = {}
+    missing = {}
+    for ingredient_names in parsed:
+        for name in ingredient_names:
+            key = ingredient_key(name)
+            if key in chunk_details:
+                continue
+            details = resolved.get(key)
+            if details is not None:
+                chunk_details[key] = details
+                resolved.move_to_end(key)
+            else:
+                missing.setdefault(key, name)
+    if missing:
+        for key, details in zip(missing, process_ingredients(list(missing.values()), db)):
+            chunk_details[key] = resolved[key] = details
+    while len(resolved) > settings.BATCH_MAX_RESOLVED_INGREDIENTS:
+        resolved.popitem(last=False)
+
+    responses = []
+    for text, ingredient_names in zip(texts, parsed):
+        ingredient_details = [
+            chunk_details[ingredient_key(name)].model_copy(update={"name": name}) for name in ingredient_names
+        ]
+        if text is None:
+            message = "Could not read this input line."
+        elif not ingredient_names:
+            message = "Could not parse any ingredients from the provided text."
+        else:
+            message = "Analysis complete."
+        responses.append(PredictionResponse(
+            success=bool(ingredient_names),
+            message=message,
+            ocr_result=OcrResult(text=text, ingredients=ingredient_names) if text is not None else None,
+            ingredients=ingredient_details,
+            processing_time=0.0,
+            practical_advice=get_practical_advice(ingredient_details),
+        ))
+
+    time_per_text = round((time.time() - start_time) / max(len(texts), 1), 4)
+    for response in responses:
+        response.processing_time = time_per_text
+    return responses
+
+
+async def _stream_batch(text_chunks: AsyncIterator[List[Optional[str]]], db: Session) -> AsyncIterator[str]:
+    """
+    Streams one PredictionResponse per input text as NDJSON, in input order, analyzing
+    the texts chunk by chunk. Only the current chunk's texts and responses are held in
+    memory, plus the IngredientDetails of up to `settings.BATCH_MAX_RESOLVED_INGREDIENTS`
+    recently seen ingredients.
+    """
+    resolved = OrderedDict()
+    async for texts in text_chunks:
+        responses = await run_in_threadpool(_analyze_text_chunk, texts, db, resolved)
+        yield "".join(response.model_dump_json() + "\n" for response in responses)
+
+
+async def _chunk_list(texts: List[str]) -> AsyncIterator[List[Optional[str]]]:
+    chunk_size = max(settings.BATCH_CHUNK_SIZE, 1)
+    for chunk_start in range(0, len(texts), chunk_size):
+        yield texts[chunk_start:chunk_start + chunk_size]
+
+
+def _text_from_jsonl_line(line: bytes) -> Optional[str]:
+    """The text of one JSONL line, either {"text": ...} or a JSON string. None if invalid."""
+    try:
+        value = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(value, dict):
+        value = value.get("text")
+    return value if isinstance(value, str) else None
+
+
+def _read_jsonl_chunk(lines, chunk_size: int) -> List[Optional[str]]:
+    chunk: List[Optional[str]] = []
+    for line in lines:
+        if line.strip():
+            chunk.append(_text_from_jsonl_line(line))
+            if len(chunk) >= chunk_size:
+                break
+    return chunk
+
+
+async def _chunk_jsonl(file: UploadFile) -> AsyncIterator[List[Optional[str]]]:
+    chunk_size = max(settings.BATCH_CHUNK_SIZE, 1)
+    # Read the spooled upload line by line, one chunk at a time, off the event loop
+    while True:
+        chunk = await run_in_threadpool(_read_jsonl_chunk, file.file, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+@router.post("/batch")
+async def predict_batch(
+    batch_input: BatchTextInput,
+    db: Session = Depends(get_db)
+):
+    """
+    Analyzes many ingredient-list texts in one request. Streams back NDJSON: one
+    PredictionResponse per text, in order. Each distinct ingredient name in the batch
+    is matched and scored only once.
+    """
+    return StreamingResponse(_stream_batch(_chunk_list(batch_input.texts), db), media_type="application/x-ndjson")
+
+
+@router.post("/batch-file")
+async def predict_batch_file(
+    file: UploadFile = File(..., description="JSONL file: one {\"text\": ...} object or JSON string per line."),
+    db: Session = Depends(get_db)
+):
+    """
+    Same as `/batch`, for an uploaded JSONL file. Lines that are not valid JSON texts
+    get an unsuccessful response, so output lines still match the non-blank input lines.
+    """
+    return StreamingResponse(_stream_batch(_chunk_jsonl(file), db), media_type="application/x-ndjson")
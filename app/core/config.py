@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 # Construct the absolute path to the project root directory.
 # This makes the .env file location independent of where the script is run from.
@@ -15,6 +15,22 @@ class Settings(BaseSettings):
     """
     # The database connection URL
     DATABASE_URL: str
+    # Open the database read-only. The API never writes to it, and DuckDB only lets several
+    # processes (API server, job workers) use the same file if all of them open it read-only.
+    DATABASE_READ_ONLY: bool = True
+    # Serve API lookups through a shared read-only DuckDB connection with a cursor per
+    # thread and prepared hot queries (app/db/reader.py) instead of an ORM session per
+    # request. Only used while DATABASE_READ_ONLY is set.
+    DB_READER_ENABLED: bool = True
+    # In-memory reference store: synonyms and smiles (plus the derived synonyms_norm and
+    # predictions tables, and optionally t3db) are copied into an in-memory DuckDB at startup
+    # and lookups are served from there. A watcher re-copies the database when its file
+    # changes (checked every REFERENCE_STORE_CHECK_SECONDS) and swaps the copy in atomically.
+    REFERENCE_STORE_ENABLED: bool = True
+    REFERENCE_STORE_INCLUDE_T3DB: bool = False
+    REFERENCE_STORE_CHECK_SECONDS: float = 5.0
+    # Log every SQL statement SQLAlchemy runs (debugging only, slows down every query)
+    SQL_ECHO: bool = False
 
     # A secret key for security (e.g., for JWT tokens later)
     SECRET_KEY: str = "a-default-secret-key-for-development-change-in-production"
@@ -23,6 +39,106 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Carciscan API"
 
+    # Descriptor calculation
+    # Worker processes used for RDKit descriptors on cache misses (0 = one per CPU core)
+    DESCRIPTOR_POOL_SIZE: int = 0
+    # Batches smaller than this stay in-process, where IPC would cost more than it saves
+    DESCRIPTOR_POOL_MIN_BATCH: int = 8
+
+    # Model registry
+    # How often (seconds) the registry's CURRENT pointer is re-read to pick up a new model version
+    MODEL_RELOAD_CHECK_SECONDS: float = 5.0
+
+    # Inference engine per model: "native" runs XGBoost, "flat" evaluates the trees as flat
+    # NumPy arrays, which avoids DMatrix overhead and is faster for small batches.
+    # "flat" is verified against XGBoost when first used and falls back to native on mismatch.
+    CARCINOGENICITY_ENGINE: Literal["native", "flat"] = "native"
+    ROUTE_ENGINE: Literal["native", "flat"] = "native"
+    # Batches with more rows than this always run on XGBoost, which wins on large batches
+    FLAT_ENGINE_MAX_BATCH: int = 12
+
+    # End-to-end ingredient result cache (in process), keyed by ingredient name and model
+    # version. Cleared automatically when the database file changes (checked every
+    # INGREDIENT_CACHE_CHECK_SECONDS).
+    INGREDIENT_CACHE_ENABLED: bool = True
+    INGREDIENT_CACHE_MAX_ENTRIES: int = 20000
+    INGREDIENT_CACHE_TTL_SECONDS: int = 3600
+    INGREDIENT_CACHE_CHECK_SECONDS: float = 5.0
+    # Concurrent requests resolving the same ingredient share one computation
+    INGREDIENT_SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Negative lookup filter (SQLite): names the database provably can't resolve (known
+    # misses, or no synonym key and no synonym length within reach of the cutoff) are
+    # rejected before querying. Rebuilt when the database changes.
+    NEGATIVE_LOOKUP_ENABLED: bool = True
+    NEGATIVE_LOOKUP_PATH: str = os.path.join(BASE_DIR, "cache", "negative_lookup.sqlite")
+    NEGATIVE_LOOKUP_MAX_TERMS: int = 200000
+
+    # Streaming responses (?stream=ndjson|sse): ingredients are scored in chunks that start
+    # at one ingredient and double up to this size
+    STREAM_MAX_CHUNK_SIZE: int = 8
+
+    # Batch endpoints (/predict/batch, /predict/batch-file): texts analyzed per chunk.
+    # Ingredient names are deduplicated across the whole batch, keeping the results of
+    # up to BATCH_MAX_RESOLVED_INGREDIENTS recently seen ones (least recently used first out).
+    BATCH_CHUNK_SIZE: int = 500
+    BATCH_MAX_RESOLVED_INGREDIENTS: int = 20000
+
+    # OCR execution
+    # Worker threads running OCR, each with its own PaddleOCR instance
+    OCR_WORKERS: int = 1
+    # Images allowed to wait for a free OCR worker before new uploads are rejected
+    OCR_QUEUE_SIZE: int = 4
+    # Retry-After value (seconds) sent with 503 responses when the OCR queue is full
+    OCR_RETRY_AFTER_SECONDS: int = 5
+    # Micro-batching: a worker collects up to OCR_MAX_BATCH_SIZE queued images, waiting at
+    # most OCR_MAX_BATCH_WAIT_MS after the first one, and runs them as a single batch
+    OCR_MAX_BATCH_SIZE: int = 4
+    OCR_MAX_BATCH_WAIT_MS: int = 20
+    # Uploads are rejected before decoding if larger than this many bytes or pixels
+    OCR_MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    OCR_MAX_IMAGE_PIXELS: int = 50_000_000
+    # JPEGs are decoded at 1/2, 1/4 or 1/8 scale as long as the longest side stays at least
+    # this large. Text detection runs at 480px, but recognition reads crops of this image.
+    OCR_DECODE_TARGET_SIDE: int = 1280
+
+    # OCR result cache (SQLite), keyed by the SHA-256 of the upload and optionally a
+    # perceptual hash of the decoded image so re-encodes of the same photo also hit.
+    # The perceptual hash is off by default: it only sees the 9x8 layout of an image, so
+    # two labels with the same layout but different ingredients can share it.
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_PATH: str = os.path.join(BASE_DIR, "cache", "ocr_cache.sqlite")
+    OCR_CACHE_PERCEPTUAL_HASH: bool = False
+    OCR_CACHE_MAX_ENTRIES: int = 10000
+    OCR_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    OCR_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Asynchronous image jobs (POST /jobs, GET /jobs/{id}), queued in SQLite and run by
+    # the worker processes of job_worker.py
+    JOB_QUEUE_PATH: str = os.path.join(BASE_DIR, "cache", "jobs.sqlite")
+    # Worker processes started by job_worker.py, and jobs each of them runs concurrently
+    JOB_WORKER_PROCESSES: int = 1
+    JOB_WORKER_CONCURRENCY: int = 2
+    # Attempts per job before it fails; a job whose worker died is retried after its lease ends
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_LEASE_SECONDS: int = 300
+    # A failed attempt is retried after this many seconds, doubled with every further
+    # attempt up to JOB_RETRY_MAX_DELAY_SECONDS
+    JOB_RETRY_DELAY_SECONDS: float = 5.0
+    JOB_RETRY_MAX_DELAY_SECONDS: float = 300.0
+    # Finished jobs (and their results) are deleted after this many seconds
+    JOB_RESULT_TTL_SECONDS: int = 24 * 3600
+    # New jobs are rejected with 503 while this many are waiting
+    JOB_MAX_QUEUED: int = 1000
+    # Long-polling: GET /jobs/{id}?wait= waits at most this long, re-checking at this interval
+    JOB_MAX_WAIT_SECONDS: float = 30.0
+    JOB_POLL_INTERVAL_SECONDS: float = 0.25
+
+    # Startup
+    # Load and warm up OCR, the models and the database in the background at startup;
+    # /ready returns 503 until this has finished. If disabled, everything loads lazily.
+    WARMUP_ON_STARTUP: bool = True
+
     class Config:
         # Construct the full, absolute path to the .env file
         env_file = os.path.join(BASE_DIR, ".env")
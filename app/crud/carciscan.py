@@ -1,9 +1,95 @@
+import json
 from sqlalchemy.orm import Session
-from typing import Optional, List, Tuple
+from typing import Dict, NamedTuple, Optional, List, Tuple
 from sqlalchemy import text
 
 # Import the SQLAlchemy models we defined earlier
 from app.models.carciscan import Synonyms, Smiles
+from app.core.constants import IARC_EVIDENCE
+from app.services.parser import normalize_ingredient_name
+from app.services.synonym_index import min_length_ratio
+
+# Whether the derived `synonyms_norm` table (see build_synonyms_norm.py) exists in the
+# database file. Checked once per process; in-memory snapshots know their own tables.
+_synonyms_norm_available = None
+
+# Whether the precomputed `predictions` table (see score_all_cids.py) exists in the
+# database file. Checked once per process, like `_synonyms_norm_available`.
+_predictions_available = None
+
+
+def _snapshot_has_table(db, table: str) -> Optional[bool]:
+    """
+    Whether the in-memory snapshot `db` copied `table`, or None if `db` reads the
+    database file. Decided per snapshot, so a request on a replaced snapshot never
+    sees the tables of the new one (or the other way round).
+    """
+    tables = getattr(db, "tables", None)
+    return table in tables if tables is not None else None
+
+
+class StoredPrediction(NamedTuple):
+    """
+    A precomputed row of the `predictions` table. `status` is "ok", or "no_descriptors"
+    if RDKit could not describe the molecule. The two prediction dicts have the same
+    shape as the outputs of `predict_carcinogenicity` and `predict_route`.
+    """
+    status: str
+    carcinogenicity: Optional[dict]
+    route: Optional[dict]
+
+
+def has_synonyms_norm_table(db: Session) -> bool:
+    """
+    Returns True if the normalized synonym table has been built in this database.
+    """
+    global _synonyms_norm_available
+    in_snapshot = _snapshot_has_table(db, "synonyms_norm")
+    if in_snapshot is not None:
+        return in_snapshot
+    if _synonyms_norm_available is None:
+        result = db.execute(text(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'synonyms_norm'"
+        )).fetchone()
+        _synonyms_norm_available = bool(result and result[0])
+    return _synonyms_norm_available
+
+
+def find_synonym_by_normalized_key(db: Session, search_term: str) -> Optional[Tuple[str, int, float]]:
+    """
+    Exact lookup of a term against the indexed `synonyms_norm.norm_key` column.
+
+    When several synonyms share the key, a case-insensitive exact match on the original
+    spelling wins, then the lowest CID.
+
+    Args:
+        db: The SQLAlchemy database session.
+        search_term: The ingredient name from OCR.
+
+    Returns:
+        A tuple of (matched_synonym, cid, score) if the key exists, otherwise None.
+        The score is the Jaro-Winkler similarity of the two lowercased names, as reported
+        by `find_cid_by_synonym_fuzzy`.
+    """
+    norm_key = normalize_ingredient_name(search_term)
+    if not norm_key or not has_synonyms_norm_table(db):
+        return None
+
+    sql_query = text("""
+        SELECT
+            n.synonym,
+            n.cid,
+            jaro_winkler_similarity(LOWER(n.synonym), LOWER(:search_term)) AS score
+        FROM synonyms_norm n
+        WHERE n.norm_key = :norm_key
+        ORDER BY LOWER(n.synonym) = LOWER(:search_term) DESC, n.cid
+        LIMIT 1
+    """)
+    result = db.execute(sql_query, {"search_term": search_term, "norm_key": norm_key}).fetchone()
+    if result:
+        return result[0], result[1], result[2]
+    return None
+
 
 def get_cid_by_synonym(db: Session, synonym: str) -> Optional[int]:
     """
@@ -16,7 +102,12 @@ def get_cid_by_synonym(db: Session, synonym: str) -> Optional[int]:
     Returns:
         The CID if found, otherwise None.
     """
-    # We perform a case-insensitive search for an exact match.
+    # Use the indexed normalized key when the table has been built
+    if has_synonyms_norm_table(db):
+        match = find_synonym_by_normalized_key(db, synonym)
+        return match[1] if match else None
+
+    # Otherwise, we perform a case-insensitive search for an exact match.
     # Using .first() is efficient as we only need one result.
     db_synonym = db.query(Synonyms).filter(Synonyms.synonyms.ilike(synonym)).first()
     if db_synonym:
@@ -39,6 +130,24 @@ def get_smiles_by_cid(db: Session, cid: int) -> Optional[str]:
         return smiles_record.smiles
     return None
 
+def get_smiles_by_cids(db: Session, cids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Retrieves the SMILES strings of several CIDs in one query.
+
+    Args:
+        db: The SQLAlchemy database session, or a DuckDBReader.
+        cids: The chemical identifiers.
+
+    Returns:
+        A dict of CID -> SMILES for the CIDs found in the smiles table.
+    """
+    if not cids:
+        return {}
+    sql_query = text("SELECT cid, smiles FROM smiles WHERE cid IN (SELECT UNNEST(CAST(:cids AS BIGINT[])))")
+    params = {"cids": [int(cid) for cid in cids]}
+    result = db.execute(sql_query, params)
+    return {cid: smiles for cid, smiles in result}
+
 # A helper function to get multiple potential CIDs if a synonym is ambiguous
 def get_cids_by_synonym_partial(db: Session, synonym: str) -> List[int]:
     """
@@ -93,4 +202,223 @@ def find_cid_by_synonym_fuzzy(db: Session, search_term: str, score_cutoff: float
         score = result[2]
         return matched_synonym, cid, score
 
-    return None
\ No newline at end of file
+    return None
+
+def get_all_synonyms(db: Session) -> List[Tuple[str, int]]:
+    """
+    Retrieves every (synonym, cid) pair in the synonyms table.
+    Used to build the in-memory synonym matching index.
+
+    Args:
+        db: The SQLAlchemy database session.
+
+    Returns:
+        A list of (synonym, cid) tuples.
+    """
+    result = db.execute(text("SELECT synonyms, cid FROM synonyms"))
+    return [(row[0], row[1]) for row in result]
+
+
+def get_synonym_lengths(db: Session) -> List[int]:
+    """
+    Retrieves every distinct synonym length, as measured by `resolve_ingredients_bulk`
+    (DuckDB's strlen, i.e. UTF-8 bytes), in ascending order.
+
+    Args:
+        db: The SQLAlchemy database session.
+
+    Returns:
+        A sorted list of lengths.
+    """
+    result = db.execute(text(
+        "SELECT DISTINCT strlen(synonyms) AS length FROM synonyms WHERE synonyms IS NOT NULL ORDER BY length"
+    ))
+    return [row[0] for row in result]
+
+
+def get_all_normalized_keys(db: Session) -> List[str]:
+    """
+    Retrieves every distinct key of the `synonyms_norm` table.
+
+    Args:
+        db: The SQLAlchemy database session.
+
+    Returns:
+        A list of normalized keys, empty if the table has not been built.
+    """
+    if not has_synonyms_norm_table(db):
+        return []
+    result = db.execute(text("SELECT DISTINCT norm_key FROM synonyms_norm"))
+    return [row[0] for row in result]
+
+
+def resolve_ingredients_bulk(db: Session, search_terms: List[str], score_cutoff: float = 0.95,
+                             fuzzy: bool = True) -> List[Optional[Tuple[str, int, float, Optional[str]]]]:
+    """
+    Resolves a whole ingredient list to (matched_synonym, cid, score, smiles) in one query.
+
+    The terms are unnested from a single list parameter. If the `synonyms_norm` table
+    exists, terms whose normalized key is in it are resolved by an exact index lookup.
+    Every remaining term is fuzzy-joined against the synonyms table in one scan and
+    reduced to its best synonym with arg_max, then everything is joined to the smiles
+    table. Synonyms whose length cannot reach the cutoff are excluded by the join
+    condition before any Jaro-Winkler score is computed.
+
+    Args:
+        db: The SQLAlchemy database session.
+        search_terms: The ingredient names from OCR.
+        score_cutoff: The minimum similarity score (0-1) to consider a fuzzy match.
+        fuzzy: If False, only the exact lookup runs and the remaining terms stay None
+            (for callers that fuzzy-match them elsewhere).
+
+    Returns:
+        One entry per search term, in order: a (matched_synonym, cid, score, smiles) tuple,
+        where smiles may be None, or None if no synonym matched.
+    """
+    if not search_terms:
+        return []
+
+    use_exact = has_synonyms_norm_table(db)
+    if not use_exact and not fuzzy:
+        return [None] * len(search_terms)
+
+    ctes, match_selects = [], []
+    params = {"search_terms": list(search_terms)}
+    if use_exact:
+        params["norm_keys"] = [normalize_ingredient_name(term) for term in search_terms]
+        # Same tie-breaking as find_synonym_by_normalized_key
+        ctes.append("""
+        exact AS (
+            SELECT
+                t.position,
+                n.synonym,
+                n.cid,
+                jaro_winkler_similarity(LOWER(n.synonym), LOWER(t.term)) AS score
+            FROM terms t
+            JOIN synonyms_norm n ON n.norm_key = t.norm_key
+            QUALIFY row_number() OVER (
+                PARTITION BY t.position
+                ORDER BY LOWER(n.synonym) = LOWER(t.term) DESC, n.cid
+            ) = 1
+        )""")
+        match_selects.append("SELECT position, synonym, cid, score FROM exact")
+    if fuzzy:
+        # Guard against a zero ratio (very low cutoffs), which would make max_length infinite
+        params["min_ratio"] = max(min_length_ratio(score_cutoff), 1e-9)
+        params["score_cutoff"] = score_cutoff
+        unresolved = "SELECT * FROM terms WHERE position NOT IN (SELECT position FROM exact)" if use_exact \
+            else "SELECT * FROM terms"
+        ctes.append(f"""
+        unresolved AS (
+            {unresolved}
+        ),
+        windows AS (
+            SELECT
+                position,
+                LOWER(term) AS term,
+                strlen(LOWER(term)) * :min_ratio AS min_length,
+                strlen(LOWER(term)) / :min_ratio AS max_length
+            FROM unresolved
+        ),
+        scored AS (
+            SELECT
+                w.position,
+                s.synonyms,
+                s.cid,
+                jaro_winkler_similarity(LOWER(s.synonyms), w.term) AS score
+            FROM windows w
+            JOIN synonyms s
+              ON strlen(s.synonyms) >= w.min_length
+             AND strlen(s.synonyms) <= w.max_length
+            WHERE score >= :score_cutoff
+        ),
+        best AS (
+            SELECT
+                position,
+                arg_max({{'synonym': synonyms, 'cid': cid}}, score) AS match,
+                max(score) AS score
+            FROM scored
+            GROUP BY position
+        )""")
+        match_selects.append("SELECT position, match.synonym AS synonym, match.cid AS cid, score FROM best")
+
+    norm_keys_column = "UNNEST(CAST(:norm_keys AS VARCHAR[])) AS norm_key," if use_exact else ""
+    sql_query = text(f"""
+        WITH terms AS (
+            SELECT
+                UNNEST(CAST(:search_terms AS VARCHAR[])) AS term,
+                {norm_keys_column}
+                generate_subscripts(CAST(:search_terms AS VARCHAR[]), 1) AS position
+        ),{",".join(ctes)},
+        matches AS (
+            {" UNION ALL ".join(match_selects)}
+        )
+        SELECT m.position, m.synonym, m.cid, m.score, sm.smiles
+        FROM matches m
+        LEFT JOIN smiles sm ON sm.cid = m.cid
+    """)
+
+    result = db.execute(sql_query, params).fetchall()
+
+    resolved: List[Optional[Tuple[str, int, float, Optional[str]]]] = [None] * len(search_terms)
+    for position, matched_synonym, cid, score, smiles in result:
+        # generate_subscripts is 1-based
+        resolved[position - 1] = (matched_synonym, cid, score, smiles)
+    return resolved
+
+
+def has_predictions_table(db: Session) -> bool:
+    """
+    Returns True if the precomputed predictions table has been built in this database.
+    """
+    global _predictions_available
+    in_snapshot = _snapshot_has_table(db, "predictions")
+    if in_snapshot is not None:
+        return in_snapshot
+    if _predictions_available is None:
+        result = db.execute(text(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'predictions'"
+        )).fetchone()
+        _predictions_available = bool(result and result[0])
+    return _predictions_available
+
+
+def get_stored_predictions(db: Session, cids: List[int], model_version: str) -> Dict[int, StoredPrediction]:
+    """
+    Fetches the precomputed predictions for several CIDs in one query.
+
+    Args:
+        db: The SQLAlchemy database session, or a DuckDBReader.
+        cids: The CIDs to look up.
+        model_version: Only predictions made by this model version are returned.
+
+    Returns:
+        A dict of CID -> StoredPrediction for the CIDs that have one. CIDs without a
+        prediction, or with one from another model version, are missing from it.
+    """
+    if not cids or not model_version or not has_predictions_table(db):
+        return {}
+
+    sql_query = text("""
+        SELECT cid, status, carcinogenicity_group, carcinogenicity_scores, route_prediction, route_scores
+        FROM predictions
+        WHERE cid IN (SELECT UNNEST(CAST(:cids AS BIGINT[]))) AND model_version = :model_version
+    """)
+    params = {"cids": [int(cid) for cid in cids], "model_version": model_version}
+    result = db.execute(sql_query, params)
+
+    stored = {}
+    for cid, status, group, carc_scores, route_prediction, route_scores in result:
+        if status != "ok":
+            stored[cid] = StoredPrediction(status, None, None)
+            continue
+        stored[cid] = StoredPrediction(
+            status,
+            {
+                "prediction": group,
+                "confidence_scores": json.loads(carc_scores),
+                "evidence": IARC_EVIDENCE.get(group, "Evidence not available."),
+            },
+            {"prediction": json.loads(route_prediction), "confidence_scores": json.loads(route_scores)},
+        )
+    return stored
@@ -0,0 +1,118 @@
+import re
+import threading
+from typing import Any, Dict, Optional
+
+import duckdb
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+
+# SQLAlchemy-style named parameters (":name"), but not "::" casts
+_NAMED_PARAMETER = re.compile(r"(?<![:\w]):(\w+)")
+
+
+def _to_duckdb_parameters(sql: str) -> str:
+    """Rewrites ":name" parameters into DuckDB's "$name" syntax."""
+    return _NAMED_PARAMETER.sub(r"$\1", sql)
+
+
+class ReaderResult:
+    """
+    The result of a DuckDBReader query. Iterates and fetches tuples like a SQLAlchemy
+    result, and also exposes DuckDB's columnar fetches (NumPy arrays, Arrow table).
+    """
+
+    # Rows pulled from DuckDB per batch while iterating
+    BATCH_SIZE = 10000
+
+    def __init__(self, cursor: duckdb.DuckDBPyConnection):
+        self._cursor = cursor
+
+    def __iter__(self):
+        while True:
+            rows = self._cursor.fetchmany(self.BATCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchnumpy(self):
+        return self._cursor.fetchnumpy()
+
+    def fetch_arrow_table(self):
+        return self._cursor.fetch_arrow_table()
+
+
+class DuckDBReader:
+    """
+    Read-only access to the DuckDB database without SQLAlchemy.
+
+    One connection is opened read-only and every thread gets its own cursor (a DuckDB
+    connection is not safe to share between threads, its cursors are independent).
+    `execute` takes the same `text()` statements and ":name" parameters as
+    `Session.execute`, so the raw-SQL crud functions accept either. Rows come back as
+    plain tuples, or as NumPy arrays / an Arrow table (see ReaderResult), never as ORM objects.
+    Parameters are always bound, never inlined into the SQL.
+    """
+
+    def __init__(self, path: str, read_only: bool = True):
+        self.path = path
+        self._con = duckdb.connect(path, read_only=read_only)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cursors = []
+        self._converted: Dict[str, str] = {}
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """The calling thread's cursor, created on first use."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            with self._lock:
+                cursor = self._con.cursor()
+                self._cursors.append(cursor)
+            self._local.cursor = cursor
+        return cursor
+
+    def _duckdb_sql(self, statement) -> str:
+        sql = str(statement)
+        converted = self._converted.get(sql)
+        if converted is None:
+            converted = self._converted[sql] = _to_duckdb_parameters(sql)
+        return converted
+
+    def execute(self, statement, params: Optional[Dict[str, Any]] = None) -> ReaderResult:
+        """Runs a `text()` statement or SQL string with ":name" parameters on this thread's cursor."""
+        return ReaderResult(self.cursor().execute(self._duckdb_sql(statement), params or {}))
+
+    def close(self):
+        with self._lock:
+            for cursor in self._cursors:
+                cursor.close()
+            self._cursors = []
+            self._con.close()
+
+
+# --- Global Reader ---
+_db_reader = None
+_db_reader_lock = threading.Lock()
+
+
+def get_db_reader() -> Optional[DuckDBReader]:
+    """
+    Lazily opens and caches the shared reader. Returns None if it is disabled, or if the
+    database is opened read-write (DuckDB can't mix both modes on one file in a process).
+    DuckDB also rejects connections with different settings to one file, so a process
+    uses either this reader or the SQLAlchemy engine (see `open_db`), not both.
+    """
+    global _db_reader
+    if not (settings.DB_READER_ENABLED and settings.DATABASE_READ_ONLY):
+        return None
+    with _db_reader_lock:
+        if _db_reader is None:
+            _db_reader = DuckDBReader(make_url(settings.DATABASE_URL).database)
+    return _db_reader
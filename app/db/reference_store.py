@@ -0,0 +1,208 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.db.reader import DuckDBReader
+from app.services.result_cache import database_fingerprint
+
+# Tables copied into memory. synonyms and smiles are required; the derived tables are
+# copied if they were built (see build_synonyms_norm.py and score_all_cids.py).
+REQUIRED_TABLES = ("synonyms", "smiles")
+DERIVED_TABLES = ("synonyms_norm", "predictions")
+
+
+class ReferenceSnapshot(DuckDBReader):
+    """
+    An in-memory DuckDB copy of the reference tables, read like any DuckDBReader.
+
+    A snapshot never changes once loaded. Requests hold on to the snapshot they started
+    with (see `ReferenceStore.acquire`), so a swap never mixes two versions of the data
+    within one request; a replaced snapshot is closed once its last request releases it.
+    """
+
+    def __init__(self, version: int, fingerprint: Optional[Tuple]):
+        super().__init__(":memory:", read_only=False)
+        self.version = version
+        self.fingerprint = fingerprint
+        self.tables: Dict[str, int] = {}
+        self.loaded_at = time.time()
+        self.references = 0
+        self.retired = False
+
+    def load(self, database_path: str, tables: List[str]):
+        """Copies `tables` (those that exist) from the database file into memory."""
+        con = self.cursor()
+        con.execute(f"ATTACH '{database_path.replace(chr(39), chr(39) * 2)}' AS source (READ_ONLY)")
+        try:
+            available = {row[0] for row in con.execute(
+                "SELECT table_name FROM information_schema.tables WHERE table_catalog = 'source'"
+            ).fetchall()}
+            missing = [table for table in REQUIRED_TABLES if table not in available]
+            if missing:
+                raise ValueError(f"Missing tables in {database_path}: {', '.join(missing)}")
+            for table in tables:
+                if table not in available:
+                    continue
+                con.execute(f"CREATE TABLE {table} AS SELECT * FROM source.{table}")
+                self.tables[table] = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if "synonyms_norm" in self.tables:
+                con.execute("CREATE INDEX idx_synonyms_norm_key ON synonyms_norm (norm_key)")
+        finally:
+            con.execute("DETACH source")
+
+
+def snapshot_version(db) -> Optional[int]:
+    """The version of the snapshot `db` reads from, or None if it reads the database file."""
+    return db.version if isinstance(db, ReferenceSnapshot) else None
+
+
+class ReferenceStore:
+    """
+    Serves the reference tables from memory and follows changes to the database file.
+
+    A watcher thread fingerprints the file every `check_interval` seconds. Once a new
+    fingerprint has held for one full interval (so a file still being written is not
+    picked up), a fresh snapshot is loaded next to the current one and swapped in
+    atomically. If loading fails, the current snapshot stays and the next change is
+    tried again.
+    """
+
+    def __init__(self, database_path: str, tables: List[str], check_interval: float = 5.0):
+        self.database_path = database_path
+        self.tables = tables
+        self.check_interval = check_interval
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.counters = {"loads": 0, "failed_loads": 0, "swaps": 0}
+
+    def load(self) -> ReferenceSnapshot:
+        """Loads the database file into a new snapshot and swaps it in."""
+        start_time = time.time()
+        version = self._snapshot.version + 1 if self._snapshot is not None else 1
+        fingerprint = database_fingerprint()
+        snapshot = ReferenceSnapshot(version, fingerprint)
+        try:
+            snapshot.load(self.database_path, self.tables)
+            if database_fingerprint() != fingerprint:
+                raise RuntimeError("the database file changed while it was being loaded")
+        except Exception:
+            snapshot.close()
+            with self._lock:
+                self.counters["failed_loads"] += 1
+            raise
+        self._swap(snapshot)
+        rows = ", ".join(f"{table}: {count}" for table, count in snapshot.tables.items())
+        print(f"✅ Reference store version {version} loaded in {time.time() - start_time:.2f}s ({rows}).")
+        return snapshot
+
+    def _swap(self, snapshot: ReferenceSnapshot):
+        with self._lock:
+            previous, self._snapshot = self._snapshot, snapshot
+            self.counters["loads"] += 1
+            if previous is not None:
+                self.counters["swaps"] += 1
+                previous.retired = True
+                if previous.references == 0:
+                    previous.close()
+
+    def acquire(self) -> ReferenceSnapshot:
+        """The current snapshot, kept open until it is passed to `release`."""
+        with self._lock:
+            snapshot = self._snapshot
+            snapshot.references += 1
+        return snapshot
+
+    def release(self, snapshot: ReferenceSnapshot):
+        with self._lock:
+            snapshot.references -= 1
+            close = snapshot.retired and snapshot.references == 0
+        if close:
+            snapshot.close()
+
+    def start_watcher(self):
+        self._watcher = threading.Thread(target=self._watch, name="reference-store-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.check_interval):
+            fingerprint = database_fingerprint()
+            if fingerprint is None or fingerprint == self._snapshot.fingerprint:
+                pending = None
+                continue
+            if fingerprint != pending:
+                # Changed since the last check: wait until it has settled
+                pending = fingerprint
+                continue
+            try:
+                self.load()
+                pending = None
+            except Exception as e:
+                print(f"❌ Error: Could not reload the reference store, still serving version "
+                      f"{self._snapshot.version}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                **self.counters,
+                "version": snapshot.version if snapshot else None,
+                "loaded_at": snapshot.loaded_at if snapshot else None,
+                "tables": dict(snapshot.tables) if snapshot else {},
+            }
+
+
+# --- Global Store ---
+_reference_store = None
+_reference_store_failed = False
+_reference_store_lock = threading.Lock()
+
+
+def get_reference_store() -> Optional[ReferenceStore]:
+    """
+    Lazily loads the reference store and starts its watcher. Returns None if it is
+    disabled or the first load failed (lookups then read the database file).
+    """
+    global _reference_store, _reference_store_failed
+    if not settings.REFERENCE_STORE_ENABLED or _reference_store_failed:
+        return None
+    if _reference_store is not None:
+        return _reference_store
+    with _reference_store_lock:
+        if _reference_store is None and not _reference_store_failed:
+            tables = list(REQUIRED_TABLES + DERIVED_TABLES)
+            if settings.REFERENCE_STORE_INCLUDE_T3DB:
+                tables.append("t3db")
+            store = ReferenceStore(
+                make_url(settings.DATABASE_URL).database, tables, settings.REFERENCE_STORE_CHECK_SECONDS
+            )
+            try:
+                store.load()
+            except Exception as e:
+                print(f"❌ Error: Could not load the reference store, reading the database file instead: {e}")
+                _reference_store_failed = True
+                return None
+            store.start_watcher()
+            _reference_store = store
+    return _reference_store
+
+
+def get_reference_store_metrics() -> Optional[Dict]:
+    """Version, row counts and load counters of the reference store, or None if it is not loaded."""
+    return _reference_store.stats() if _reference_store is not None else None
+
+
+def shutdown_reference_store():
+    """Stops the watcher thread. Called on application shutdown."""
+    if _reference_store is not None:
+        _reference_store.stop()
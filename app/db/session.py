@@ -1,15 +1,21 @@
+from contextlib import contextmanager
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 # Import the settings from our config file
 from app.core.config import settings
+from app.db.reader import get_db_reader
+from app.db.reference_store import get_reference_store
 
 # Create the SQLAlchemy engine
 # The `connect_args` is NOT needed for DuckDB and causes an error.
 engine = create_engine(
     settings.DATABASE_URL,
     # Removed: connect_args={"check_same_thread": False},
-    echo=True # Set to True to see all SQL queries generated (good for debugging)
+    # Read-only connections let the API server and the job workers open the file together
+    connect_args={"read_only": True} if settings.DATABASE_READ_ONLY else {},
+    echo=settings.SQL_ECHO # Set SQL_ECHO=true to see all SQL queries generated (good for debugging)
 )
 
 # Create a configured "Session" class
@@ -25,4 +31,29 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@contextmanager
+def open_db():
+    """
+    Opens database access for a unit of work (a request, the warm-up, a job): the current
+    snapshot of the in-memory reference store, held until the work is done, or else the
+    shared read-only DuckDBReader, or else a new session.
+    """
+    store = get_reference_store()
+    if store is not None:
+        snapshot = store.acquire()
+        try:
+            yield snapshot
+        finally:
+            store.release(snapshot)
+        return
+    reader = get_db_reader()
+    if reader is not None:
+        yield reader
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
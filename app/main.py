@@ -1,11 +1,37 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.db.reference_store import get_reference_store_metrics, shutdown_reference_store
+from app.services.descriptors import shutdown_descriptor_pool
+from app.services.ocr import get_ocr_metrics, shutdown_ocr_executor
+from app.services.predictor import get_model_version
+from app.services.job_queue import get_job_queue
+from app.services.negative_lookup import get_negative_lookup_metrics
+from app.services.result_cache import get_ingredient_cache_metrics
+from app.services.single_flight import get_ingredient_flight
+from app.services.warmup import start_warmup, warmup_state
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: the server starts answering (and /ready reports 503)
+    # while OCR, the models and the database are loaded
+    if settings.WARMUP_ON_STARTUP:
+        start_warmup()
+    yield
+    shutdown_ocr_executor()
+    shutdown_descriptor_pool()
+    shutdown_reference_store()
+
 
 # Create the FastAPI application instance
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Include the main API router
@@ -15,3 +41,28 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to the Carciscan API. See /docs for the API documentation."}
+
+
+# Readiness probe: 503 until every component has been loaded and warmed up
+@app.get("/ready", tags=["Root"])
+async def read_ready():
+    warmup = warmup_state.snapshot()
+    if not settings.WARMUP_ON_STARTUP:
+        warmup["ready"] = True
+    return JSONResponse(status_code=200 if warmup["ready"] else 503, content=warmup)
+
+
+# Runtime metrics for the performance-sensitive subsystems. A plain def, so FastAPI runs it
+# in its threadpool: the job queue and OCR cache stats are blocking SQLite queries.
+@app.get("/metrics", tags=["Root"])
+def read_metrics():
+    return {
+        "ocr": get_ocr_metrics(),
+        "ingredient_cache": get_ingredient_cache_metrics(),
+        "ingredient_single_flight": get_ingredient_flight().stats(),
+        "negative_lookup": get_negative_lookup_metrics(),
+        "jobs": get_job_queue().stats(),
+        "reference_store": get_reference_store_metrics(),
+        "model_version": get_model_version(),
+        "warmup": warmup_state.snapshot(),
+    }
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from app.schemas.prediction import PredictionResponse
+
+# --- Schemas for Asynchronous Jobs ---
+class JobSubmitted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str = Field(..., description="URL to poll for the job's status and result.")
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str = Field(..., description="'queued', 'running', 'done' or 'failed'")
+    attempts: int
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    result: Optional[PredictionResponse] = Field(None, description="The analysis, once the job is done.")
+    error: Optional[str] = Field(None, description="Why the job failed (or why the last attempt failed).")
@@ -19,6 +19,7 @@ class IngredientDetails(BaseModel):
 class OcrResult(BaseModel):
     text: str
     ingredients: List[str]
+    cache_hit: Optional[bool] = Field(None, description="True if the text came from the OCR cache; None when no OCR ran.")
 
 # PracticalAdvice object: structured practical advice instead of a flat list
 class PracticalAdvice(BaseModel):
@@ -28,6 +29,11 @@ class PracticalAdvice(BaseModel):
     iarc_definition: Optional[str]
     route_advice: List[str]
 
+class ProcessingTimings(BaseModel):
+    ocr: Optional[float] = Field(None, description="Seconds spent getting the label text (OCR or OCR cache); None when no OCR ran.")
+    ocr_cache_hit: Optional[bool] = Field(None, description="True if OCR was skipped because the image was cached.")
+    ingredients: float = Field(..., description="Seconds spent matching and scoring the ingredients.")
+
 class PredictionResponse(BaseModel):
     success: bool
     message: str
@@ -35,3 +41,4 @@ class PredictionResponse(BaseModel):
     ingredients: List[IngredientDetails]
     processing_time: float
     practical_advice: PracticalAdvice
+    timings: Optional[ProcessingTimings] = None
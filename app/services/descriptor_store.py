@@ -0,0 +1,118 @@
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# --- Store Layout ---
+# A store is a directory holding:
+#   meta.json     feature_names, row count, build status, and the model version and
+#                 database fingerprint the store was built for
+#   cids.npy      sorted int64 CIDs; row i of the matrix belongs to cids[i]
+#   features.f32  raw float32 matrix of shape (n_rows, n_features), memory-mapped
+#   status.u8     one byte per row, see ROW_* below
+STORE_DIR = "ml_models/descriptor_store"
+META_FILE = "meta.json"
+CIDS_FILE = "cids.npy"
+FEATURES_FILE = "features.f32"
+STATUS_FILE = "status.u8"
+
+ROW_PENDING = 0
+ROW_READY = 1
+ROW_FAILED = 2
+
+
+class AlignedFeatures(NamedTuple):
+    """
+    A descriptor row that has already been preprocessed and aligned the way
+    `_preprocess_and_align` does it, in the column order given by `feature_names`.
+    """
+    values: np.ndarray
+    feature_names: List[str]
+
+
+class DescriptorStore:
+    """
+    Read-only view of a precomputed descriptor store, keyed by CID.
+
+    Rows are returned as views into the memory-mapped matrix, so a lookup costs a
+    binary search and no copy or deserialization. A store only serves models whose
+    features it covers (see `covers`); after a model swap that adds features, the
+    CIDs fall back to live RDKit until the store is rebuilt.
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        with open(os.path.join(store_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.feature_names: List[str] = meta["feature_names"]
+        self.complete: bool = meta.get("complete", False)
+        self.model_version: Optional[str] = meta.get("model_version")
+        self.db_fingerprint = meta.get("db_fingerprint")
+        self._covered: Dict[Tuple[str, ...], bool] = {}
+
+        self.cids = np.load(os.path.join(store_dir, CIDS_FILE), mmap_mode="r")
+        n_rows, n_features = len(self.cids), len(self.feature_names)
+        self.features = np.memmap(
+            os.path.join(store_dir, FEATURES_FILE), dtype=np.float32, mode="r", shape=(n_rows, n_features)
+        )
+        self.status = np.memmap(os.path.join(store_dir, STATUS_FILE), dtype=np.uint8, mode="r", shape=(n_rows,))
+
+    def __len__(self) -> int:
+        return len(self.cids)
+
+    def covers(self, feature_names: Sequence[str]) -> bool:
+        """True if every one of `feature_names` is stored, so no feature would be zero-filled."""
+        key = tuple(feature_names)
+        covered = self._covered.get(key)
+        if covered is None:
+            covered = self._covered[key] = set(key) <= set(self.feature_names)
+            if not covered:
+                print(f"Descriptor store (model version {self.model_version}) lacks features of the "
+                      f"current models; those CIDs are described live.")
+        return covered
+
+    def get_row(self, cid: int) -> Optional[np.ndarray]:
+        """Returns the stored feature row for `cid`, or None if it was not (successfully) computed."""
+        row = int(np.searchsorted(self.cids, cid))
+        if row >= len(self.cids) or self.cids[row] != cid or self.status[row] != ROW_READY:
+            return None
+        return self.features[row]
+
+
+# --- Global Store Cache ---
+_descriptor_store = None
+_descriptor_store_checked = False
+
+
+def get_descriptor_store() -> Optional[DescriptorStore]:
+    """
+    Lazily opens and caches the descriptor store.
+    Returns None if no store has been built (see build_descriptor_store.py).
+    """
+    global _descriptor_store, _descriptor_store_checked
+    if not _descriptor_store_checked:
+        _descriptor_store_checked = True
+        try:
+            _descriptor_store = DescriptorStore()
+            print(f"✅ Descriptor store opened with {len(_descriptor_store)} CIDs "
+                  f"(model version {_descriptor_store.model_version}).")
+        except FileNotFoundError:
+            print(f"Descriptor store not found at {STORE_DIR}, descriptors will be computed live.")
+        except Exception as e:
+            print(f"❌ Error: Could not open descriptor store: {e}")
+    return _descriptor_store
+
+
+def get_stored_descriptors(cid: int, feature_names: Sequence[str]) -> Optional[AlignedFeatures]:
+    """
+    Returns the precomputed, model-ready features for `cid`, or None if there is no
+    store, the CID is not in it, or the store lacks any of `feature_names` (the
+    features of the models about to be run).
+    """
+    store = get_descriptor_store()
+    if store is None or not store.covers(feature_names):
+        return None
+    row = store.get_row(cid)
+    if row is None:
+        return None
+    return AlignedFeatures(row, store.feature_names)
@@ -1,11 +1,118 @@
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from rdkit import Chem
 from rdkit.Chem import Descriptors
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict, Sequence, Tuple
 
+from app.core.config import settings
+from app.services.predictor import get_model_feature_names
 
-def calculate_rdkit_descriptors(smiles: str) -> Optional[Dict[str, float]]:
+# --- Global Descriptor Engine Cache ---
+# (descriptor_name, function) pairs for just the descriptors a model bundle uses,
+# keyed by that bundle's feature names (bundles can be swapped while serving).
+_descriptor_engines: Dict[Tuple[str, ...], List[Tuple[str, Callable]]] = {}
+
+# --- Global Process Pool ---
+# Started for the feature names in `_descriptor_pool_names`, restarted when they change
+_descriptor_pool = None
+_descriptor_pool_names: Optional[Tuple[str, ...]] = None
+_descriptor_pool_lock = threading.Lock()
+
+
+def get_descriptor_engine(feature_names: Optional[Sequence[str]] = None) -> List[Tuple[str, Callable]]:
+    """
+    Lazily builds and caches the list of RDKit descriptor functions for `feature_names`
+    (default: those of the active models, see `get_model_feature_names`).
+    Returns an empty list if the models could not be loaded.
+    """
+    if feature_names is None:
+        feature_names = get_model_feature_names()
+    key = tuple(feature_names)
+    engine = _descriptor_engines.get(key)
+    if engine is None:
+        available = dict(Descriptors._descList)
+        engine = _descriptor_engines[key] = [(name, available[name]) for name in key if name in available]
+        print(f"✅ Descriptor engine uses {len(engine)} of {len(available)} RDKit descriptors.")
+    return engine
+
+
+def _init_pool_worker(feature_names: Tuple[str, ...]):
+    """
+    Sets up the descriptor engine in a pool worker from the parent's feature names,
+    so workers don't have to load the models themselves.
+    """
+    available = dict(Descriptors._descList)
+    _descriptor_engines[feature_names] = [(name, available[name]) for name in feature_names if name in available]
+
+
+def _descriptor_pool_size() -> int:
+    """Number of pool workers: `settings.DESCRIPTOR_POOL_SIZE`, or one per CPU core if 0."""
+    return settings.DESCRIPTOR_POOL_SIZE or os.cpu_count() or 1
+
+
+def get_descriptor_pool(feature_names: Sequence[str]) -> ProcessPoolExecutor:
+    """
+    Lazily creates and caches the process pool used for large descriptor batches, with
+    its workers set up for `feature_names`. A pool set up for other feature names (from
+    before a model swap) is replaced; work already sent to it still completes.
+    """
+    global _descriptor_pool, _descriptor_pool_names
+    key = tuple(feature_names)
+    with _descriptor_pool_lock:
+        if _descriptor_pool is not None and _descriptor_pool_names != key:
+            _descriptor_pool.shutdown(wait=False)
+            _descriptor_pool = None
+            print("Descriptor process pool restarted for new model features.")
+        if _descriptor_pool is None:
+            pool_size = _descriptor_pool_size()
+            _descriptor_pool = ProcessPoolExecutor(
+                max_workers=pool_size, initializer=_init_pool_worker, initargs=(key,)
+            )
+            _descriptor_pool_names = key
+            print(f"✅ Descriptor process pool started with {pool_size} workers.")
+        return _descriptor_pool
+
+
+def _discard_descriptor_pool(pool: ProcessPoolExecutor):
+    """Drops `pool` if it is still the cached one; a broken pool can't be reused."""
+    global _descriptor_pool
+    with _descriptor_pool_lock:
+        if _descriptor_pool is pool:
+            _descriptor_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_descriptor_pool():
+    """Stops the descriptor process pool, if it was started."""
+    global _descriptor_pool
+    with _descriptor_pool_lock:
+        pool, _descriptor_pool = _descriptor_pool, None
+    if pool is not None:
+        pool.shutdown()
+        print("Descriptor process pool stopped.")
+
+
+def _calculate_selected_descriptors(mol, engine: List[Tuple[str, Callable]]) -> Dict[str, float]:
+    """
+    Computes only the descriptors in `engine`, with the same error handling as
+    `Descriptors.CalcMolDescriptors` (a failing descriptor is reported as None).
+    """
+    descriptor_dict = {}
+    for name, fn in engine:
+        try:
+            descriptor_dict[name] = fn(mol)
+        except Exception:
+            descriptor_dict[name] = None
+    return descriptor_dict
+
+
+def calculate_rdkit_descriptors(smiles: str, feature_names: Optional[Sequence[str]] = None) -> Optional[Dict[str, float]]:
     """
-    Calculates all available RDKit descriptors for a given SMILES string.
+    Calculates the RDKit descriptors in `feature_names` (default: those used by the
+    active models) for a given SMILES string.
     Returns a dictionary of {descriptor_name: value}.
     """
     if not smiles:
@@ -15,6 +122,14 @@ def calculate_rdkit_descriptors(smiles: str) -> Optional[Dict[str, float]]:
     if mol is None:
         return None
 
+    engine = get_descriptor_engine(feature_names)
+    if engine:
+        descriptor_dict = _calculate_selected_descriptors(mol, engine)
+        # Missing values are filled with the mean of *all* descriptors during preprocessing,
+        # so only a complete subset can be used as-is; otherwise compute everything below.
+        if all(value is not None and not math.isnan(value) for value in descriptor_dict.values()):
+            return descriptor_dict
+
     # CalcMolDescriptors returns a dictionary of {descriptor_name: value}
     descriptor_dict: Dict[str, float] = Descriptors.CalcMolDescriptors(mol)
 
@@ -24,8 +139,42 @@ def calculate_rdkit_descriptors(smiles: str) -> Optional[Dict[str, float]]:
     return descriptor_dict  # Return the dictionary directly
 
 
+def calculate_rdkit_descriptors_batch(smiles_list: List[str],
+                                      feature_names: Optional[Sequence[str]] = None) -> List[Optional[Dict[str, float]]]:
+    """
+    Calculates descriptors for many SMILES strings, returning results in input order
+    (None for any SMILES that `calculate_rdkit_descriptors` would reject).
+
+    `feature_names` should be those of the model bundle the results are for (default:
+    the active models), so a model swap mid-request can't leave features uncomputed.
+
+    Batches of at least `settings.DESCRIPTOR_POOL_MIN_BATCH` are fanned out across the
+    descriptor process pool; smaller ones are computed in-process.
+    """
+    if feature_names is None:
+        feature_names = get_model_feature_names()
+    feature_names = tuple(feature_names)
+    if len(smiles_list) < max(settings.DESCRIPTOR_POOL_MIN_BATCH, 1):
+        return [calculate_rdkit_descriptors(smiles, feature_names) for smiles in smiles_list]
+
+    pool = None
+    try:
+        pool = get_descriptor_pool(feature_names)
+        chunksize = max(1, len(smiles_list) // (_descriptor_pool_size() * 4))
+        calculate = partial(calculate_rdkit_descriptors, feature_names=feature_names)
+        return list(pool.map(calculate, smiles_list, chunksize=chunksize))
+    except Exception as e:
+        print(f"Descriptor process pool failed, computing in-process: {e}")
+        # The next large batch starts a fresh pool
+        if pool is not None:
+            _discard_descriptor_pool(pool)
+        return [calculate_rdkit_descriptors(smiles, feature_names) for smiles in smiles_list]
+
+
 # --- Test Block ---
 if __name__ == '__main__':
+    import time
+
     # A valid SMILES string from our database
     valid_smiles = "CC(=O)OC(CC(=O)[O-])C[N+](C)(C)C"
 
@@ -36,7 +185,7 @@ if __name__ == '__main__':
     descriptors = calculate_rdkit_descriptors(valid_smiles)
     if descriptors:
         print(f"✅ SUCCESS: Calculated {len(descriptors)} descriptors.")
-        print(f"First 5 descriptors: {descriptors[:5]}")
+        print(f"First 5 descriptors: {list(descriptors.items())[:5]}")
     else:
         print("❌ FAILURE: Could not calculate descriptors for a valid SMILES.")
 
@@ -47,4 +196,40 @@ if __name__ == '__main__':
     if invalid_descriptors is None:
         print("✅ SUCCESS: Correctly returned None for an invalid SMILES.")
     else:
-        print("❌ FAILURE: Should have returned None for an invalid SMILES.")
\ No newline at end of file
+        print("❌ FAILURE: Should have returned None for an invalid SMILES.")
+
+    print("\n" + "=" * 40 + "\n")
+
+    # Benchmark: full CalcMolDescriptors vs. the model-only descriptor engine
+    benchmark_smiles = [
+        valid_smiles,
+        "O",
+        "CCO",
+        "C(C(CO)O)O",
+        "C1=CC=C(C=C1)C(=O)[O-].[Na+]",
+        "CCCCCCCCCCCCOS(=O)(=O)O",
+        "CCCCC(CC)COC(=O)C1=CC=CC=C1C(=O)OCC(CC)CCCC",
+        "C(C1C(C(C(C(O1)O)O)O)O)O",
+    ]
+    mols = [Chem.MolFromSmiles(s) for s in benchmark_smiles]
+    engine = get_descriptor_engine()
+    rounds = 20
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        full_results = [Descriptors.CalcMolDescriptors(Chem.Mol(m)) for m in mols]
+    full_time = (time.perf_counter() - start) / (rounds * len(mols))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        selected_results = [_calculate_selected_descriptors(Chem.Mol(m), engine) for m in mols]
+    selected_time = (time.perf_counter() - start) / (rounds * len(mols))
+
+    identical = all(
+        all(full[name] == value or (value != value and full[name] != full[name]) for name, value in selected.items())
+        for full, selected in zip(full_results, selected_results)
+    )
+    print(f"Descriptors computed: {len(Descriptors._descList)} (full) vs {len(engine)} (engine)")
+    print(f"Per molecule: {full_time * 1000:.2f} ms (full) vs {selected_time * 1000:.2f} ms (engine), "
+          f"saved {(full_time - selected_time) * 1000:.2f} ms")
+    print(f"{'✅' if identical else '❌'} Retained descriptor values identical: {identical}")
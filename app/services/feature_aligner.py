@@ -0,0 +1,147 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.services.descriptor_store import AlignedFeatures
+
+# Same bounds as the original pandas preprocessing
+MAX_CLIP_VALUE = 1e15
+MIN_CLIP_VALUE = -1e15
+
+# Distinct descriptor-dict key layouts remembered per aligner. RDKit always produces the
+# same keys in the same order, so in practice there are one or two.
+MAX_CACHED_LAYOUTS = 16
+
+
+class FeatureAligner:
+    """
+    Turns descriptor dicts into model input rows without going through pandas.
+
+    The name → column map is built once per model. Each call fills a preallocated
+    float32 matrix, one row per input, with the same preprocessing as the original
+    pandas code in `_preprocess_and_align`:
+
+      - NaN / None values are replaced by the mean of the row's non-NaN values
+        (computed over every key of the dict, like `Series.mean()`)
+      - values are clipped to [-1e15, 1e15]; NaN stays NaN (treated as missing by XGBoost)
+      - features missing from the dict are 0, keys the model doesn't use are ignored
+
+    Values are processed in float64 and only cast to float32 at the end, which is the
+    same rounding XGBoost applies to the float64 DataFrame, so results are bit-identical.
+    """
+
+    def __init__(self, feature_names: Sequence[str]):
+        self.feature_names: List[str] = list(feature_names)
+        self.column_index: Dict[str, int] = {name: col for col, name in enumerate(self.feature_names)}
+        # keys tuple -> (positions in the dict, columns in the row) of the used features
+        self._layouts: Dict[Tuple[str, ...], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.feature_names)
+
+    def _layout(self, keys: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        layout = self._layouts.get(keys)
+        if layout is None:
+            pairs = [(pos, self.column_index[key]) for pos, key in enumerate(keys) if key in self.column_index]
+            layout = (
+                np.fromiter((pos for pos, _ in pairs), dtype=np.intp, count=len(pairs)),
+                np.fromiter((col for _, col in pairs), dtype=np.intp, count=len(pairs)),
+            )
+            if len(self._layouts) >= MAX_CACHED_LAYOUTS:
+                self._layouts.clear()
+            self._layouts[keys] = layout
+        return layout
+
+    def _fill_row(self, out_row: np.ndarray, descriptor_dict: Dict[str, float]):
+        values = np.array(list(descriptor_dict.values()), dtype=np.float64)
+        missing = np.isnan(values)
+        if missing.any():
+            # Series.mean(): NaNs count as 0 in the sum and are left out of the count
+            n_present = values.size - int(np.count_nonzero(missing))
+            mean = np.where(missing, 0.0, values).sum() / n_present if n_present else np.nan
+            values[missing] = mean
+        np.clip(values, MIN_CLIP_VALUE, MAX_CLIP_VALUE, out=values)
+
+        positions, columns = self._layout(tuple(descriptor_dict))
+        out_row[columns] = values[positions]
+
+    def _fill_aligned_row(self, out_row: np.ndarray, features: AlignedFeatures):
+        # Store rows were already filled and clipped at build time, only the columns move
+        positions, columns = self._layout(tuple(features.feature_names))
+        out_row[columns] = features.values[positions]
+
+    def align(self, descriptor_dicts: Sequence[Union[Dict[str, float], AlignedFeatures]]) -> Optional[np.ndarray]:
+        """
+        Returns an N x F float32 matrix, one row per input, in `feature_names` order.
+        Returns None (like `_preprocess_and_align`) if any input is empty or None.
+        """
+        if not descriptor_dicts or not self.feature_names:
+            return None
+
+        out = np.zeros((len(descriptor_dicts), len(self.feature_names)), dtype=np.float32)
+        for row, descriptor_dict in enumerate(descriptor_dicts):
+            if isinstance(descriptor_dict, AlignedFeatures):
+                self._fill_aligned_row(out[row], descriptor_dict)
+            elif not descriptor_dict:
+                return None
+            else:
+                self._fill_row(out[row], descriptor_dict)
+        return out
+
+    def align_one(self, descriptor_dict: Union[Dict[str, float], AlignedFeatures]) -> Optional[np.ndarray]:
+        """Single-input version of `align`; returns a 1 x F matrix or None."""
+        return self.align([descriptor_dict])
+
+
+if __name__ == "__main__":
+    # Bit-compatibility check and microbenchmark against the pandas preprocessing
+    import time
+    import warnings
+
+    from app.services.descriptors import calculate_rdkit_descriptors
+    from app.services.predictor import _preprocess_and_align, get_model_feature_names
+
+    feature_names = get_model_feature_names()
+    aligner = FeatureAligner(feature_names)
+
+    smiles_list = ["CCO", "c1ccccc1", "CC(=O)OC1=CC=CC=C1C(=O)O", "C=O", "ClC(Cl)Cl", "[Na+].[Cl-]", "O"]
+    dicts = [calculate_rdkit_descriptors(smiles) for smiles in smiles_list]
+    # Edge cases: missing values, infinities, a key the model doesn't use, missing features
+    edge = dict(dicts[0])
+    edge[feature_names[0]] = None
+    edge[feature_names[1]] = float("inf")
+    edge[feature_names[2]] = float("nan")
+    edge["NotAFeature"] = 123.0
+    del edge[feature_names[3]]
+    dicts.append(edge)
+    dicts.append({name: None for name in feature_names})
+
+    print("--- Checking bit compatibility ---")
+    mismatches = 0
+    for descriptor_dict in dicts:
+        with warnings.catch_warnings():
+            # pandas warns about downcasting the all-None row
+            warnings.simplefilter("ignore", FutureWarning)
+            expected = _preprocess_and_align(descriptor_dict, feature_names).to_numpy(dtype=np.float32)
+        actual = aligner.align_one(descriptor_dict)
+        if not np.array_equal(expected.view(np.uint32), actual.view(np.uint32)):
+            mismatches += 1
+    print(f"{'✅' if not mismatches else '❌'} {len(dicts) - mismatches}/{len(dicts)} rows bit-identical.")
+
+    print("\n--- Microbenchmark ---")
+    for batch_size in (1, 32):
+        batch = (dicts[:len(smiles_list)] * batch_size)[:batch_size]
+        repeats = max(2000 // batch_size, 20)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            [_preprocess_and_align(d, feature_names) for d in batch]
+        pandas_us = (time.perf_counter() - start) / repeats / batch_size * 1e6
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            aligner.align(batch)
+        numpy_us = (time.perf_counter() - start) / repeats / batch_size * 1e6
+
+        print(f"batch={batch_size:>3}: pandas {pandas_us:8.1f} us/row   numpy {numpy_us:6.1f} us/row   "
+              f"({pandas_us / numpy_us:.0f}x)")
@@ -0,0 +1,261 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, NamedTuple, Optional
+
+from app.core.config import settings
+
+# Values of jobs.status
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised by `JobQueue.submit` when too many jobs are already waiting."""
+
+
+class ClaimedJob(NamedTuple):
+    """A job a worker has taken from the queue, with the worker and the attempt it is on (1-based)."""
+    id: str
+    image_bytes: bytes
+    attempt: int
+    worker: str
+
+
+class JobQueue:
+    """
+    Persistent queue of image analysis jobs in a local SQLite file, shared by the web
+    processes (which submit and poll) and the worker processes (which run the jobs).
+
+    A worker claims a job by moving it to "running" with a lease, which it renews while
+    the job runs (`renew_lease`). Jobs whose lease ran out (the worker died) are claimed
+    again, as are failed attempts, until `max_attempts` is reached. A failed attempt is
+    only retried after a delay that doubles with every attempt, starting at
+    `retry_delay_seconds` and capped at `retry_max_delay_seconds`. Only the worker
+    holding the current attempt can record its outcome, so a worker that outlived its lease never overwrites the attempt of
+    the worker that claimed the job after it. Finished jobs keep their result for
+    `result_ttl_seconds`; their image is dropped as soon as they finish.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3, lease_seconds: float = 300.0,
+                 result_ttl_seconds: float = 86400.0, max_queued: int = 1000,
+                 retry_delay_seconds: float = 5.0, retry_max_delay_seconds: float = 300.0):
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+        self.retry_max_delay_seconds = retry_max_delay_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE where
+        # several processes could race for the same row
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30.0, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                image BLOB,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                lease_expires_at REAL,
+                not_before REAL
+            )
+        """)
+        # Queues created before retries were delayed lack the column
+        columns = {row[1] for row in self._con.execute("PRAGMA table_info(jobs)")}
+        if "not_before" not in columns:
+            try:
+                self._con.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")
+            except sqlite3.OperationalError:
+                pass  # Another process added it first
+        self._con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    def submit(self, image_bytes: bytes) -> str:
+        """Queues an image and returns the new job's ID. Raises QueueFullError if the queue is full."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            queued = self._con.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFullError(f"{queued} jobs are already queued")
+            self._con.execute(
+                "INSERT INTO jobs (id, status, image, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, image_bytes, time.time())
+            )
+        return job_id
+
+    def claim(self, worker: str) -> Optional[ClaimedJob]:
+        """
+        Takes the oldest runnable job (queued and past its retry delay, or running with an
+        expired lease), or returns None.
+        """
+        now = time.time()
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._con.execute("""
+                    SELECT id, image, attempts FROM jobs
+                    WHERE (status = ? AND (not_before IS NULL OR not_before <= ?))
+                       OR (status = ? AND lease_expires_at < ?)
+                    ORDER BY created_at
+                    LIMIT 1
+                """, (STATUS_QUEUED, now, STATUS_RUNNING, now)).fetchone()
+                if row is None:
+                    self._con.execute("COMMIT")
+                    return None
+                job_id, image_bytes, attempts = row
+                if attempts >= self.max_attempts:
+                    # The last attempt's worker died without reporting back
+                    self._finish(job_id, STATUS_FAILED, None, "Worker did not finish the job.", now)
+                    self._con.execute("COMMIT")
+                    return None
+                self._con.execute("""
+                    UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, started_at = ?,
+                                    lease_expires_at = ?, not_before = NULL
+                    WHERE id = ?
+                """, (STATUS_RUNNING, worker, now, now + self.lease_seconds, job_id))
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+        return ClaimedJob(job_id, image_bytes, attempts + 1, worker)
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str], now: float):
+        self._con.execute("""
+            UPDATE jobs SET status = ?, result = ?, error = ?, image = NULL, finished_at = ?,
+                            lease_expires_at = NULL
+            WHERE id = ?
+        """, (status, result, error, now, job_id))
+
+    def _holds_attempt(self, job: ClaimedJob) -> bool:
+        """Whether `job` is still running the attempt its worker claimed."""
+        return self._con.execute(
+            "SELECT 1 FROM jobs WHERE id = ? AND status = ? AND worker = ? AND attempts = ?",
+            (job.id, STATUS_RUNNING, job.worker, job.attempt)
+        ).fetchone() is not None
+
+    def renew_lease(self, job: ClaimedJob) -> bool:
+        """
+        Extends the lease of a running job by `lease_seconds` from now. Returns False if
+        the job was claimed again after the worker's lease ran out (or has finished).
+        """
+        with self._lock:
+            return self._con.execute("""
+                UPDATE jobs SET lease_expires_at = ?
+                WHERE id = ? AND status = ? AND worker = ? AND attempts = ?
+            """, (time.time() + self.lease_seconds, job.id, STATUS_RUNNING, job.worker, job.attempt)).rowcount > 0
+
+    def retry_delay(self, attempt: int) -> float:
+        """Seconds a job waits before it is retried after failed attempt number `attempt`."""
+        return min(self.retry_delay_seconds * 2 ** (attempt - 1), self.retry_max_delay_seconds)
+
+    def complete(self, job: ClaimedJob, result_json: str) -> bool:
+        """
+        Stores the result (a serialized PredictionResponse) of a finished job. Returns
+        False, storing nothing, if the job was claimed again after the worker's lease ran out.
+        """
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                held = self._holds_attempt(job)
+                if held:
+                    self._finish(job.id, STATUS_DONE, result_json, None, time.time())
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+        return held
+
+    def fail(self, job: ClaimedJob, error: str, retry: bool) -> bool:
+        """
+        Records a failed attempt. The job goes back to the queue if `retry` is set and
+        attempts are left, to be claimed again after `retry_delay`, otherwise it fails for
+        good with `error`. Returns False,
+        recording nothing, if the job was claimed again after the worker's lease ran out.
+        """
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                held = self._holds_attempt(job)
+                if held and retry and job.attempt < self.max_attempts:
+                    self._con.execute(
+                        "UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, not_before = ? WHERE id = ?",
+                        (STATUS_QUEUED, error, time.time() + self.retry_delay(job.attempt), job.id)
+                    )
+                elif held:
+                    self._finish(job.id, STATUS_FAILED, None, error, time.time())
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+        return held
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """The job's status, attempts, timestamps, result and error, or None if unknown or expired."""
+        with self._lock:
+            row = self._con.execute("""
+                SELECT id, status, attempts, created_at, started_at, finished_at, result, error
+                FROM jobs WHERE id = ? AND (finished_at IS NULL OR finished_at >= ?)
+            """, (job_id, time.time() - self.result_ttl_seconds)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(
+            ("id", "status", "attempts", "created_at", "started_at", "finished_at", "result", "error"), row
+        ))
+
+    def purge_expired(self) -> int:
+        """Deletes finished jobs older than the result TTL and returns how many were deleted."""
+        with self._lock:
+            return self._con.execute(
+                "DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.result_ttl_seconds,)
+            ).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            counts = dict(self._con.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)}
+
+    def close(self):
+        self._con.close()
+
+
+def create_job_queue() -> JobQueue:
+    """Opens the job queue configured in settings."""
+    return JobQueue(
+        settings.JOB_QUEUE_PATH,
+        settings.JOB_MAX_ATTEMPTS,
+        settings.JOB_LEASE_SECONDS,
+        settings.JOB_RESULT_TTL_SECONDS,
+        settings.JOB_MAX_QUEUED,
+        settings.JOB_RETRY_DELAY_SECONDS,
+        settings.JOB_RETRY_MAX_DELAY_SECONDS
+    )
+
+
+# --- Global Queue ---
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Lazily opens and caches the job queue of this process."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = create_job_queue()
+    return _job_queue
@@ -1,20 +1,147 @@
-from typing import Tuple, Optional
+import threading
+import time
+from typing import List, Tuple, Optional
 from sqlalchemy.orm import Session
 
-from app.crud.carciscan import find_cid_by_synonym_fuzzy
+from app.core.config import settings
+from app.crud.carciscan import get_all_synonyms, get_smiles_by_cids, resolve_ingredients_bulk
+from app.db.reference_store import snapshot_version
+from app.db.session import open_db
+from app.services.negative_lookup import get_negative_lookup_filter
+from app.services.result_cache import DatabaseChangeMonitor
+from app.services.synonym_index import SynonymIndex
 
+# --- Global Index Cache ---
+_synonym_index = None
+_synonym_index_version = None  # reference store snapshot the index was built from
+_synonym_index_failed = False
+_database_monitor = None
+_database_changes = 0  # file changes seen; the index is stale until it covers the latest
+_indexed_changes = 0
+_rebuilding = False
+_synonym_index_lock = threading.Lock()
 
-def find_best_synonym_match(search_term: str, db: Session, score_cutoff: float = 0.95) -> Optional[Tuple[str, int]]:
+
+def _build_synonym_index(db: Session) -> SynonymIndex:
+    print("Building synonym index...")
+    start_time = time.time()
+    index = SynonymIndex(get_all_synonyms(db))
+    print(f"✅ Synonym index built over {len(index)} synonyms in {time.time() - start_time:.2f}s.")
+    return index
+
+
+def _rebuild_synonym_index():
+    """Builds a new index from the current data in the background and swaps it in."""
+    global _synonym_index, _synonym_index_version, _indexed_changes, _rebuilding
+    try:
+        while True:
+            changes = _database_changes
+            with open_db() as db:
+                version = snapshot_version(db)
+                index = _build_synonym_index(db)
+            with _synonym_index_lock:
+                _synonym_index, _synonym_index_version, _indexed_changes = index, version, changes
+                if changes == _database_changes:
+                    _rebuilding = False
+                    return
+    except Exception as e:
+        print(f"❌ Error: Could not rebuild synonym index: {e}")
+        with _synonym_index_lock:
+            _rebuilding = False
+
+
+def get_synonym_index(db: Session) -> Optional[SynonymIndex]:
     """
-    Finds the best matching synonym using the high-performance DuckDB function.
+    Lazily builds and caches the in-memory n-gram index over the synonyms table.
+
+    When the database changes, or `db` is a newer reference store snapshot, a new index
+    is built in the background. Until it is swapped in, and for requests still reading
+    a replaced snapshot, None is returned and callers fall back to the DuckDB scan.
+    Also returns None if the index could not be built.
     """
-    match_result = find_cid_by_synonym_fuzzy(db, search_term, score_cutoff)
+    global _synonym_index, _synonym_index_version, _synonym_index_failed, _database_monitor
+    global _database_changes, _rebuilding
+    version = snapshot_version(db)
+    if _synonym_index is None:
+        with _synonym_index_lock:
+            if _synonym_index is None and not _synonym_index_failed:
+                try:
+                    _database_monitor = DatabaseChangeMonitor(settings.INGREDIENT_CACHE_CHECK_SECONDS)
+                    _synonym_index, _synonym_index_version = _build_synonym_index(db), version
+                except Exception as e:
+                    print(f"❌ Error: Could not build synonym index: {e}")
+                    _synonym_index_failed = True
+            return _synonym_index
+
+    with _synonym_index_lock:
+        if version is None and _database_monitor.changed():
+            _database_changes += 1
+        stale = _indexed_changes != _database_changes if version is None else \
+            _synonym_index_version is None or version > _synonym_index_version
+        if stale and not _rebuilding:
+            _rebuilding = True
+            threading.Thread(target=_rebuild_synonym_index, name="synonym-index-rebuild", daemon=True).start()
+        if stale or (version is not None and version != _synonym_index_version):
+            return None
+        return _synonym_index
+
 
+def find_best_synonym_match(search_term: str, db: Session, score_cutoff: float = 0.95) -> Optional[Tuple[str, int]]:
+    """
+    Finds the best matching synonym for a single name, the same way `resolve_ingredients`
+    resolves whole ingredient lists.
+    """
+    match_result = resolve_ingredients(db, [search_term], score_cutoff)[0]
     if match_result:
-        # match_result is (matched_synonym, cid, score)
-        matched_synonym, cid, score = match_result
-        # We don't need the score in the final output, but it's good for logging
-        print(f"DB Fuzzy Match: '{search_term}' -> '{matched_synonym}' (CID: {cid}, Score: {score:.2f})")
+        matched_synonym, cid, score, _ = match_result
+        print(f"Match: '{search_term}' -> '{matched_synonym}' (CID: {cid}, Score: {score:.2f})")
         return matched_synonym, cid
+    return None
+
+
+def resolve_ingredients(db: Session, search_terms: List[str], score_cutoff: float = 0.95) -> List[
+    Optional[Tuple[str, int, float, Optional[str]]]]:
+    """
+    Same contract as `resolve_ingredients_bulk`, but terms the negative lookup filter
+    rejects (OCR fragments that provably match no synonym) never reach the database,
+    terms without an exact match are fuzzy-matched with the in-memory n-gram index,
+    and terms resolved to nothing are remembered as known misses.
+    """
+    negative_filter = get_negative_lookup_filter(db)
+    index = get_synonym_index(db)
+    candidates = [i for i, term in enumerate(search_terms)
+                  if negative_filter is None or negative_filter.can_match(term, score_cutoff, index)]
+    resolved: List[Optional[Tuple[str, int, float, Optional[str]]]] = [None] * len(search_terms)
+    if not candidates:
+        return resolved
+
+    results = _resolve_terms(db, [search_terms[i] for i in candidates], score_cutoff, index)
+    for i, match_result in zip(candidates, results):
+        resolved[i] = match_result
+    if negative_filter is not None:
+        negative_filter.record_misses(
+            [search_terms[i] for i, match_result in zip(candidates, results) if match_result is None], score_cutoff
+        )
+    return resolved
+
+
+def _resolve_terms(db: Session, search_terms: List[str], score_cutoff: float,
+                   index: Optional[SynonymIndex]) -> List[Optional[Tuple[str, int, float, Optional[str]]]]:
+    """
+    Exact lookups in one query, then the misses through the n-gram index `index` (which
+    gives the same result as the DuckDB scan), or the scan itself while no index is available.
+    """
+    if index is None:
+        return resolve_ingredients_bulk(db, search_terms, score_cutoff)
 
-    return None
\ No newline at end of file
+    resolved = resolve_ingredients_bulk(db, search_terms, score_cutoff, fuzzy=False)
+    fuzzy_matches = {}
+    for i, match_result in enumerate(resolved):
+        if match_result is None:
+            fuzzy_match = index.find_best_match(search_terms[i], score_cutoff)
+            if fuzzy_match is not None:
+                fuzzy_matches[i] = fuzzy_match
+    smiles = get_smiles_by_cids(db, sorted({cid for _, cid, _ in fuzzy_matches.values()}))
+    for i, (matched_synonym, cid, score) in fuzzy_matches.items():
+        resolved[i] = (matched_synonym, cid, score, smiles.get(cid))
+    return resolved
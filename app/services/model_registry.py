@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import xgboost
+from sklearn.multioutput import MultiOutputClassifier
+from sklearn.preprocessing import LabelEncoder, MultiLabelBinarizer
+from xgboost import XGBClassifier
+
+from app.core.config import settings
+from app.services.feature_aligner import FeatureAligner
+
+# --- Registry Layout ---
+# A registry is a directory of model versions plus a pointer to the active one:
+#   CURRENT                       name of the active version directory
+#   <version>/manifest.json       classes, feature_names and booster files of every model
+#   <version>/<model>*.ubj        native XGBoost boosters (Universal Binary JSON)
+# Versions are immutable once written; activating one only rewrites CURRENT.
+REGISTRY_DIR = "ml_models/registry"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+# Pickles the registry was converted from, and the fallback when no registry exists
+PICKLE_PATHS = {
+    "carcinogenicity": "ml_models/carcinogenicity.pkl",
+    "route": "ml_models/route.pkl",
+}
+
+
+def _save_booster(classifier: XGBClassifier, version_dir: str, file_name: str) -> str:
+    classifier.save_model(os.path.join(version_dir, file_name))
+    return file_name
+
+
+def _load_booster(version_dir: str, file_name: str) -> XGBClassifier:
+    classifier = XGBClassifier()
+    classifier.load_model(os.path.join(version_dir, file_name))
+    return classifier
+
+
+def export_model_version(carcinogenicity_data: dict, route_data: dict, version_dir: str, version: str,
+                         source: Optional[Dict[str, str]] = None):
+    """
+    Writes both models, in the dict layout `pickle.load` returns for the .pkl files,
+    to `version_dir` as native boosters plus a JSON manifest.
+    """
+    os.makedirs(version_dir, exist_ok=True)
+
+    carcinogenicity = {
+        "booster": _save_booster(carcinogenicity_data["model"], version_dir, "carcinogenicity.ubj"),
+        "classes": carcinogenicity_data["label_encoder"].classes_.tolist(),
+        "feature_names": list(carcinogenicity_data["feature_names"]),
+    }
+
+    route_model = route_data["model"]
+    route = {
+        "boosters": [
+            _save_booster(estimator, version_dir, f"route_{i}.ubj")
+            for i, estimator in enumerate(route_model.estimators_)
+        ],
+        "classes": route_data["multi_label_binarizer"].classes_.tolist(),
+        "feature_names": list(route_data["feature_names"]),
+        "n_jobs": route_model.n_jobs,
+    }
+
+    manifest = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "xgboost_version": xgboost.__version__,
+        "source": source or {},
+        "carcinogenicity": carcinogenicity,
+        "route": route,
+    }
+    with open(os.path.join(version_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_model_version(version_dir: str) -> dict:
+    """
+    Loads a version directory into {"version", "carcinogenicity", "route"}, where both
+    models have the same dict layout (and estimator types) as the pickled originals.
+    """
+    with open(os.path.join(version_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    carcinogenicity = manifest["carcinogenicity"]
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = np.array(carcinogenicity["classes"])
+
+    route = manifest["route"]
+    route_model = MultiOutputClassifier(XGBClassifier(), n_jobs=route.get("n_jobs"))
+    route_model.estimators_ = [_load_booster(version_dir, file_name) for file_name in route["boosters"]]
+    multi_label_binarizer = MultiLabelBinarizer(classes=route["classes"])
+    multi_label_binarizer.fit([route["classes"]])
+
+    return {
+        "version": manifest["version"],
+        "carcinogenicity": {
+            "model": _load_booster(version_dir, carcinogenicity["booster"]),
+            "label_encoder": label_encoder,
+            "feature_names": carcinogenicity["feature_names"],
+            "feature_aligner": FeatureAligner(carcinogenicity["feature_names"]),
+        },
+        "route": {
+            "model": route_model,
+            "multi_label_binarizer": multi_label_binarizer,
+            "feature_names": route["feature_names"],
+            "feature_aligner": FeatureAligner(route["feature_names"]),
+        },
+    }
+
+
+def read_current_version(registry_dir: str = REGISTRY_DIR) -> Optional[str]:
+    """Returns the version CURRENT points to, or None if there is no registry."""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def activate_model_version(version: str, registry_dir: str = REGISTRY_DIR):
+    """
+    Points CURRENT at `version`. The pointer is replaced atomically (write + rename),
+    so a running service never reads a half-written file.
+    """
+    if not os.path.exists(os.path.join(registry_dir, version, MANIFEST_FILE)):
+        raise FileNotFoundError(f"No model version '{version}' in {registry_dir}")
+    tmp_path = os.path.join(registry_dir, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(registry_dir, CURRENT_FILE))
+
+
+def pickle_version(paths: List[str]) -> str:
+    """Version name for models loaded straight from pickles: a hash of the files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return f"pkl-{digest.hexdigest()[:12]}"
+
+
+class ModelRegistry:
+    """
+    Holds the active model bundle and swaps it when CURRENT changes.
+
+    `current()` returns the bundle for the version CURRENT points to. At most every
+    `check_interval` seconds it re-reads CURRENT; if the version changed, the new
+    version is loaded completely on the calling thread and only then swapped in with
+    a single reference assignment, so callers always see either the old or the new
+    bundle, never a mix. Other threads keep using the old bundle while it loads.
+    """
+
+    def __init__(self, registry_dir: str = REGISTRY_DIR, check_interval: float = 5.0):
+        self.registry_dir = registry_dir
+        self.check_interval = check_interval
+        self._bundle: Optional[dict] = None
+        self._last_check = float("-inf")
+        self._reload_lock = threading.Lock()
+
+    def current(self) -> Optional[dict]:
+        """Returns the active bundle, or None if the registry has no usable version."""
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self._check_for_update(wait=self._bundle is None)
+        return self._bundle
+
+    def _check_for_update(self, wait: bool):
+        if not self._reload_lock.acquire(blocking=wait):
+            return
+        try:
+            self._last_check = time.monotonic()
+            version = read_current_version(self.registry_dir)
+            if version is None or (self._bundle is not None and self._bundle["version"] == version):
+                return
+            self.reload(version)
+        finally:
+            self._reload_lock.release()
+
+    def reload(self, version: str):
+        """Loads `version` and makes it the active bundle. Keeps the old one on failure."""
+        start_time = time.time()
+        try:
+            bundle = load_model_version(os.path.join(self.registry_dir, version))
+        except Exception as e:
+            print(f"❌ Error: Could not load model version '{version}': {e}")
+            return
+        previous = self._bundle["version"] if self._bundle is not None else None
+        self._bundle = bundle
+        if previous is None:
+            print(f"✅ Model version '{version}' loaded in {time.time() - start_time:.2f}s.")
+        else:
+            print(f"✅ Model version swapped from '{previous}' to '{version}' in {time.time() - start_time:.2f}s.")
+
+
+# --- Global Registry Cache ---
+_model_registry = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """Lazily creates and caches the model registry."""
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = ModelRegistry(REGISTRY_DIR, settings.MODEL_RELOAD_CHECK_SECONDS)
+    return _model_registry
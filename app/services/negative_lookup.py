@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.carciscan import get_all_normalized_keys, get_synonym_lengths
+from app.db.reference_store import ReferenceSnapshot, snapshot_version
+from app.services.parser import normalize_ingredient_name
+from app.services.result_cache import DatabaseChangeMonitor, database_fingerprint, ingredient_key
+from app.services.synonym_index import SynonymIndex, min_length_ratio
+
+# About 1% false positives. A false positive only means the term is looked up in the database.
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+
+
+def _hash_pair(value: str):
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+    # The second hash must be odd so the probe sequence never collapses onto one bit
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """Bloom filter over strings, stored as a packed NumPy bit array (double hashing)."""
+
+    def __init__(self, n_bits: int, n_hashes: int = BLOOM_HASHES, bits: Optional[np.ndarray] = None):
+        self.n_bits = max(int(n_bits), 64)
+        self.n_hashes = n_hashes
+        self.bits = bits if bits is not None else np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+
+    @classmethod
+    def from_values(cls, values: List[str]) -> "BloomFilter":
+        bloom = cls(len(values) * BLOOM_BITS_PER_KEY)
+        if values:
+            positions = bloom._positions(values).ravel()
+            np.bitwise_or.at(bloom.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+        return bloom
+
+    def _positions(self, values: List[str]) -> np.ndarray:
+        hashes = np.array([_hash_pair(value) for value in values], dtype=np.uint64)
+        probes = np.arange(self.n_hashes, dtype=np.uint64)
+        # uint64 arithmetic wraps around, which is fine for hashing
+        return (hashes[:, :1] + probes * hashes[:, 1:]) % np.uint64(self.n_bits)
+
+    def __contains__(self, value: str) -> bool:
+        positions = self._positions([value])[0]
+        return bool(np.all((self.bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1))
+
+
+class NegativeLookupFilter:
+    """
+    Rejects ingredient names that `resolve_ingredients_bulk` cannot resolve, without
+    querying the database. A term is rejected if
+
+    - it is a known miss: the database already returned no match for it at this cutoff, or
+    - its normalized key is not in `synonyms_norm` (checked with a Bloom filter, which
+      never misses a key that exists) and no synonym length lies within the window
+      the Jaro-Winkler cutoff allows (see `min_length_ratio`), or, given the synonym
+      index, no synonym's Jaro-Winkler bound reaches the cutoff (`SynonymIndex.may_match`).
+
+    Everything is persisted in a SQLite file together with the fingerprint of the
+    database it was built from, and rebuilt when the database changes.
+    """
+
+    def __init__(self, path: str, max_known_misses: int):
+        self.max_known_misses = max_known_misses
+        self._lock = threading.Lock()
+        self.counters = {"rejected_known": 0, "rejected_length": 0, "rejected_bound": 0, "passed": 0, "recorded": 0}
+        self.synonym_lengths = np.zeros(0, dtype=np.int64)
+        self.normalized_keys: Optional[BloomFilter] = None
+        self._known_misses: Dict[bytes, None] = {}  # insertion-ordered, oldest first
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB)")
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS known_misses (
+                digest BLOB PRIMARY KEY,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._con.commit()
+
+    def _get_meta(self, key: str):
+        row = self._con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, db: Session):
+        """Loads the persisted filter if it was built from this database, otherwise rebuilds it."""
+        # An in-memory snapshot holds the data of the file as it was when it was loaded
+        fingerprint = json.dumps(db.fingerprint if isinstance(db, ReferenceSnapshot) else database_fingerprint())
+        with self._lock:
+            if self._get_meta("db_fingerprint") == fingerprint:
+                self.synonym_lengths = np.array(json.loads(self._get_meta("synonym_lengths")), dtype=np.int64)
+                bloom_params = json.loads(self._get_meta("bloom_params"))
+                self.normalized_keys = None if bloom_params is None else BloomFilter(
+                    bloom_params["n_bits"], bloom_params["n_hashes"],
+                    np.frombuffer(self._get_meta("bloom_bits"), dtype=np.uint8).copy()
+                )
+                self._known_misses = dict.fromkeys(
+                    row[0] for row in self._con.execute("SELECT digest FROM known_misses ORDER BY created_at")
+                )
+                print(f"Negative lookup filter loaded with {len(self._known_misses)} known misses.")
+                return
+            self._rebuild(db, fingerprint)
+
+    def _rebuild(self, db: Session, fingerprint: str):
+        start_time = time.time()
+        synonym_lengths = np.array(get_synonym_lengths(db), dtype=np.int64)
+        keys = get_all_normalized_keys(db)
+        normalized_keys = BloomFilter.from_values(keys) if keys else None
+
+        bloom_params = None
+        if normalized_keys is not None:
+            bloom_params = {"n_bits": normalized_keys.n_bits, "n_hashes": normalized_keys.n_hashes}
+        self._con.execute("DELETE FROM known_misses")
+        self._con.execute("DELETE FROM meta")
+        self._con.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("synonym_lengths", json.dumps(synonym_lengths.tolist())),
+            ("bloom_params", json.dumps(bloom_params)),
+            ("bloom_bits", normalized_keys.bits.tobytes() if normalized_keys is not None else None),
+            ("db_fingerprint", fingerprint),
+        ])
+        self._con.commit()
+        # Swapped in only once complete; lookups keep using the previous state meanwhile
+        self._known_misses = {}
+        self.synonym_lengths, self.normalized_keys = synonym_lengths, normalized_keys
+        print(f"✅ Negative lookup filter built over {len(keys)} normalized keys and "
+              f"{len(self.synonym_lengths)} synonym lengths in {time.time() - start_time:.2f}s.")
+
+    @staticmethod
+    def _miss_digest(term: str, score_cutoff: float) -> bytes:
+        return hashlib.blake2b(f"{score_cutoff!r}\0{ingredient_key(term)}".encode("utf-8"), digest_size=16).digest()
+
+    def _length_window_is_empty(self, term: str, score_cutoff: float) -> bool:
+        term = ingredient_key(term)
+        if not term.isascii():
+            # Python and DuckDB may lowercase non-ASCII characters to different byte lengths
+            return False
+        # Same window as resolve_ingredients_bulk
+        ratio = max(min_length_ratio(score_cutoff), 1e-9)
+        min_length, max_length = len(term) * ratio, len(term) / ratio
+        i = np.searchsorted(self.synonym_lengths, min_length, side="left")
+        return i == len(self.synonym_lengths) or self.synonym_lengths[i] > max_length
+
+    def can_match(self, term: str, score_cutoff: float, synonym_index: Optional[SynonymIndex] = None) -> bool:
+        """
+        False if `term` provably resolves to no synonym at `score_cutoff`. `synonym_index`
+        must be the index the term's fuzzy match would be looked up in, if any.
+        """
+        if self._miss_digest(term, score_cutoff) in self._known_misses:
+            reason = "rejected_known"
+        else:
+            norm_key = normalize_ingredient_name(term)
+            may_be_exact = bool(norm_key) and self.normalized_keys is not None and norm_key in self.normalized_keys
+            if may_be_exact:
+                reason = "passed"
+            elif self._length_window_is_empty(term, score_cutoff):
+                reason = "rejected_length"
+            elif synonym_index is not None and not synonym_index.may_match(term, score_cutoff):
+                reason = "rejected_bound"
+            else:
+                reason = "passed"
+        with self._lock:
+            self.counters[reason] += 1
+        return reason == "passed"
+
+    def record_misses(self, terms: Iterable[str], score_cutoff: float):
+        """Remembers terms the database resolved to nothing, dropping the oldest beyond the limit."""
+        now = time.time()
+        with self._lock:
+            new = [digest for digest in (self._miss_digest(term, score_cutoff) for term in terms)
+                   if digest not in self._known_misses]
+            if not new:
+                return
+            self._known_misses.update(dict.fromkeys(new))
+            self._con.executemany("INSERT OR IGNORE INTO known_misses VALUES (?, ?)", [(d, now) for d in new])
+            excess = len(self._known_misses) - self.max_known_misses
+            if excess > 0:
+                oldest = list(self._known_misses)[:excess]
+                for digest in oldest:
+                    del self._known_misses[digest]
+                self._con.executemany("DELETE FROM known_misses WHERE digest = ?", [(d,) for d in oldest])
+            self._con.commit()
+            self.counters["recorded"] += len(new)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.counters, "known_misses": len(self._known_misses)}
+
+
+# --- Global Filter ---
+_negative_lookup_filter = None
+_database_monitor = None
+_negative_lookup_version = None  # reference store snapshot the filter was loaded from
+_negative_lookup_lock = threading.Lock()
+
+
+def get_negative_lookup_filter(db: Session) -> Optional[NegativeLookupFilter]:
+    """
+    Lazily loads (or builds) the negative lookup filter and rebuilds it when the database
+    changes, or when `db` is a newer reference store snapshot. Returns None if it is
+    disabled or could not be built, and for requests still reading a replaced snapshot.
+    """
+    global _negative_lookup_filter, _database_monitor, _negative_lookup_version
+    if not settings.NEGATIVE_LOOKUP_ENABLED:
+        return None
+    version = snapshot_version(db)
+    if _negative_lookup_filter is not None:
+        if version is None and not _database_monitor.changed():
+            return _negative_lookup_filter
+        if version is not None and _negative_lookup_version is not None and version <= _negative_lookup_version:
+            # Requests still reading a replaced snapshot skip the filter and query it directly
+            return _negative_lookup_filter if version == _negative_lookup_version else None
+    with _negative_lookup_lock:
+        try:
+            if _negative_lookup_filter is None:
+                _database_monitor = DatabaseChangeMonitor(settings.INGREDIENT_CACHE_CHECK_SECONDS)
+                negative_filter = NegativeLookupFilter(
+                    settings.NEGATIVE_LOOKUP_PATH, settings.NEGATIVE_LOOKUP_MAX_TERMS
+                )
+                negative_filter.load(db)
+                _negative_lookup_filter, _negative_lookup_version = negative_filter, version
+            elif version is None:
+                _negative_lookup_filter.load(db)
+            elif _negative_lookup_version is None or version > _negative_lookup_version:
+                _negative_lookup_filter.load(db)
+                _negative_lookup_version = version
+            elif version < _negative_lookup_version:
+                return None
+        except Exception as e:
+            print(f"❌ Error: Could not load the negative lookup filter: {e}")
+            return None
+    return _negative_lookup_filter
+
+
+def get_negative_lookup_metrics() -> Optional[Dict[str, int]]:
+    """Counters of the negative lookup filter, or None if it was never loaded."""
+    return _negative_lookup_filter.stats() if _negative_lookup_filter is not None else None
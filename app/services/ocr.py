@@ -1,13 +1,50 @@
+import asyncio
+import queue
 import re
-from typing import Optional
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
 
+import cv2
 import numpy as np
+import paddleocr
 from paddleocr import PaddleOCR
 
+from app.core.config import settings
+from app.services.image_preprocess import ImageRejectedError, prepare_image
+from app.services.ocr_cache import OcrCache, config_fingerprint, content_hash, perceptual_hash
+
+# Tuned PaddleOCR parameters for document OCR
+OCR_MODEL_PARAMS = {
+    "use_doc_orientation_classify": False,
+    "use_doc_unwarping": False,
+    "use_textline_orientation": False,
+    "text_det_limit_side_len": 480,
+    "text_det_limit_type": "max",
+    "lang": "en",
+}
+
 # --- Global Model Cache ---
 _ocr_model = None
 
 
+class OcrQueueFullError(Exception):
+    """Raised when an image is submitted while the OCR queue is full."""
+
+
+class OcrOutput(NamedTuple):
+    """Text extracted from one upload, and whether it came from the OCR cache."""
+    text: Optional[str]
+    cache_hit: bool = False
+
+
+def create_ocr_model() -> PaddleOCR:
+    """
+    Creates a new PaddleOCR instance with tuned parameters for document OCR.
+    """
+    return PaddleOCR(**OCR_MODEL_PARAMS)
+
+
 def get_ocr_model():
     """
     Lazily initializes and returns a cached PaddleOCR instance
@@ -16,19 +53,48 @@ def get_ocr_model():
     global _ocr_model
     if _ocr_model is None:
         print("Loading PaddleOCR model...")
-        _ocr_model = PaddleOCR(
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False,
-            use_textline_orientation=False,
-            text_det_limit_side_len=480,
-            text_det_limit_type="max",
-            lang="en"
-        )
+        _ocr_model = create_ocr_model()
         print("PaddleOCR model loaded")
     return _ocr_model
 
 
-def extract_text_from_image(image_bytes: bytes) -> Optional[str]:
+def warm_up_ocr_model(model: PaddleOCR):
+    """
+    Runs one OCR pass over a small synthetic label, so the first real image doesn't pay
+    for graph initialization and memory allocation inside PaddleOCR.
+    """
+    img = np.full((96, 480, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "Ingredients: Water", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    model.predict(img)
+
+
+def _decode_image(image_bytes: bytes) -> Optional[np.ndarray]:
+    """
+    Converts raw image bytes to an upright numpy array (OpenCV-style), decoded at reduced
+    scale where possible (see `prepare_image`). Returns None if the image is refused.
+    """
+    try:
+        return prepare_image(image_bytes)
+    except ImageRejectedError as e:
+        print(f"Failed to decode image bytes: {e}")
+        return None
+
+
+def _text_from_result(result) -> str:
+    """
+    Collects all recognized text lines from one image's OCR result and normalizes them.
+    """
+    all_texts = []
+    for res in result:
+        texts = res["rec_texts"]
+        if texts:
+            all_texts.append(" ".join(texts))
+
+    combined = " ".join(all_texts)
+    return _normalize_ocr_text(combined)
+
+
+def extract_text_from_image(image_bytes: bytes, model: Optional[PaddleOCR] = None) -> Optional[str]:
     """
     Extracts text from an image using PaddleOCR.
 
@@ -36,41 +102,51 @@ def extract_text_from_image(image_bytes: bytes) -> Optional[str]:
 
     Args:
         image_bytes: Raw bytes of the image.
+        model: The PaddleOCR instance to use. Defaults to the shared cached model.
 
     Returns:
         Normalized string of all detected text, or None on failure.
     """
-    model = get_ocr_model()
+    if model is None:
+        model = get_ocr_model()
 
     try:
-        # Convert bytes to numpy array (OpenCV-style)
-        import cv2
-
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
+        img = _decode_image(image_bytes)
         if img is None:
-            print("Failed to decode image bytes")
             return None
 
         # Run OCR
         result = model.predict(img)
-
-        # Collect all recognized text lines
-        all_texts = []
-        for res in result:
-            texts = res["rec_texts"]
-            if texts:
-                all_texts.append(" ".join(texts))
-
-        combined = " ".join(all_texts)
-        return _normalize_ocr_text(combined)
+        return _text_from_result(result)
 
     except Exception as e:
         print(f"An error occurred during OCR processing: {e}")
         return None
 
 
+def extract_text_from_images(images: List[np.ndarray], model: PaddleOCR) -> List[Optional[str]]:
+    """
+    Runs OCR over several decoded images in a single `model.predict` call.
+
+    Returns one normalized text per image, in order. If the batched call fails,
+    each image is retried on its own so one bad image only fails itself.
+    """
+    try:
+        results = model.predict(images)
+        return [_text_from_result([result]) for result in results]
+    except Exception as e:
+        print(f"Batched OCR failed, retrying image by image: {e}")
+
+    texts = []
+    for img in images:
+        try:
+            texts.append(_text_from_result(model.predict(img)))
+        except Exception as e:
+            print(f"An error occurred during OCR processing: {e}")
+            texts.append(None)
+    return texts
+
+
 def _normalize_ocr_text(text: str) -> str:
     """
     Normalizes text: lowercase, collapse whitespace.
@@ -83,6 +159,316 @@ def _normalize_ocr_text(text: str) -> str:
     return text
 
 
+def _resolve_future(future: asyncio.Future, result=None, error: Optional[BaseException] = None):
+    """Completes an asyncio future from its own event loop, unless the caller gave up on it."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _OcrJob(NamedTuple):
+    image_bytes: bytes
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    submitted_at: float
+    content_key: Optional[str]
+
+
+class OcrBatchMetrics:
+    """
+    Thread-safe counters describing how well the OCR micro-batcher is doing.
+    """
+
+    def __init__(self, max_batch_size: int):
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.images = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+        self.total_batching_wait = 0.0
+
+    def record(self, batch_size: int, queue_delays: List[float], batching_wait: float):
+        with self._lock:
+            self.batches += 1
+            self.images += batch_size
+            self.total_queue_delay += sum(queue_delays)
+            self.max_queue_delay = max([self.max_queue_delay] + queue_delays)
+            self.total_batching_wait += batching_wait
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns:
+          batches / images: totals since startup
+          avg_batch_size and fill_rate: images per batch, and that as a share of the max batch size
+          avg_queue_delay_ms / max_queue_delay_ms: time from submission until the batch started
+          avg_batching_wait_ms: the part of that delay spent holding a batch open for more images
+        """
+        with self._lock:
+            avg_batch_size = self.images / self.batches if self.batches else 0.0
+            return {
+                "batches": self.batches,
+                "images": self.images,
+                "avg_batch_size": round(avg_batch_size, 3),
+                "fill_rate": round(avg_batch_size / self.max_batch_size, 3) if self.max_batch_size else 0.0,
+                "avg_queue_delay_ms": round(1000 * self.total_queue_delay / self.images, 2) if self.images else 0.0,
+                "max_queue_delay_ms": round(1000 * self.max_queue_delay, 2),
+                "avg_batching_wait_ms": round(1000 * self.total_batching_wait / self.batches, 2) if self.batches else 0.0,
+            }
+
+
+class OcrExecutor:
+    """
+    Runs OCR on a fixed pool of worker threads, so OCR never blocks the event loop.
+
+    Each worker owns its own PaddleOCR instance. Submitted images wait in a bounded
+    queue; when it is full, `submit` fails fast with OcrQueueFullError instead of
+    letting requests pile up behind a saturated OCR pool.
+
+    Workers micro-batch: after taking an image off the queue, a worker keeps collecting
+    images for up to `max_batch_wait_ms` (or until `max_batch_size`), runs them through
+    one `model.predict` call and routes each text back to its caller.
+    """
+
+    def __init__(self, workers: int, queue_size: int, max_batch_size: int = 1, max_batch_wait_ms: int = 0):
+        self.workers = max(workers, 1)
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_batch_wait = max(max_batch_wait_ms, 0) / 1000.0
+        self.metrics = OcrBatchMetrics(self.max_batch_size)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._threads = []
+        self._ready = threading.Barrier(self.workers + 1)
+
+    def start(self):
+        """Starts the worker threads and waits until every worker has loaded its model."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"ocr-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._ready.wait()
+        print(f"✅ OCR executor started with {self.workers} workers "
+              f"(batches of up to {self.max_batch_size}, {self.max_batch_wait * 1000:.0f} ms window).")
+
+    def shutdown(self):
+        """Stops the workers after they finish the images already queued."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, image_bytes: bytes) -> OcrOutput:
+        """
+        Queues an image for OCR and waits for its text. An upload already in the OCR cache
+        is answered without queueing.
+        Raises OcrQueueFullError immediately if the queue is full.
+        """
+        cache = get_ocr_cache()
+        content_key = None
+        if cache is not None:
+            content_key = await asyncio.to_thread(content_hash, image_bytes)
+            cached_text = await asyncio.to_thread(cache.get_by_content, content_key)
+            if cached_text is not None:
+                return OcrOutput(cached_text, cache_hit=True)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            self._queue.put_nowait(_OcrJob(image_bytes, loop, future, time.monotonic(), content_key))
+        except queue.Full:
+            raise OcrQueueFullError("OCR queue is full")
+        return await future
+
+    def _collect_batch(self, first_job) -> tuple:
+        """
+        Collects more jobs after `first_job` until the batch is full or the window closes.
+        Returns (jobs, stop), where stop is True if a shutdown sentinel was taken.
+        """
+        jobs = [first_job]
+        deadline = time.monotonic() + self.max_batch_wait
+        while len(jobs) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return jobs, True
+            jobs.append(job)
+        return jobs, False
+
+    def _run_batch(self, model: Optional[PaddleOCR], jobs: List["_OcrJob"], batching_wait: float):
+        started = time.monotonic()
+        jobs = [job for job in jobs if not job.future.cancelled()]
+        if not jobs:
+            return
+        self.metrics.record(len(jobs), [started - job.submitted_at for job in jobs], batching_wait)
+
+        if model is None:
+            error = RuntimeError("OCR model is not available")
+            for job in jobs:
+                job.loop.call_soon_threadsafe(_resolve_future, job.future, None, error)
+            return
+
+        # Undecodable images and near-duplicates of cached images are answered right away
+        # and left out of the batch
+        cache = get_ocr_cache()
+        decoded = []  # (job, image, perceptual_key)
+        for job in jobs:
+            img = _decode_image(job.image_bytes)
+            if img is None:
+                job.loop.call_soon_threadsafe(_resolve_future, job.future, OcrOutput(None))
+                continue
+            perceptual_key = None
+            if cache is not None and settings.OCR_CACHE_PERCEPTUAL_HASH:
+                perceptual_key = perceptual_hash(img)
+                cached_text = cache.get_by_perceptual(perceptual_key)
+                if cached_text is not None:
+                    job.loop.call_soon_threadsafe(_resolve_future, job.future, OcrOutput(cached_text, cache_hit=True))
+                    continue
+            elif cache is not None:
+                cache.record_miss()
+            decoded.append((job, img, perceptual_key))
+        if not decoded:
+            return
+
+        try:
+            texts = extract_text_from_images([img for _, img, _ in decoded], model)
+        except BaseException as e:
+            for job, _, _ in decoded:
+                job.loop.call_soon_threadsafe(_resolve_future, job.future, None, e)
+            return
+
+        for (job, _, perceptual_key), text in zip(decoded, texts):
+            job.loop.call_soon_threadsafe(_resolve_future, job.future, OcrOutput(text))
+            if cache is not None and text is not None and job.content_key is not None:
+                try:
+                    cache.put(job.content_key, perceptual_key, text)
+                except Exception as e:
+                    print(f"Could not store OCR result in cache: {e}")
+
+    def _worker_loop(self):
+        model = None
+        try:
+            model = create_ocr_model()
+            warm_up_ocr_model(model)
+        except Exception as e:
+            print(f"❌ Error: OCR worker could not load PaddleOCR: {e}")
+        finally:
+            self._ready.wait()
+
+        stop = False
+        while not stop:
+            job = self._queue.get()
+            if job is None:
+                break
+            jobs = [job]
+            try:
+                collect_start = time.monotonic()
+                jobs, stop = self._collect_batch(job)
+                self._run_batch(model, jobs, time.monotonic() - collect_start)
+            except Exception as e:
+                # A failed batch must not take the worker down with it, or its requests would wait forever
+                print(f"❌ Error: OCR batch failed: {e}")
+                for failed_job in jobs:
+                    try:
+                        failed_job.loop.call_soon_threadsafe(_resolve_future, failed_job.future, None, e)
+                    except RuntimeError:
+                        pass  # The request's event loop is closed
+
+
+def get_ocr_metrics() -> Optional[Dict[str, float]]:
+    """
+    Returns the OCR batching metrics, or None if the executor hasn't been started.
+    """
+    if _ocr_executor is None:
+        return None
+    metrics = _ocr_executor.metrics.snapshot()
+    metrics["queue_depth"] = _ocr_executor.queue_depth()
+    if _ocr_cache is not None:
+        metrics["cache"] = _ocr_cache.stats()
+    return metrics
+
+
+# --- Global OCR Cache ---
+_ocr_cache = None
+_ocr_cache_checked = False
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OcrCache]:
+    """
+    Lazily opens and caches the persistent OCR result cache.
+    Returns None if caching is disabled or the cache file can't be opened.
+
+    The cache is tied to a fingerprint of everything that changes OCR output
+    (model parameters, PaddleOCR version and decode scale), so changing any of them
+    invalidates previously cached texts.
+    """
+    global _ocr_cache, _ocr_cache_checked
+    with _ocr_cache_lock:
+        if not _ocr_cache_checked:
+            _ocr_cache_checked = True
+            if settings.OCR_CACHE_ENABLED:
+                config = {
+                    "model_params": OCR_MODEL_PARAMS,
+                    "paddleocr_version": getattr(paddleocr, "__version__", None),
+                    "decode_target_side": settings.OCR_DECODE_TARGET_SIDE,
+                }
+                try:
+                    _ocr_cache = OcrCache(
+                        settings.OCR_CACHE_PATH,
+                        config_fingerprint(config),
+                        settings.OCR_CACHE_MAX_ENTRIES,
+                        settings.OCR_CACHE_MAX_BYTES,
+                        settings.OCR_CACHE_TTL_SECONDS
+                    )
+                except Exception as e:
+                    print(f"❌ Error: Could not open OCR cache at {settings.OCR_CACHE_PATH}: {e}")
+    return _ocr_cache
+
+
+# --- Global Executor Cache ---
+_ocr_executor = None
+_ocr_executor_lock = threading.Lock()
+
+
+def get_ocr_executor(queue_size: Optional[int] = None) -> OcrExecutor:
+    """
+    Lazily creates, starts and caches the OCR executor, sized from settings. `queue_size`
+    overrides `settings.OCR_QUEUE_SIZE`; it only applies if this call starts the executor.
+    """
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            print("Starting OCR executor...")
+            executor = OcrExecutor(
+                settings.OCR_WORKERS,
+                queue_size or settings.OCR_QUEUE_SIZE,
+                settings.OCR_MAX_BATCH_SIZE,
+                settings.OCR_MAX_BATCH_WAIT_MS
+            )
+            executor.start()
+            _ocr_executor = executor
+    return _ocr_executor
+
+
+def shutdown_ocr_executor():
+    """Stops the OCR executor, if it was started."""
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is not None:
+            _ocr_executor.shutdown()
+            _ocr_executor = None
+            print("OCR executor stopped.")
+
+
 if __name__ == "__main__":
     # Quick local test — read an image directly into bytes
     try:
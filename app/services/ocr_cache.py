@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+# Hits only note their access time in memory. The times are written to the cache file
+# before every put (eviction depends on them), or once this many hits or seconds pile up.
+ACCESS_FLUSH_ENTRIES = 64
+ACCESS_FLUSH_SECONDS = 30.0
+
+
+def content_hash(image_bytes: bytes) -> str:
+    """SHA-256 of the raw upload."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(img: np.ndarray) -> str:
+    """
+    64-bit difference hash (dHash) of a decoded image, as 16 hex characters.
+
+    The image is shrunk to 9x8 grayscale and each bit records whether a pixel is brighter
+    than its right-hand neighbour, so re-encodes and small rescales of the same photo
+    usually produce the same hash. Only exact hash matches are treated as hits: a flipped
+    bit just costs an OCR run, while a loose match could return another label's text.
+    Even exact matches can come from a different label with the same layout, since the
+    hash does not depend on the text; that is why OCR_CACHE_PERCEPTUAL_HASH is off by default.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):016x}"
+
+
+def config_fingerprint(config: dict) -> str:
+    """Stable hash of the OCR configuration; cached texts are only valid for the same one."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class OcrCache:
+    """
+    Persistent OCR result cache in a local SQLite file.
+
+    Entries are looked up by content hash first and by perceptual hash second.
+    Entries are evicted least-recently-used once the cache holds more than `max_entries`
+    rows or `max_bytes` of text, and expire `ttl_seconds` after they were written.
+    Entries written under a different OCR configuration are dropped when the cache opens.
+
+    The number of entries and their total size are kept up to date by triggers in a
+    single meta row, so checking the limits doesn't scan the table. Access times of hits
+    are written in batches (see ACCESS_FLUSH_ENTRIES), so the LRU order can lag behind
+    by a few hits, or lose them if the process dies.
+    """
+
+    def __init__(self, path: str, config_hash: str, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.config_hash = config_hash
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.counters = {"hits_content": 0, "hits_perceptual": 0, "misses": 0, "evictions": 0}
+        self._pending_access: Dict[str, float] = {}
+        self._last_access_flush = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                content_hash TEXT PRIMARY KEY,
+                perceptual_hash TEXT,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                config_hash TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._con.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_phash ON ocr_cache (perceptual_hash)")
+        self._con.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_access ON ocr_cache (last_access)")
+        self._con.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_created ON ocr_cache (created_at)")
+
+        # Running totals, seeded once from the table (other processes may be opening the same file)
+        self._con.execute("BEGIN IMMEDIATE")
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_cache_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                entries INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            )
+        """)
+        self._con.execute("""
+            CREATE TRIGGER IF NOT EXISTS ocr_cache_meta_insert AFTER INSERT ON ocr_cache BEGIN
+                UPDATE ocr_cache_meta SET entries = entries + 1, bytes = bytes + NEW.size;
+            END
+        """)
+        self._con.execute("""
+            CREATE TRIGGER IF NOT EXISTS ocr_cache_meta_delete AFTER DELETE ON ocr_cache BEGIN
+                UPDATE ocr_cache_meta SET entries = entries - 1, bytes = bytes - OLD.size;
+            END
+        """)
+        self._con.execute("""
+            CREATE TRIGGER IF NOT EXISTS ocr_cache_meta_update AFTER UPDATE OF size ON ocr_cache BEGIN
+                UPDATE ocr_cache_meta SET bytes = bytes - OLD.size + NEW.size;
+            END
+        """)
+        self._con.execute("""
+            INSERT OR IGNORE INTO ocr_cache_meta
+            SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache
+        """)
+        self._con.commit()
+
+        # Invalidate everything produced by another OCR configuration
+        dropped = self._con.execute("DELETE FROM ocr_cache WHERE config_hash != ?", (config_hash,)).rowcount
+        self._con.commit()
+        if dropped:
+            print(f"OCR cache: dropped {dropped} entries from a previous OCR configuration.")
+
+    def _lookup(self, column: str, key: str) -> Optional[str]:
+        now = time.time()
+        row = self._con.execute(
+            f"SELECT content_hash, text FROM ocr_cache WHERE {column} = ? AND created_at >= ? LIMIT 1",
+            (key, now - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        self._pending_access[row[0]] = now
+        if (len(self._pending_access) >= ACCESS_FLUSH_ENTRIES
+                or time.monotonic() - self._last_access_flush >= ACCESS_FLUSH_SECONDS):
+            self._flush_access_times()
+            self._con.commit()
+        return row[1]
+
+    def _flush_access_times(self):
+        """Writes the access times of the hits since the last flush (the caller commits)."""
+        if self._pending_access:
+            self._con.executemany(
+                "UPDATE ocr_cache SET last_access = ? WHERE content_hash = ?",
+                [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._last_access_flush = time.monotonic()
+
+    def _totals(self) -> Tuple[int, int]:
+        """(entries, bytes) from the meta row."""
+        return self._con.execute("SELECT entries, bytes FROM ocr_cache_meta").fetchone()
+
+    def get_by_content(self, content_key: str) -> Optional[str]:
+        """Returns the cached text for an exact upload, or None."""
+        with self._lock:
+            text = self._lookup("content_hash", content_key)
+            if text is not None:
+                self.counters["hits_content"] += 1
+        return text
+
+    def get_by_perceptual(self, perceptual_key: str) -> Optional[str]:
+        """Returns the cached text for a visually identical image, or None (counted as a miss)."""
+        with self._lock:
+            text = self._lookup("perceptual_hash", perceptual_key)
+            self.counters["hits_perceptual" if text is not None else "misses"] += 1
+        return text
+
+    def record_miss(self):
+        """Counts a miss for an image that was not looked up by perceptual hash."""
+        with self._lock:
+            self.counters["misses"] += 1
+
+    def _evict_oldest(self, count: int) -> int:
+        return self._con.execute(
+            "DELETE FROM ocr_cache WHERE content_hash IN "
+            "(SELECT content_hash FROM ocr_cache ORDER BY last_access LIMIT ?)", (count,)
+        ).rowcount
+
+    def put(self, content_key: str, perceptual_key: Optional[str], text: str):
+        """Stores an OCR result and evicts expired and least-recently-used entries."""
+        now = time.time()
+        with self._lock:
+            self._flush_access_times()
+            # An upsert rather than INSERT OR REPLACE: the rows REPLACE deletes don't fire the delete trigger
+            self._con.execute("""
+                INSERT INTO ocr_cache VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (content_hash) DO UPDATE SET
+                    perceptual_hash = excluded.perceptual_hash, text = excluded.text, size = excluded.size,
+                    config_hash = excluded.config_hash, created_at = excluded.created_at,
+                    last_access = excluded.last_access
+            """, (content_key, perceptual_key, text, len(text.encode("utf-8")), self.config_hash, now, now))
+            evicted = self._con.execute(
+                "DELETE FROM ocr_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+
+            count, total_bytes = self._totals()
+            if count > self.max_entries:
+                evicted += self._evict_oldest(count - self.max_entries)
+                count, total_bytes = self._totals()
+            while total_bytes > self.max_bytes and count > 0:
+                evicted += self._evict_oldest(max(1, count // 10))
+                count, total_bytes = self._totals()
+
+            self._con.commit()
+            self.counters["evictions"] += evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, total_bytes = self._totals()
+        return {**self.counters, "entries": count, "bytes": total_bytes}
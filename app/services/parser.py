@@ -52,3 +52,15 @@ def parse_ingredients(text: str) -> List[str]:
             unique_ingredients.append(ing)
 
     return unique_ingredients
+
+
+def normalize_ingredient_name(name: str) -> str:
+    """
+    Builds the normalized lookup key for an ingredient or synonym name:
+    lowercased, with every run of whitespace and punctuation folded into a single space.
+
+    e.g. "Sodium  Benzoate" and "sodium-benzoate" both become "sodium benzoate".
+    """
+    if not name:
+        return ""
+    return re.sub(r'[\W_]+', ' ', name.lower()).strip()
@@ -1,49 +1,139 @@
 import pickle
+import threading
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Union
+from app.core.config import settings
 from app.core.constants import IARC_EVIDENCE
+from app.services.descriptor_store import AlignedFeatures
+from app.services.feature_aligner import FeatureAligner
+from app.services.model_registry import PICKLE_PATHS, get_model_registry, pickle_version
+from app.services.tree_engine import build_flat_model, check_equivalence
 
 # --- Global Model Caches ---
-# We load models into memory when the application starts.
+# Models come from the model registry (see model_registry.py and convert_models.py).
+# The pickles are only loaded if no registry version has been activated.
 _carcinogenicity_model_data = None
 _route_model_data = None
+_pickle_model_version = None
+# The warmup loads the models from several threads at once; each pickle is loaded once
+_pickle_lock = threading.Lock()
 
 
-def get_carcinogenicity_model_data():
-    """Loads and caches the carcinogenicity model data."""
+def _load_pickled_carcinogenicity():
     global _carcinogenicity_model_data
     if _carcinogenicity_model_data is None:
-        try:
-            model_path = "ml_models/carcinogenicity.pkl"
-            with open(model_path, 'rb') as f:
-                _carcinogenicity_model_data = pickle.load(f)
-            print("✅ Carcinogenicity model and encoder loaded successfully.")
-        except FileNotFoundError:
-            print(f"❌ Error: Carcinogenicity model file not found at {model_path}")
-            _carcinogenicity_model_data = {"error": "Model file not found"}
+        with _pickle_lock:
+            if _carcinogenicity_model_data is None:
+                try:
+                    model_path = PICKLE_PATHS["carcinogenicity"]
+                    with open(model_path, 'rb') as f:
+                        model_data = pickle.load(f)
+                    get_feature_aligner(model_data)
+                    print("✅ Carcinogenicity model and encoder loaded successfully.")
+                except FileNotFoundError:
+                    print(f"❌ Error: Carcinogenicity model file not found at {model_path}")
+                    model_data = {"error": "Model file not found"}
+                # Published only once complete, so no thread sees a half-prepared model
+                _carcinogenicity_model_data = model_data
     return _carcinogenicity_model_data
 
 
-def get_route_model_data():
-    """Loads and caches the route model data."""
+def _load_pickled_route():
     global _route_model_data
     if _route_model_data is None:
-        try:
-            model_path = "ml_models/route.pkl"
-            with open(model_path, 'rb') as f:
-                _route_model_data = pickle.load(f)
-            print("✅ Route model and binarizer loaded successfully.")
-        except FileNotFoundError:
-            print(f"❌ Error: Route model file not found at {model_path}")
-            _route_model_data = {"error": "Model file not found"}
+        with _pickle_lock:
+            if _route_model_data is None:
+                try:
+                    model_path = PICKLE_PATHS["route"]
+                    with open(model_path, 'rb') as f:
+                        model_data = pickle.load(f)
+                    get_feature_aligner(model_data)
+                    print("✅ Route model and binarizer loaded successfully.")
+                except FileNotFoundError:
+                    print(f"❌ Error: Route model file not found at {model_path}")
+                    model_data = {"error": "Model file not found"}
+                _route_model_data = model_data
     return _route_model_data
 
 
+def _pickle_version() -> Optional[str]:
+    global _pickle_model_version
+    if _pickle_model_version is None:
+        with _pickle_lock:
+            if _pickle_model_version is None:
+                try:
+                    _pickle_model_version = pickle_version(list(PICKLE_PATHS.values()))
+                except FileNotFoundError:
+                    return None
+    return _pickle_model_version
+
+
+def get_active_models() -> dict:
+    """
+    Returns the active models as one bundle: {"version", "carcinogenicity", "route"}.
+
+    This is the registry's current bundle, or the pickles if no registry version has
+    been activated. Resolve it once per request or batch and pass it on: separate calls
+    to the getters below may straddle a model swap and mix two versions.
+    """
+    bundle = get_model_registry().current()
+    if bundle is not None:
+        return bundle
+    return {"version": _pickle_version(), "carcinogenicity": _load_pickled_carcinogenicity(), "route": _load_pickled_route()}
+
+
+def get_carcinogenicity_model_data():
+    """Returns the active carcinogenicity model data, loading and caching the pickle if there is no registry."""
+    return get_active_models()["carcinogenicity"]
+
+
+def get_route_model_data():
+    """Returns the active route model data, loading and caching the pickle if there is no registry."""
+    return get_active_models()["route"]
+
+
+def get_model_version() -> Optional[str]:
+    """
+    Returns the version of the active models: the registry version, or `pkl-<hash>`
+    of the pickle files when they are used directly. None if the pickles are missing too.
+    """
+    bundle = get_model_registry().current()
+    if bundle is not None:
+        return bundle["version"]
+    return _pickle_version()
+
+
+def get_model_feature_names(models: Optional[dict] = None) -> List[str]:
+    """
+    Returns the union of the feature names used by the models of `models` (default: the
+    active bundle), in first-seen order.
+    """
+    models = models or get_active_models()
+    feature_names = []
+    for model_data in (models["carcinogenicity"], models["route"]):
+        for name in model_data.get('feature_names', []):
+            if name not in feature_names:
+                feature_names.append(name)
+    return feature_names
+
+
 # --- Helper function for preprocessing ---
-def _preprocess_and_align(descriptor_dict: Dict[str, float], feature_names: List[str]) -> Optional[pd.DataFrame]:
+# Reference implementation of the preprocessing. Requests go through FeatureAligner,
+# which is bit-compatible with it (see `python -m app.services.feature_aligner`).
+def _preprocess_and_align(descriptor_dict: Union[Dict[str, float], AlignedFeatures], feature_names: List[str]) -> Optional[pd.DataFrame]:
     # ... (This function is perfect as designed above, let's copy it in)
-    if not descriptor_dict or not feature_names:
+    if descriptor_dict is None or not feature_names:
+        return None
+
+    # Rows from the descriptor store were already filled and clipped at build time,
+    # they only need their columns matched to this model.
+    if isinstance(descriptor_dict, AlignedFeatures):
+        aligned_series = pd.Series(descriptor_dict.values, index=descriptor_dict.feature_names)
+        aligned_series = aligned_series.reindex(feature_names, fill_value=0)
+        return pd.DataFrame([aligned_series])
+
+    if not descriptor_dict:
         return None
 
     input_series = pd.Series(descriptor_dict)
@@ -56,60 +146,188 @@ def _preprocess_and_align(descriptor_dict: Dict[str, float], feature_names: List
     return aligned_df
 
 
+def get_feature_aligner(model_data: dict) -> FeatureAligner:
+    """
+    Returns the FeatureAligner for a loaded model, building it if the loader didn't.
+    It is stored in `model_data`, so it lives exactly as long as that model version.
+    """
+    aligner = model_data.get('feature_aligner')
+    if aligner is None:
+        aligner = FeatureAligner(model_data['feature_names'])
+        model_data['feature_aligner'] = aligner
+    return aligner
+
+
+# XGBClassifier.predict labels a binary:logistic row positive when its probability is above this
+BINARY_DECISION_THRESHOLD = 0.5
+
+
+def get_inference_model(model_data: dict, engine: str, batch_size: int):
+    """
+    Returns the model to run a batch of `batch_size` rows on.
+
+    With engine "flat", the trees are flattened (see tree_engine.py) the first time
+    they are needed, checked against the native predictor, and kept in `model_data`.
+    Batches above `settings.FLAT_ENGINE_MAX_BATCH`, or a model whose flattened form
+    failed the check, run on the native XGBoost predictor.
+    """
+    if engine != "flat" or batch_size > settings.FLAT_ENGINE_MAX_BATCH:
+        return model_data['model']
+    if 'flat_model' not in model_data:
+        try:
+            flat_model = build_flat_model(model_data['model'])
+            problem = check_equivalence(model_data['model'], flat_model, len(model_data['feature_names']))
+        except Exception as e:
+            flat_model, problem = None, str(e)
+        if problem is not None:
+            print(f"❌ Error: Flat tree engine not used, it does not match the native model: {problem}")
+            flat_model = None
+        else:
+            print("✅ Flat tree engine built and verified.")
+        model_data['flat_model'] = flat_model
+    return model_data['flat_model'] or model_data['model']
+
+
+def _carcinogenicity_results(model, encoder, features: np.ndarray) -> List[dict]:
+    """
+    Runs the carcinogenicity model once over every row of `features`.
+
+    Only the probability pass is run: for multi:softmax, `model.predict` is the argmax
+    of the same class scores `predict_proba` softmaxes, so the label is derived from it.
+    """
+    probability_rows = model.predict_proba(features)
+    predicted_indices = np.argmax(probability_rows, axis=1)
+    predicted_labels = encoder.inverse_transform(model.classes_[predicted_indices])
+
+    results = []
+    for predicted_label, probabilities in zip(predicted_labels, probability_rows):
+        confidence_scores = dict(zip(encoder.classes_, probabilities))
+        evidence = IARC_EVIDENCE.get(predicted_label, "Evidence not available.")
+        results.append({
+            "prediction": predicted_label,
+            "confidence_scores": confidence_scores,
+            "evidence": evidence
+        })
+    return results
+
+
+def _route_results(model, mlb, features: np.ndarray) -> List[dict]:
+    """
+    Runs the multi-output route model once over every row of `features`.
+
+    Only the probability pass is run; each label is predicted with its binary
+    estimator's own decision rule (positive probability above 0.5).
+    """
+    # proba_list holds one (N, 2) array per route label
+    proba_list = model.predict_proba(features)
+    predicted_matrix = np.column_stack([
+        estimator.classes_[(p[:, 1] > BINARY_DECISION_THRESHOLD).astype(int)]
+        for estimator, p in zip(model.estimators_, proba_list)
+    ])
+    predicted_routes = mlb.inverse_transform(predicted_matrix)
+
+    results = []
+    for row_index, routes in enumerate(predicted_routes):
+        positive_probabilities = [p[row_index][1] for p in proba_list]
+        confidence_scores = dict(zip(mlb.classes_, positive_probabilities))
+        results.append({"prediction": list(routes), "confidence_scores": confidence_scores})
+    return results
+
+
 # --- UPDATED Carcinogenicity Prediction ---
-def predict_carcinogenicity(descriptor_dict: Dict[str, float]) -> dict[str, dict[Any, Any] | Any] | None:
-    model_data = get_carcinogenicity_model_data()
+def predict_carcinogenicity(descriptor_dict: Dict[str, float], model_data: Optional[dict] = None) -> dict[str, dict[Any, Any] | Any] | None:
+    model_data = model_data or get_carcinogenicity_model_data()
     if "error" in model_data:
         return None
-    model = model_data['model']
+    model = get_inference_model(model_data, settings.CARCINOGENICITY_ENGINE, 1)
     encoder = model_data['label_encoder']
-    feature_names = model_data['feature_names']
 
-    aligned_df = _preprocess_and_align(descriptor_dict, feature_names)
-    if aligned_df is None:
+    features = get_feature_aligner(model_data).align_one(descriptor_dict)
+    if features is None:
         return None
 
     try:
-        predicted_index = model.predict(aligned_df)[0]
-        probabilities = model.predict_proba(aligned_df)[0]
-        predicted_label = encoder.inverse_transform([predicted_index])[0]
-        confidence_scores = dict(zip(encoder.classes_, probabilities))
-        evidence = IARC_EVIDENCE.get(predicted_label, "Evidence not available.")
-        return {
-            "prediction": predicted_label,
-            "confidence_scores": confidence_scores,
-            "evidence": evidence
-        }
+        return _carcinogenicity_results(model, encoder, features)[0]
     except Exception as e:
         print(f"An error occurred during carcinogenicity prediction: {e}")
         return None
 
 
+def predict_carcinogenicity_batch(descriptor_dicts: List[Union[Dict[str, float], AlignedFeatures]],
+                                  model_data: Optional[dict] = None) -> List[Optional[dict]]:
+    """
+    Predicts carcinogenicity for many descriptor dicts with a single model call, using
+    `model_data` (from the bundle of `get_active_models`) or else the active model.
+
+    Each input is either a raw descriptor dict or precomputed `AlignedFeatures`.
+    Returns one entry per input, in the same order. An entry is None wherever
+    `predict_carcinogenicity` would have returned None for that input.
+    If the batched call fails, each row is retried on its own so that one bad row
+    cannot fail the whole request.
+    """
+    if not descriptor_dicts:
+        return []
+    model_data = model_data or get_carcinogenicity_model_data()
+    if "error" in model_data:
+        return [None] * len(descriptor_dicts)
+
+    features = get_feature_aligner(model_data).align(descriptor_dicts)
+    if features is None:
+        return [predict_carcinogenicity(descriptor_dict, model_data) for descriptor_dict in descriptor_dicts]
+
+    try:
+        model = get_inference_model(model_data, settings.CARCINOGENICITY_ENGINE, len(features))
+        return _carcinogenicity_results(model, model_data['label_encoder'], features)
+    except Exception as e:
+        print(f"Batched carcinogenicity prediction failed, retrying row by row: {e}")
+        return [predict_carcinogenicity(descriptor_dict, model_data) for descriptor_dict in descriptor_dicts]
+
+
 # --- UPDATED Route Prediction ---
-def predict_route(descriptor_dict: Dict[str, float]) -> Optional[Dict[str, float]]:
-    model_data = get_route_model_data()
+def predict_route(descriptor_dict: Dict[str, float], model_data: Optional[dict] = None) -> Optional[Dict[str, float]]:
+    model_data = model_data or get_route_model_data()
     if "error" in model_data:
         return None
-    model = model_data['model']
+    model = get_inference_model(model_data, settings.ROUTE_ENGINE, 1)
     mlb = model_data['multi_label_binarizer']
-    feature_names = model_data['feature_names']
 
-    aligned_df = _preprocess_and_align(descriptor_dict, feature_names)
-    if aligned_df is None:
+    features = get_feature_aligner(model_data).align_one(descriptor_dict)
+    if features is None:
         return None
 
     try:
-        predicted_matrix = model.predict(aligned_df)
-        proba_list = model.predict_proba(aligned_df)
-        positive_probabilities = [p[0][1] for p in proba_list]
-        predicted_routes = mlb.inverse_transform(predicted_matrix)[0]
-        confidence_scores = dict(zip(mlb.classes_, positive_probabilities))
-        return {"prediction": list(predicted_routes), "confidence_scores": confidence_scores}
+        return _route_results(model, mlb, features)[0]
     except Exception as e:
         print(f"An error occurred during route prediction: {e}")
         return None
 
 
+def predict_route_batch(descriptor_dicts: List[Union[Dict[str, float], AlignedFeatures]],
+                        model_data: Optional[dict] = None) -> List[Optional[dict]]:
+    """
+    Predicts exposure routes for many descriptor dicts with a single model call.
+
+    Same contract as `predict_carcinogenicity_batch`: one entry per input, in order,
+    None where `predict_route` would have returned None.
+    """
+    if not descriptor_dicts:
+        return []
+    model_data = model_data or get_route_model_data()
+    if "error" in model_data:
+        return [None] * len(descriptor_dicts)
+
+    features = get_feature_aligner(model_data).align(descriptor_dicts)
+    if features is None:
+        return [predict_route(descriptor_dict, model_data) for descriptor_dict in descriptor_dicts]
+
+    try:
+        model = get_inference_model(model_data, settings.ROUTE_ENGINE, len(features))
+        return _route_results(model, model_data['multi_label_binarizer'], features)
+    except Exception as e:
+        print(f"Batched route prediction failed, retrying row by row: {e}")
+        return [predict_route(descriptor_dict, model_data) for descriptor_dict in descriptor_dicts]
+
+
 # --- Updated Test Block ---
 if __name__ == '__main__':
     # Test Carcinogenicity Model
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a maximum entry count and a per-entry TTL.
+
+    Entries past their TTL are dropped when they are looked up; the least recently
+    used entry is evicted whenever an insert would exceed `max_entries`.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value for `key`, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        """Drops every entry (counted as one invalidation)."""
+        with self._lock:
+            self._entries.clear()
+            self.counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.counters, "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+def database_fingerprint(database_url: str = None) -> Optional[Tuple]:
+    """
+    Size and modification time of the DuckDB database file and its write-ahead log.
+    Changes whenever the database is written to. None if the URL is not a file.
+    """
+    path = make_url(database_url or settings.DATABASE_URL).database
+    if not path or path == ":memory:":
+        return None
+    fingerprint = []
+    for file_path in (path, path + ".wal"):
+        try:
+            stat = os.stat(file_path)
+            fingerprint.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+
+def ingredient_key(ingredient_name: str) -> str:
+    """
+    Normalized ingredient name that results are cached and shared under. Matching compares
+    lowercased names (exact and fuzzy), so case is the only normalization that can never
+    change a result.
+    """
+    return ingredient_name.lower()
+
+
+class DatabaseChangeMonitor:
+    """
+    Detects writes to the database file by comparing its fingerprint (see
+    `database_fingerprint`) with the last one seen, at most every `check_interval` seconds.
+    """
+
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self.fingerprint = database_fingerprint()
+        self._last_check = time.monotonic()
+        self._lock = threading.Lock()
+
+    def changed(self) -> bool:
+        """True (once) if the database changed since the previous call that returned True."""
+        if time.monotonic() - self._last_check < self.check_interval:
+            return False
+        with self._lock:
+            if time.monotonic() - self._last_check < self.check_interval:
+                return False
+            self._last_check = time.monotonic()
+            fingerprint = database_fingerprint()
+            if fingerprint == self.fingerprint:
+                return False
+            self.fingerprint = fingerprint
+            return True
+
+
+class IngredientResultCache:
+    """
+    Cache of end-to-end ingredient results, keyed by (ingredient key, version), where the
+    version is the model version (and the reference store snapshot, if lookups run in memory).
+
+    The version is part of the key, so a model or snapshot swap never serves old results.
+    The database file is fingerprinted at most every `check_interval` seconds, and the
+    whole cache is cleared as soon as the fingerprint changes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, check_interval: float = 5.0):
+        self.cache = LRUCache(max_entries, ttl_seconds)
+        self.database_monitor = DatabaseChangeMonitor(check_interval)
+
+    def _check_database(self):
+        if self.database_monitor.changed():
+            self.cache.clear()
+            print("Ingredient result cache cleared: the database changed.")
+
+    def get(self, ingredient_name: str, version: Hashable) -> Optional[Any]:
+        self._check_database()
+        return self.cache.get((ingredient_key(ingredient_name), version))
+
+    def put(self, ingredient_name: str, version: Hashable, result: Any):
+        self.cache.put((ingredient_key(ingredient_name), version), result)
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
+
+
+# --- Global Cache ---
+_ingredient_cache = None
+_ingredient_cache_lock = threading.Lock()
+
+
+def get_ingredient_cache() -> Optional[IngredientResultCache]:
+    """Lazily creates the ingredient result cache. Returns None if it is disabled."""
+    global _ingredient_cache
+    if not settings.INGREDIENT_CACHE_ENABLED:
+        return None
+    with _ingredient_cache_lock:
+        if _ingredient_cache is None:
+            _ingredient_cache = IngredientResultCache(
+                settings.INGREDIENT_CACHE_MAX_ENTRIES,
+                settings.INGREDIENT_CACHE_TTL_SECONDS,
+                settings.INGREDIENT_CACHE_CHECK_SECONDS
+            )
+    return _ingredient_cache
+
+
+def get_ingredient_cache_metrics() -> Optional[Dict[str, int]]:
+    """Counters of the ingredient result cache, or None if it was never used."""
+    return _ingredient_cache.stats() if _ingredient_cache is not None else None
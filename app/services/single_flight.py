@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same key: the first caller (the leader)
+    computes, every caller arriving while it runs (a follower) waits for and shares
+    the leader's result or exception. Nothing is kept once the computation is done.
+
+    Leaders must always `complete` the keys they acquired, or followers wait forever.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"computations": 0, "coalesced": 0}
+
+    def acquire(self, key: Hashable) -> Tuple[Future, bool]:
+        """Returns the future of `key` and whether the caller is its leader."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.counters["computations"] += 1
+            return future, True
+
+    def complete(self, key: Hashable, result: Any = None, exception: BaseException = None):
+        """Publishes the leader's result (or exception) to the followers of `key`."""
+        with self._lock:
+            future = self._in_flight.pop(key)
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Runs `fn` unless a computation of `key` is already in flight, then returns its result."""
+        future, leader = self.acquire(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self.complete(key, exception=e)
+                raise
+            self.complete(key, result)
+        return future.result()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Like `do`, for asyncio callers: `fn` runs in a thread and followers await it."""
+        future, leader = self.acquire(key)
+        if leader:
+            try:
+                result = await asyncio.to_thread(fn)
+            except BaseException as e:
+                self.complete(key, exception=e)
+                raise
+            self.complete(key, result)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.counters, "in_flight": len(self._in_flight)}
+
+
+# --- Global Single-Flight Group ---
+_ingredient_flight = SingleFlight()
+
+
+def get_ingredient_flight() -> SingleFlight:
+    """Single-flight group of the ingredient resolution pipeline."""
+    return _ingredient_flight
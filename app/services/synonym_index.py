@@ -0,0 +1,410 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# --- Matching Parameters ---
+# Mirrors DuckDB's jaro_winkler_similarity: prefix scale 0.1, up to 4 prefix characters,
+# and the Winkler boost is only applied once the Jaro similarity is above 0.7.
+WINKLER_PREFIX_SCALE = 0.1
+WINKLER_MAX_PREFIX = 4
+WINKLER_BOOST_THRESHOLD = 0.7
+
+NGRAM_SIZE = 3
+# How many of the best-overlapping synonyms are scored first, to find a good match early.
+# Every other synonym is then only scored if its score bound can still beat that match.
+MAX_CANDIDATES = 128
+# The overlap is counted over the term's rarest n-grams only, up to this many posting
+# entries in total, so the early pass costs the same on any table size.
+NGRAM_POSTING_BUDGET = 16384
+
+# Byte classes of the per-synonym histograms behind that score bound. Letters, digits and
+# common punctuation get a class each; all other bytes share the last classes. Merging
+# bytes into one class can only loosen the bound, never make it wrong.
+HISTOGRAM_CLASSES = 48
+HISTOGRAM_PUNCTUATION = b" -,()'[]"
+
+# Lowest cutoff the prefix filter (see `SynonymIndex._prefix_candidates`) is built for.
+# Lookups with a lower cutoff bound every synonym in their length window instead.
+PREFIX_FILTER_CUTOFF = 0.95
+# Synonyms longer than this (in bytes) don't fit the uint8 histograms and are always bounded
+MAX_HISTOGRAM_LENGTH = 255
+
+
+def _byte_class_table() -> np.ndarray:
+    table = np.empty(256, dtype=np.intp)
+    shared = len(HISTOGRAM_PUNCTUATION) + 36
+    for byte in range(256):
+        if ord("a") <= byte <= ord("z"):
+            table[byte] = byte - ord("a")
+        elif ord("0") <= byte <= ord("9"):
+            table[byte] = 26 + byte - ord("0")
+        elif byte in HISTOGRAM_PUNCTUATION:
+            table[byte] = 36 + HISTOGRAM_PUNCTUATION.index(byte)
+        else:
+            table[byte] = shared + byte % (HISTOGRAM_CLASSES - shared)
+    return table
+
+
+_BYTE_CLASS = _byte_class_table()
+
+
+def jaro_winkler_similarity(s1: bytes, s2: bytes) -> float:
+    """
+    Jaro-Winkler similarity, computed exactly the way DuckDB does it.
+
+    DuckDB compares the raw UTF-8 bytes of both strings (not characters), so callers
+    should pass `str.encode("utf-8")` output to get identical scores.
+    """
+    len1, len2 = len(s1), len(s2)
+    if not len1 or not len2:
+        return 0.0
+
+    match_distance = max(max(len1, len2) // 2 - 1, 0)
+    s1_matched = [False] * len1
+    s2_matched = [False] * len2
+
+    matches = 0
+    for i in range(len1):
+        start = max(0, i - match_distance)
+        end = min(i + match_distance + 1, len2)
+        for j in range(start, end):
+            if not s2_matched[j] and s1[i] == s2[j]:
+                s1_matched[i] = True
+                s2_matched[j] = True
+                matches += 1
+                break
+
+    if not matches:
+        return 0.0
+
+    transpositions = 0
+    k = 0
+    for i in range(len1):
+        if s1_matched[i]:
+            while not s2_matched[k]:
+                k += 1
+            if s1[i] != s2[k]:
+                transpositions += 1
+            k += 1
+
+    jaro = (matches / len1 + matches / len2 + (matches - transpositions // 2) / matches) / 3.0
+    if jaro <= WINKLER_BOOST_THRESHOLD:
+        return jaro
+
+    prefix = 0
+    for a, b in zip(s1[:WINKLER_MAX_PREFIX], s2[:WINKLER_MAX_PREFIX]):
+        if a != b:
+            break
+        prefix += 1
+    return jaro + prefix * WINKLER_PREFIX_SCALE * (1.0 - jaro)
+
+
+def min_length_ratio(score_cutoff: float) -> float:
+    """
+    Smallest shorter/longer length ratio at which two strings can still reach `score_cutoff`.
+
+    The Winkler boost is at most 0.4 * (1 - jaro), so jaro >= (cutoff - 0.4) / 0.6.
+    Jaro itself is at most (2 + shorter / longer) / 3, which bounds the length ratio.
+    """
+    max_boost = WINKLER_MAX_PREFIX * WINKLER_PREFIX_SCALE
+    min_jaro = (score_cutoff - max_boost) / (1.0 - max_boost)
+    return max(3.0 * min_jaro - 2.0, 0.0)
+
+
+def min_common_bytes(term_length: int, min_length: int, score_cutoff: float,
+                     prefix: int = WINKLER_MAX_PREFIX) -> int:
+    """
+    Smallest number of bytes a term of `term_length` must have in common (as multisets)
+    with a synonym of at least `min_length` bytes, sharing at most `prefix` leading
+    bytes with it, to still reach `score_cutoff`.
+
+    Jaro matches pair up equal bytes, so m matches need m common bytes, and
+    jaro <= (m / len1 + m / len2 + 1) / 3 must reach the same minimum as in
+    `min_length_ratio`, given the boost of the shared prefix.
+    """
+    max_boost = prefix * WINKLER_PREFIX_SCALE
+    min_jaro = (score_cutoff - max_boost) / (1.0 - max_boost)
+    needed = (3.0 * min_jaro - 1.0) / (1.0 / term_length + 1.0 / max(min_length, 1))
+    return max(int(np.ceil(needed - 1e-9)), 1)
+
+
+def _pack_prefix(key: bytes) -> int:
+    """The first WINKLER_MAX_PREFIX bytes of `key` as a big-endian integer, zero-padded."""
+    return int.from_bytes(key[:WINKLER_MAX_PREFIX].ljust(WINKLER_MAX_PREFIX, b"\0"), "big")
+
+
+def _ngrams(key: bytes) -> set:
+    """Returns the set of padded byte n-grams for a lowercased synonym."""
+    padded = b" " * (NGRAM_SIZE - 1) + key + b" " * (NGRAM_SIZE - 1)
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+class SynonymIndex:
+    """
+    In-memory n-gram inverted index over the `synonyms` table.
+
+    Lookups first score the synonyms that share the most n-grams with the search term
+    (and whose length can still reach the cutoff). Other synonyms are then only scored
+    if an upper bound on their Jaro-Winkler score, from byte histograms and the shared
+    prefix, can still beat the best match found. That bound is only computed for the
+    synonyms a prefix filter over the histograms lets through, not for the whole length
+    window. The result is the same as the full-table scan of `find_cid_by_synonym_fuzzy`.
+    """
+
+    def __init__(self, rows: Sequence[Tuple[str, int]]):
+        # Rows are stored sorted by key length, so row ids inside every posting list are
+        # ordered by length too and the length window becomes a contiguous slice.
+        entries = sorted(
+            ((synonym.lower().encode("utf-8"), synonym, cid) for synonym, cid in rows if synonym is not None),
+            key=lambda entry: len(entry[0])
+        )
+        self._keys: List[bytes] = [entry[0] for entry in entries]
+        self.synonyms: List[str] = [entry[1] for entry in entries]
+        self.cids: List[int] = [entry[2] for entry in entries]
+
+        postings: Dict[bytes, List[int]] = defaultdict(list)
+        for row_id, key in enumerate(self._keys):
+            for gram in _ngrams(key):
+                postings[gram].append(row_id)
+
+        self._lengths = np.fromiter((len(k) for k in self._keys), dtype=np.int32, count=len(self._keys))
+        self._postings: Dict[bytes, np.ndarray] = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+
+        # Byte class counts (capped at 255, see `_score_bounds`) and the first bytes of every key
+        self._histograms = np.zeros((len(self._keys), HISTOGRAM_CLASSES), dtype=np.uint8)
+        for row_id, key in enumerate(self._keys):
+            counts = np.bincount(_BYTE_CLASS[np.frombuffer(key, dtype=np.uint8)], minlength=HISTOGRAM_CLASSES)
+            self._histograms[row_id] = np.minimum(counts, 255)
+        self._prefixes = np.fromiter((_pack_prefix(key) for key in self._keys), dtype=np.uint32, count=len(self._keys))
+
+        self._build_prefix_filter()
+
+    def _build_prefix_filter(self):
+        """
+        Lists every synonym under the rarest "pairs" of its histogram only.
+
+        A pair (class, k) stands for the k-th byte of a class, so two histograms have as
+        many bytes in common as they share pairs. Pairs are ranked by how many synonyms
+        hold them. A synonym that must share `needed` pairs with a term shares one of
+        its first `len - needed + 1` pairs in that ranking (the term's too), so each
+        synonym is only listed under as many of its rarest pairs as the lowest `needed`
+        of any term at `PREFIX_FILTER_CUTOFF` requires, together with the pair's position
+        in its own ranking.
+        """
+        pair_count = HISTOGRAM_CLASSES * (MAX_HISTOGRAM_LENGTH + 1)
+        frequencies = np.zeros(pair_count, dtype=np.int64)
+        for byte_class in range(HISTOGRAM_CLASSES):
+            at_count = np.bincount(self._histograms[:, byte_class], minlength=MAX_HISTOGRAM_LENGTH + 1)
+            at_least = np.cumsum(at_count[::-1])[::-1]
+            start = byte_class * (MAX_HISTOGRAM_LENGTH + 1)
+            frequencies[start + 1:start + MAX_HISTOGRAM_LENGTH + 1] = at_least[1:]
+        ranking = np.lexsort((np.arange(pair_count), frequencies))
+        self._pair_ranks = np.empty(pair_count, dtype=np.int32)
+        self._pair_ranks[ranking] = np.arange(pair_count, dtype=np.int32)
+
+        ratio = min_length_ratio(PREFIX_FILTER_CUTOFF)
+        lengths = np.arange(MAX_HISTOGRAM_LENGTH + 1)
+        prefix_sizes = np.zeros(MAX_HISTOGRAM_LENGTH + 2, dtype=np.int32)
+        for length in lengths[1:].tolist():
+            shortest_term = max(int(np.ceil(length * ratio - 1e-9)), 1)
+            prefix_sizes[length] = length - min_common_bytes(shortest_term, length, PREFIX_FILTER_CUTOFF) + 1
+        quota = prefix_sizes[np.minimum(self._lengths, MAX_HISTOGRAM_LENGTH + 1)]
+        self._long_rows = np.flatnonzero(self._lengths > MAX_HISTOGRAM_LENGTH).astype(np.int32)
+
+        class_rows = [np.flatnonzero(self._histograms[:, byte_class]) for byte_class in range(HISTOGRAM_CLASSES)]
+        class_counts = [self._histograms[rows, byte_class] for byte_class, rows in enumerate(class_rows)]
+        listed = np.zeros(len(self._keys), dtype=np.int32)
+        self._prefix_postings: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        for pair in ranking[frequencies[ranking] > 0].tolist():
+            byte_class, k = divmod(pair, MAX_HISTOGRAM_LENGTH + 1)
+            row_ids = class_rows[byte_class][class_counts[byte_class] >= k]
+            row_ids = row_ids[listed[row_ids] < quota[row_ids]]
+            if len(row_ids):
+                self._prefix_postings[pair] = (row_ids.astype(np.int32), listed[row_ids].astype(np.uint8))
+                listed[row_ids] += 1
+
+    def __len__(self) -> int:
+        return len(self.synonyms)
+
+    def _length_window(self, key: bytes, score_cutoff: float) -> Tuple[int, int]:
+        """Row range of the synonyms whose length alone does not rule out reaching the cutoff."""
+        ratio = min_length_ratio(score_cutoff)
+        min_length = np.ceil(len(key) * ratio - 1e-9) if ratio else 0
+        max_length = min(np.floor(len(key) / ratio + 1e-9), np.iinfo(np.int32).max) if ratio else np.iinfo(np.int32).max
+        # int32 like the lengths: any other type makes searchsorted convert the whole array
+        first_row = int(np.searchsorted(self._lengths, np.int32(min_length), side="left"))
+        end_row = int(np.searchsorted(self._lengths, np.int32(max_length), side="right"))
+        return first_row, end_row
+
+    def _candidates(self, key: bytes, first_row: int, end_row: int) -> np.ndarray:
+        """
+        Row ids of the synonyms in the window sharing the most of the term's rarest n-grams
+        (see `NGRAM_POSTING_BUDGET`), best first.
+        """
+        # int32 like the posting lists, or searchsorted would convert each whole list
+        window = np.array((first_row, end_row), dtype=np.int32)
+        gram_postings = []
+        for gram in _ngrams(key):
+            row_ids = self._postings.get(gram)
+            if row_ids is None:
+                continue
+            lo, hi = np.searchsorted(row_ids, window)
+            if hi > lo:
+                gram_postings.append(row_ids[lo:hi])
+        gram_postings.sort(key=len)
+        budget = NGRAM_POSTING_BUDGET
+        for count, row_ids in enumerate(gram_postings):
+            budget -= len(row_ids)
+            if budget < 0:
+                gram_postings = gram_postings[:count]
+                break
+        if not gram_postings:
+            return np.empty(0, dtype=np.int32)
+
+        row_ids, overlap = np.unique(np.concatenate(gram_postings), return_counts=True)
+        if len(row_ids) > MAX_CANDIDATES:
+            top = np.argpartition(-overlap, MAX_CANDIDATES - 1)[:MAX_CANDIDATES]
+            row_ids, overlap = row_ids[top], overlap[top]
+        return row_ids[np.argsort(-overlap, kind="stable")]
+
+    def _shared_prefix(self, key: bytes, rows: np.ndarray) -> np.ndarray:
+        """
+        Leading bytes (up to WINKLER_MAX_PREFIX) each synonym of `rows` shares with `key`.
+        Padding compares equal, which can only overstate the prefix of short keys.
+        """
+        differing = self._prefixes[rows] ^ np.uint32(_pack_prefix(key))
+        return (differing < 1 << 24).astype(np.int32) + (differing < 1 << 16) + (differing < 1 << 8) + (differing == 0)
+
+    def _score_bounds(self, key: bytes, rows) -> np.ndarray:
+        """
+        Upper bounds on the Jaro-Winkler score of `key` against the synonyms `rows` (row ids).
+
+        Jaro matches pair up equal bytes, so there are at most as many as the two byte
+        histograms have in common, and the Winkler boost needs the matching prefix.
+        """
+        lengths = np.maximum(self._lengths[rows], 1).astype(np.float64)
+        if len(key) <= MAX_HISTOGRAM_LENGTH:
+            # The term's counts fit in uint8, so capping the synonyms' counts at 255 keeps every minimum exact
+            term_counts = np.bincount(_BYTE_CLASS[np.frombuffer(key, dtype=np.uint8)], minlength=HISTOGRAM_CLASSES)
+            common = np.minimum(self._histograms[rows], term_counts.astype(np.uint8)).sum(axis=1, dtype=np.int32)
+        else:
+            common = np.minimum(lengths, len(key))
+        jaro = np.where(common > 0, (common / len(key) + common / lengths + 1.0) / 3.0, 0.0)
+
+        prefix = self._shared_prefix(key, rows)
+        boosted = jaro + prefix * WINKLER_PREFIX_SCALE * (1.0 - jaro)
+        # Small margin against rounding differences to the exact score
+        return np.where(jaro > WINKLER_BOOST_THRESHOLD, boosted, jaro) + 1e-9
+
+    def _prefix_candidates(self, key: bytes, score_cutoff: float, first_row: int, end_row: int) -> np.ndarray:
+        """
+        Row ids in the window of the synonyms that may still share `needed` pairs with
+        the term (see `_build_prefix_filter`); every other synonym provably can't reach
+        `score_cutoff`.
+
+        The term probes its rarest pairs in order. The first probe that finds a synonym
+        is their rarest pair in common, at position i in the term's ranking and j in the
+        synonym's, so at most min(len(key) - i, length - j) pairs are shared. `needed`
+        depends on the synonym's length and on how many leading bytes it shares with the
+        term (the Winkler boost).
+        """
+        term_counts = np.bincount(_BYTE_CLASS[np.frombuffer(key, dtype=np.uint8)], minlength=HISTOGRAM_CLASSES)
+        pairs = np.concatenate([
+            byte_class * (MAX_HISTOGRAM_LENGTH + 1) + np.arange(1, term_counts[byte_class] + 1)
+            for byte_class in np.flatnonzero(term_counts)
+        ])
+        pairs = pairs[np.argsort(self._pair_ranks[pairs], kind="stable")]
+        min_length = int(self._lengths[first_row])
+        # needed[length - min_length, shared prefix]
+        needed = np.array([
+            [min_common_bytes(len(key), length, score_cutoff, prefix) for prefix in range(WINKLER_MAX_PREFIX + 1)]
+            for length in range(min_length, int(self._lengths[end_row - 1]) + 1)
+        ])
+        window = np.array((first_row, end_row), dtype=np.int32)
+
+        kept = np.zeros(end_row - first_row, dtype=bool)
+        for i, pair in enumerate(pairs[:len(key) - needed.min() + 1].tolist()):
+            posting = self._prefix_postings.get(pair)
+            if posting is None:
+                continue
+            row_ids, positions = posting
+            lo, hi = np.searchsorted(row_ids, window)
+            row_ids, positions = row_ids[lo:hi], positions[lo:hi]
+            lengths = self._lengths[row_ids]
+            prefix = self._shared_prefix(key, row_ids)
+            shared = np.minimum(len(key) - i, lengths - positions)
+            kept[row_ids[shared >= needed[lengths - min_length, prefix]] - first_row] = True
+        lo, hi = np.searchsorted(self._long_rows, window)
+        kept[self._long_rows[lo:hi] - first_row] = True
+        return (np.flatnonzero(kept) + first_row).astype(np.int32)
+
+    def _bounded_rows(self, key: bytes, score_cutoff: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row ids of the synonyms whose score bound reaches `score_cutoff`, best bound first,
+        and those bounds. Only the rows of `_prefix_candidates` are bounded, except for
+        very long terms or cutoffs below `PREFIX_FILTER_CUTOFF`.
+        """
+        first_row, end_row = self._length_window(key, score_cutoff)
+        if end_row <= first_row:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        if len(key) > MAX_HISTOGRAM_LENGTH or score_cutoff < PREFIX_FILTER_CUTOFF:
+            rows = np.arange(first_row, end_row, dtype=np.int32)
+        else:
+            rows = self._prefix_candidates(key, score_cutoff, first_row, end_row)
+
+        bounds = self._score_bounds(key, rows)
+        keep = np.flatnonzero(bounds >= score_cutoff)
+        order = keep[np.argsort(-bounds[keep], kind="stable")]
+        return rows[order], bounds[order]
+
+    def may_match(self, search_term: str, score_cutoff: float) -> bool:
+        """
+        False if `find_best_match` provably finds nothing, i.e. no synonym's score bound
+        reaches `score_cutoff`. Takes one bound pass and scores nothing.
+        """
+        key = search_term.lower().encode("utf-8")
+        return bool(key) and len(self._bounded_rows(key, score_cutoff)[0]) > 0
+
+    def find_best_match(self, search_term: str, score_cutoff: float) -> Optional[Tuple[str, int, float]]:
+        """
+        Returns (matched_synonym, cid, score) for the best-scoring synonym at or above
+        `score_cutoff`, or None. Same contract as `find_cid_by_synonym_fuzzy`.
+        """
+        key = search_term.lower().encode("utf-8")
+        if not key:
+            return None
+        first_row, end_row = self._length_window(key, score_cutoff)
+        best_row, best_score = None, score_cutoff
+
+        def score_row(row_id) -> bool:
+            """Scores one synonym; returns True once nothing can beat the best match."""
+            nonlocal best_row, best_score
+            score = jaro_winkler_similarity(self._keys[row_id], key)
+            if score > best_score or (best_row is None and score >= best_score):
+                best_row, best_score = row_id, score
+            return best_score == 1.0
+
+        scored = set()
+        candidates = self._candidates(key, first_row, end_row)
+        for row_id, bound in zip(candidates.tolist(), self._score_bounds(key, candidates).tolist()):
+            # Skip candidates whose bound can't beat the best match so far
+            if bound < best_score:
+                continue
+            scored.add(row_id)
+            if score_row(row_id):
+                return self.synonyms[best_row], self.cids[best_row], best_score
+
+        # Everything the n-gram pass did not score, best bound first, until no bound can beat the best match
+        row_ids, bounds = self._bounded_rows(key, best_score)
+        for row_id, bound in zip(row_ids.tolist(), bounds.tolist()):
+            if bound < best_score:
+                break
+            if row_id not in scored and score_row(row_id):
+                break
+
+        if best_row is None:
+            return None
+        return self.synonyms[best_row], self.cids[best_row], best_score
@@ -0,0 +1,210 @@
+import json
+from typing import List, Optional
+
+import numpy as np
+
+# Node layout after flattening: every tree of a model is stored back to back in the same
+# arrays, and a leaf points to itself, so "step every row one level down" can simply
+# be repeated `max_depth` times for all trees at once.
+LEAF = -1
+
+
+def _sigmoid(margins: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-margins))
+
+
+def _softmax(margins: np.ndarray) -> np.ndarray:
+    # Same formulation as xgboost.sklearn's softmax (max-shifted, then normalized)
+    shifted = np.exp(margins - margins.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+def _margin_intercept(objective: str, base_score: np.ndarray) -> np.ndarray:
+    """Converts XGBoost's stored base_score into the margin every prediction starts from."""
+    if objective == "binary:logistic":
+        return np.log(base_score / (1.0 - base_score))
+    # Multi-class intercepts are stored as margins already
+    return base_score
+
+
+class FlatTreeEnsemble:
+    """
+    The trees of one XGBoost booster as flat NumPy arrays:
+    split feature, split threshold, left/right child, default direction and leaf value
+    per node, plus the root node and output group (class) of every tree.
+    """
+
+    def __init__(self, booster):
+        model = json.loads(booster.save_raw("json"))
+        learner = model["learner"]
+        learner_params = learner["learner_model_param"]
+        gbtree = learner["gradient_booster"]
+        if gbtree["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster type: {gbtree['name']}")
+        trees = gbtree["model"]["trees"]
+        if any(tree["categories"] for tree in trees):
+            raise ValueError("Categorical splits are not supported")
+
+        self.objective: str = learner["objective"]["name"]
+        self.n_features = int(learner_params["num_feature"])
+        self.n_groups = max(int(learner_params["num_class"]), 1)
+        base_score = np.array(json.loads(learner_params["base_score"]), dtype=np.float64).reshape(-1)
+        self.intercept = _margin_intercept(self.objective, base_score)
+
+        offsets = np.cumsum([0] + [len(tree["left_children"]) for tree in trees])
+        self.roots = offsets[:-1].astype(np.int32)
+        self.tree_groups = np.array(gbtree["model"]["tree_info"], dtype=np.intp)
+
+        left = np.concatenate([np.array(t["left_children"], dtype=np.intp) for t in trees])
+        right = np.concatenate([np.array(t["right_children"], dtype=np.intp) for t in trees])
+        is_leaf = left == LEAF
+        # XGBoost always allocates the two children of a node next to each other, which
+        # lets the traversal pick a child with `left + went_right` instead of a select
+        if not np.array_equal(right[~is_leaf], left[~is_leaf] + 1):
+            raise ValueError("Expected right children to directly follow left children")
+
+        node_offsets = np.repeat(offsets[:-1], np.diff(offsets))
+        node_ids = np.arange(len(left))
+        # A leaf is its own left child and always stays there (NaN threshold, default left)
+        self.left = np.where(is_leaf, node_ids, left + node_offsets).astype(np.int32)
+        self.feature = np.where(
+            is_leaf, 0, np.concatenate([np.array(t["split_indices"], dtype=np.intp) for t in trees])
+        ).astype(np.int32)
+        # For leaves, split_conditions hold the leaf value
+        conditions = np.concatenate([np.array(t["split_conditions"], dtype=np.float32) for t in trees])
+        self.threshold = np.where(is_leaf, np.float32(np.nan), conditions).astype(np.float32)
+        self.leaf_value = np.where(is_leaf, conditions, 0.0).astype(np.float32)
+        self.default_left = np.concatenate([np.array(t["default_left"], dtype=bool) for t in trees]) | is_leaf
+        self.max_depth = self._max_depth(trees)
+
+    @staticmethod
+    def _max_depth(trees) -> int:
+        max_depth = 0
+        for tree in trees:
+            left, right = tree["left_children"], tree["right_children"]
+            stack = [(0, 0)]
+            while stack:
+                node, depth = stack.pop()
+                if left[node] == LEAF:
+                    max_depth = max(max_depth, depth)
+                else:
+                    stack.append((left[node], depth + 1))
+                    stack.append((right[node], depth + 1))
+        return max_depth
+
+    def margins(self, features: np.ndarray) -> np.ndarray:
+        """Raw scores (before the link function), shape (N, n_groups)."""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        n_rows = features.shape[0]
+        flat_features = features.reshape(-1)
+        row_offsets = (np.arange(n_rows, dtype=np.int32) * features.shape[1])[:, None]
+
+        # nodes[i, t] is the current node of row i in tree t
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            values = flat_features[row_offsets + self.feature[nodes]]
+            # NaN compares False both ways: missing values follow the node's default direction
+            go_right = values >= self.threshold[nodes]
+            go_right |= np.isnan(values) & ~self.default_left[nodes]
+            nodes = self.left[nodes] + go_right
+
+        leaf_values = self.leaf_value[nodes]
+        margins = np.empty((n_rows, self.n_groups), dtype=np.float64)
+        for group in range(self.n_groups):
+            margins[:, group] = leaf_values[:, self.tree_groups == group].sum(axis=1, dtype=np.float64)
+        return (margins + self.intercept).astype(np.float32)
+
+
+class FlatTreeClassifier:
+    """
+    Drop-in replacement for a fitted XGBClassifier's `predict_proba`, evaluated
+    from the flattened trees instead of through a DMatrix.
+    """
+
+    def __init__(self, classifier):
+        self.ensemble = FlatTreeEnsemble(classifier.get_booster())
+        self.classes_ = classifier.classes_
+        self.n_classes_ = classifier.n_classes_
+        if self.ensemble.objective not in ("binary:logistic", "multi:softmax", "multi:softprob"):
+            raise ValueError(f"Unsupported objective: {self.ensemble.objective}")
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        margins = self.ensemble.margins(features)
+        if self.ensemble.objective == "binary:logistic":
+            positive = _sigmoid(margins[:, 0])
+            return np.vstack((1.0 - positive, positive)).T
+        return _softmax(margins)
+
+
+class FlatMultiOutputClassifier:
+    """Drop-in replacement for a fitted MultiOutputClassifier of XGBClassifiers."""
+
+    def __init__(self, multi_output_classifier):
+        self.estimators_ = [FlatTreeClassifier(estimator) for estimator in multi_output_classifier.estimators_]
+
+    def predict_proba(self, features: np.ndarray) -> List[np.ndarray]:
+        return [estimator.predict_proba(features) for estimator in self.estimators_]
+
+
+def build_flat_model(model):
+    """Flattens an XGBClassifier or a MultiOutputClassifier of them."""
+    if hasattr(model, "estimators_"):
+        return FlatMultiOutputClassifier(model)
+    return FlatTreeClassifier(model)
+
+
+def _probability_list(probabilities) -> List[np.ndarray]:
+    return probabilities if isinstance(probabilities, list) else [probabilities]
+
+
+def check_equivalence(native_model, flat_model, n_features: int, n_rows: int = 512,
+                      atol: float = 1e-5) -> Optional[str]:
+    """
+    Compares the flat model with the native one on synthetic rows (varied magnitudes,
+    zeros and missing values). Returns None if the probabilities agree within `atol`
+    and every predicted label is the same, otherwise a description of the difference.
+    """
+    rng = np.random.default_rng(0)
+    rows = rng.standard_normal((n_rows, n_features)) * 10.0 ** rng.integers(-2, 4, size=(n_rows, n_features))
+    rows[rng.random((n_rows, n_features)) < 0.05] = np.nan
+    rows[: n_rows // 16] = 0.0
+    rows = rows.astype(np.float32)
+
+    native = _probability_list(native_model.predict_proba(rows))
+    flat = _probability_list(flat_model.predict_proba(rows))
+    for i, (expected, actual) in enumerate(zip(native, flat)):
+        max_diff = float(np.max(np.abs(np.asarray(expected, dtype=np.float64) - actual)))
+        if max_diff > atol:
+            return f"output {i}: probabilities differ by up to {max_diff:.2e}"
+        if not np.array_equal(np.argmax(expected, axis=1), np.argmax(actual, axis=1)):
+            return f"output {i}: predicted labels differ"
+    return None
+
+
+if __name__ == "__main__":
+    # Equivalence check and benchmark against the native XGBoost predictor
+    import time
+
+    from app.services.predictor import get_carcinogenicity_model_data, get_route_model_data
+
+    for name, model_data in (("carcinogenicity", get_carcinogenicity_model_data()), ("route", get_route_model_data())):
+        native_model = model_data["model"]
+        start = time.perf_counter()
+        flat_model = build_flat_model(native_model)
+        print(f"\n--- {name}: flattened in {(time.perf_counter() - start) * 1000:.0f} ms ---")
+        problem = check_equivalence(native_model, flat_model, len(model_data["feature_names"]))
+        print("✅ Matches the native predictor." if problem is None else f"❌ {problem}")
+
+        rng = np.random.default_rng(1)
+        for batch_size in (1, 8, 16, 32, 1024):
+            batch = rng.standard_normal((batch_size, len(model_data["feature_names"]))).astype(np.float32)
+            repeats = max(2048 // batch_size, 5)
+            timings = []
+            for model in (native_model, flat_model):
+                model.predict_proba(batch)
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    model.predict_proba(batch)
+                timings.append((time.perf_counter() - start) / repeats * 1000)
+            print(f"batch={batch_size:>5}: native {timings[0]:8.2f} ms   flat {timings[1]:8.2f} ms   "
+                  f"({timings[0] / timings[1]:.1f}x)")
@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from app.db.session import open_db
+from app.services.descriptor_store import get_descriptor_store
+from app.services.descriptors import calculate_rdkit_descriptors, get_descriptor_engine
+from app.services.matcher import get_synonym_index, resolve_ingredients
+from app.services.ocr import get_ocr_cache, get_ocr_executor
+from app.services.predictor import (
+    get_active_models,
+    get_model_feature_names,
+    predict_carcinogenicity_batch,
+    predict_route_batch,
+)
+
+# Molecule and ingredient name used for the warmup inferences (ethanol)
+WARMUP_SMILES = "CCO"
+WARMUP_INGREDIENT = "Ethanol"
+
+
+class WarmupState:
+    """
+    Tracks the startup warmup of every component: its status
+    ("pending", "ready" or "failed"), how long it took, and the error if it failed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.components: Dict[str, dict] = {}
+
+    def start(self, names):
+        with self._lock:
+            self.started_at = time.time()
+            self.finished_at = None
+            self.components = {name: {"status": "pending"} for name in names}
+
+    def record(self, name: str, status: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.components[name] = {"status": status, "seconds": round(seconds, 3)}
+            if error is not None:
+                self.components[name]["error"] = error
+
+    def finish(self):
+        with self._lock:
+            self.finished_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot()["ready"]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = None
+            if self.started_at is not None and self.finished_at is not None:
+                total = round(self.finished_at - self.started_at, 3)
+            return {
+                "ready": total is not None and all(c["status"] == "ready" for c in self.components.values()),
+                "total_seconds": total,
+                "components": {name: dict(c) for name, c in self.components.items()},
+            }
+
+
+# --- Global Warmup State ---
+warmup_state = WarmupState()
+
+
+def _warm_up_models():
+    """Loads both models and the descriptor engine, then scores one molecule end to end."""
+    models = get_active_models()
+    for model_data in (models["carcinogenicity"], models["route"]):
+        if "error" in model_data:
+            raise RuntimeError(model_data["error"])
+    feature_names = get_model_feature_names(models)
+    get_descriptor_engine(feature_names)
+
+    descriptor_dict = calculate_rdkit_descriptors(WARMUP_SMILES, feature_names)
+    if not descriptor_dict:
+        raise RuntimeError(f"Could not calculate descriptors for {WARMUP_SMILES}")
+    if predict_carcinogenicity_batch([descriptor_dict], models["carcinogenicity"])[0] is None:
+        raise RuntimeError("Carcinogenicity warmup prediction failed")
+    if predict_route_batch([descriptor_dict], models["route"])[0] is None:
+        raise RuntimeError("Route warmup prediction failed")
+
+
+def _warm_up_ocr():
+    """Starts the OCR workers; each one loads PaddleOCR and runs a warmup pass (see OcrExecutor)."""
+    get_ocr_cache()
+    get_ocr_executor()
+
+
+def _warm_up_database():
+    """
+    Loads the in-memory reference store (or opens a DuckDB connection), the negative
+    lookup filter and the synonym index, and resolves one ingredient.
+    """
+    with open_db() as db:
+        get_synonym_index(db)
+        resolve_ingredients(db, [WARMUP_INGREDIENT])
+
+
+def _warm_up_descriptor_store():
+    """Opens the descriptor store. A missing store is fine: descriptors are then computed live."""
+    get_descriptor_store()
+
+
+WARMUP_COMPONENTS: Dict[str, Callable[[], None]] = {
+    "models": _warm_up_models,
+    "ocr": _warm_up_ocr,
+    "database": _warm_up_database,
+    "descriptor_store": _warm_up_descriptor_store,
+}
+
+
+def _run_component(name: str, warm_up: Callable[[], None]):
+    start_time = time.time()
+    try:
+        warm_up()
+        warmup_state.record(name, "ready", time.time() - start_time)
+        print(f"✅ Warmup: {name} ready in {time.time() - start_time:.2f}s.")
+    except Exception as e:
+        warmup_state.record(name, "failed", time.time() - start_time, str(e))
+        print(f"❌ Error: Warmup of {name} failed after {time.time() - start_time:.2f}s: {e}")
+
+
+def run_warmup():
+    """
+    Loads and warms up every component in parallel, then marks the application ready
+    (if all of them succeeded). Blocks until all components are done.
+    """
+    warmup_state.start(WARMUP_COMPONENTS)
+    with ThreadPoolExecutor(max_workers=len(WARMUP_COMPONENTS), thread_name_prefix="warmup") as pool:
+        for name, warm_up in WARMUP_COMPONENTS.items():
+            pool.submit(_run_component, name, warm_up)
+    warmup_state.finish()
+    snapshot = warmup_state.snapshot()
+    status = "ready" if snapshot["ready"] else "NOT ready"
+    print(f"Warmup finished in {snapshot['total_seconds']:.2f}s, application is {status}.")
+
+
+def start_warmup() -> threading.Thread:
+    """Runs `run_warmup` on a background thread, so the server can answer /ready meanwhile."""
+    thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,122 @@
+import argparse
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.crud.carciscan import get_smiles_by_cids, get_stored_predictions, resolve_ingredients_bulk
+from app.db.reader import DuckDBReader
+from app.db.reference_store import DERIVED_TABLES, REQUIRED_TABLES, ReferenceSnapshot
+from app.services.model_registry import read_current_version
+
+# Define the path to your database file
+DB_PATH = "app/db/carciscan.db"
+
+# Parallel requests compared by default
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16, 32]
+
+# Ingredient names per simulated request, about one ingredient list
+INGREDIENTS_PER_REQUEST = 8
+
+
+def _lookup(db, terms, model_version):
+    """The database work of one prediction request: resolve names, then the stored predictions and SMILES."""
+    resolved = resolve_ingredients_bulk(db, terms)
+    cids = [match[1] for match in resolved if match is not None]
+    get_stored_predictions(db, cids, model_version)
+    get_smiles_by_cids(db, cids)
+
+
+def _run(label, handle_request, workload, concurrency):
+    def timed(terms):
+        start_time = time.perf_counter()
+        handle_request(terms)
+        return time.perf_counter() - start_time
+
+    # One untimed request per thread opens the cursors / pooled connections first
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(handle_request, workload[:concurrency]))
+        start_time = time.perf_counter()
+        latencies = sorted(executor.map(timed, workload))
+        elapsed = time.perf_counter() - start_time
+
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000
+    print(f"{label:<7} {concurrency:>4} {len(workload) / elapsed:>10.1f} {p50:>9.2f} {p95:>9.2f}")
+
+
+def benchmark_db_access(db_path: str = DB_PATH, requests: int = 200, levels=None, model_version=None):
+    """
+    Compares the three ways the API can read DuckDB under parallel requests:
+
+    - orm:    a SQLAlchemy session per request from the pooled engine
+    - reader: the shared read-only DuckDBReader (a cursor per thread, prepared lookups)
+    - memory: the same reader over the in-memory reference store snapshot
+
+    Every request resolves a few real synonyms and fetches their stored predictions
+    and SMILES. Prints throughput and p50/p95 latency per concurrency level.
+    """
+    if not os.path.exists(db_path):
+        print(f"Error: Database file not found at '{db_path}'")
+        return
+
+    model_version = model_version or read_current_version()
+    reader = DuckDBReader(db_path)
+    try:
+        synonyms = [row[0] for row in reader.execute(
+            "SELECT synonyms FROM synonyms WHERE synonyms IS NOT NULL USING SAMPLE 2000 ROWS"
+        )]
+    finally:
+        reader.close()
+    rng = random.Random(0)
+    workload = [rng.sample(synonyms, min(INGREDIENTS_PER_REQUEST, len(synonyms))) for _ in range(requests)]
+    print(f"✅ {requests} requests of {INGREDIENTS_PER_REQUEST} ingredients, model version {model_version}")
+
+    # DuckDB refuses a second connection to a file with a different configuration, so the
+    # engine and the reader never stay open at the same time
+    print(f"{'access':<7} {'par':>4} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for concurrency in levels or CONCURRENCY_LEVELS:
+        engine = create_engine(f"duckdb:///{db_path}", connect_args={"read_only": True},
+                               pool_size=concurrency, max_overflow=0)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def orm_request(terms):
+            db = session_factory()
+            try:
+                _lookup(db, terms, model_version)
+            finally:
+                db.close()
+
+        try:
+            _run("orm", orm_request, workload, concurrency)
+        finally:
+            engine.dispose()
+
+        reader = DuckDBReader(db_path)
+        try:
+            _run("reader", lambda terms: _lookup(reader, terms, model_version), workload, concurrency)
+        finally:
+            reader.close()
+
+        snapshot = ReferenceSnapshot(1, None)
+        try:
+            snapshot.load(db_path, list(REQUIRED_TABLES + DERIVED_TABLES))
+            _run("memory", lambda terms: _lookup(snapshot, terms, model_version), workload, concurrency)
+        finally:
+            snapshot.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ORM sessions against the pooled DuckDB reader and the in-memory store.")
+    parser.add_argument("--db", default=DB_PATH, help=f"Path to the DuckDB database (default: {DB_PATH})")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per run (default: 200)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY_LEVELS,
+                        help=f"Parallel requests to compare (default: {' '.join(map(str, CONCURRENCY_LEVELS))})")
+    parser.add_argument("--model-version", default=None,
+                        help="Model version of the stored predictions (default: the registry's current version)")
+    args = parser.parse_args()
+    benchmark_db_access(args.db, args.requests, args.concurrency, args.model_version)
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+import duckdb
+import numpy as np
+
+from app.services.descriptor_store import (
+    STORE_DIR, META_FILE, CIDS_FILE, FEATURES_FILE, STATUS_FILE, ROW_PENDING, ROW_READY, ROW_FAILED
+)
+from app.services.descriptors import calculate_rdkit_descriptors
+from app.services.feature_aligner import FeatureAligner
+from app.services.predictor import get_model_feature_names, get_model_version
+from app.services.result_cache import database_fingerprint
+
+# Define the path to your database file
+DB_PATH = "app/db/carciscan.db"
+
+# Rows computed between two flushes of the store to disk
+CHUNK_SIZE = 2000
+
+# Set in every worker process by _init_worker
+_worker_aligner: Optional[FeatureAligner] = None
+
+
+def _init_worker(feature_names: List[str]):
+    global _worker_aligner
+    _worker_aligner = FeatureAligner(feature_names)
+
+
+def _compute_row(job: Tuple[int, str]) -> Tuple[int, Optional[np.ndarray]]:
+    """
+    Computes the preprocessed, aligned feature row for one (row, smiles) job.
+    Returns (row, None) if the SMILES can't be parsed or described.
+    """
+    row, smiles = job
+    descriptor_dict = calculate_rdkit_descriptors(smiles, _worker_aligner.feature_names)
+    if not descriptor_dict:
+        return row, None
+    features = _worker_aligner.align_one(descriptor_dict)
+    if features is None:
+        return row, None
+    return row, features[0]
+
+
+def _write_meta(store_dir: str, meta: dict):
+    with open(os.path.join(store_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def _open_store(store_dir: str, cids: np.ndarray, feature_names: List[str], meta: dict):
+    """
+    Opens the store for writing. An existing store is resumed if it was built for the
+    same CIDs and features; otherwise a new, empty store is created.
+    """
+    meta_path = os.path.join(store_dir, META_FILE)
+    shape = (len(cids), len(feature_names))
+
+    resumable = False
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        existing_cids = np.load(os.path.join(store_dir, CIDS_FILE))
+        resumable = meta.get("feature_names") == feature_names and np.array_equal(existing_cids, cids)
+
+    if resumable:
+        features = np.memmap(os.path.join(store_dir, FEATURES_FILE), dtype=np.float32, mode="r+", shape=shape)
+        status = np.memmap(os.path.join(store_dir, STATUS_FILE), dtype=np.uint8, mode="r+", shape=(len(cids),))
+        return features, status, True
+
+    os.makedirs(store_dir, exist_ok=True)
+    _write_meta(store_dir, {**meta, "complete": False})
+    np.save(os.path.join(store_dir, CIDS_FILE), cids)
+    features = np.memmap(os.path.join(store_dir, FEATURES_FILE), dtype=np.float32, mode="w+", shape=shape)
+    status = np.memmap(os.path.join(store_dir, STATUS_FILE), dtype=np.uint8, mode="w+", shape=(len(cids),))
+    status[:] = ROW_PENDING
+    status.flush()
+    return features, status, False
+
+
+def build_descriptor_store(db_path: str = DB_PATH, store_dir: str = STORE_DIR, workers: Optional[int] = None):
+    """
+    Computes model-ready descriptor rows for every CID in the `smiles` table and writes
+    them to a memory-mapped store, using all cores. Interrupted builds resume where
+    they stopped.
+    """
+    if not os.path.exists(db_path):
+        print(f"Error: Database file not found at '{db_path}'")
+        return
+
+    feature_names = get_model_feature_names()
+    if not feature_names:
+        print("Error: Could not load model feature names.")
+        return
+
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        rows = con.execute(
+            "SELECT cid, smiles FROM smiles WHERE cid IS NOT NULL AND smiles IS NOT NULL ORDER BY cid"
+        ).fetchall()
+    finally:
+        con.close()
+
+    # get_row does a binary search, so CIDs must be unique and sorted
+    smiles_by_cid = dict(rows)
+    cids = np.array(sorted(smiles_by_cid), dtype=np.int64)
+
+    # Recorded so a store can be told apart from one built for other models or data
+    meta = {
+        "feature_names": feature_names,
+        "n_rows": len(cids),
+        "model_version": get_model_version(),
+        "db_fingerprint": database_fingerprint(f"duckdb:///{db_path}"),
+    }
+    features, status, resumed = _open_store(store_dir, cids, feature_names, meta)
+    todo = np.flatnonzero(status == ROW_PENDING)
+    if resumed:
+        print(f"Resuming build: {len(cids) - len(todo)} of {len(cids)} rows already done.")
+    print(f"Computing {len(feature_names)} descriptors for {len(todo)} CIDs...")
+
+    start_time = time.time()
+    done = 0
+    with Pool(processes=workers or os.cpu_count(), initializer=_init_worker, initargs=(feature_names,)) as pool:
+        for chunk_start in range(0, len(todo), CHUNK_SIZE):
+            jobs = [(int(row), smiles_by_cid[int(cids[row])]) for row in todo[chunk_start:chunk_start + CHUNK_SIZE]]
+            for row, values in pool.imap_unordered(_compute_row, jobs, chunksize=16):
+                if values is None:
+                    status[row] = ROW_FAILED
+                else:
+                    features[row] = values
+                    status[row] = ROW_READY
+
+            # Features are flushed before status, so a row is never marked done without its data
+            features.flush()
+            status.flush()
+            done += len(jobs)
+            elapsed = time.time() - start_time
+            print(f"  {done}/{len(todo)} rows ({done / elapsed:.1f} rows/s)")
+
+    _write_meta(store_dir, {**meta, "complete": True})
+
+    failed = int(np.count_nonzero(status == ROW_FAILED))
+    print(f"✅ Descriptor store written to '{store_dir}' in {time.time() - start_time:.1f}s "
+          f"({len(cids) - failed} rows, {failed} failed).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the memory-mapped descriptor store.")
+    parser.add_argument("--db", default=DB_PATH, help=f"Path to the DuckDB database (default: {DB_PATH})")
+    parser.add_argument("--out", default=STORE_DIR, help=f"Store directory (default: {STORE_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+    build_descriptor_store(args.db, args.out, args.workers)
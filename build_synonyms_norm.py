@@ -0,0 +1,70 @@
+import argparse
+import os
+
+import duckdb
+import pandas as pd
+
+from app.services.parser import normalize_ingredient_name
+
+# Define the path to your database file
+DB_PATH = "app/db/carciscan.db"
+
+
+def build_synonyms_norm(db_path: str = DB_PATH):
+    """
+    Builds (or rebuilds) the derived `synonyms_norm` table used for exact synonym lookups.
+
+    Every synonym gets a precomputed normalized key (see `normalize_ingredient_name`)
+    and its length, and the key is indexed so that an exact lookup is a single
+    index probe instead of a scan of the synonyms table.
+    """
+    if not os.path.exists(db_path):
+        print(f"Error: Database file not found at '{db_path}'")
+        return
+
+    con = duckdb.connect(db_path)
+    try:
+        print(f"✅ Successfully connected to '{db_path}'")
+
+        rows = con.execute("SELECT synonyms, cid FROM synonyms WHERE synonyms IS NOT NULL").fetchall()
+        print(f"Normalizing {len(rows)} synonyms...")
+
+        norm_rows = pd.DataFrame(rows, columns=["synonym", "cid"])
+        norm_rows["norm_key"] = [normalize_ingredient_name(synonym) for synonym in norm_rows["synonym"]]
+        norm_rows["key_length"] = norm_rows["norm_key"].str.len()
+        norm_rows = norm_rows[norm_rows["norm_key"] != ""].drop_duplicates(["norm_key", "synonym", "cid"])
+
+        # Swap the table in a single transaction so readers never see it half-built
+        con.register("norm_rows", norm_rows)
+        con.execute("BEGIN TRANSACTION")
+        con.execute("DROP TABLE IF EXISTS synonyms_norm")
+        con.execute("""
+            CREATE TABLE synonyms_norm AS
+            SELECT
+                CAST(norm_key AS VARCHAR) AS norm_key,
+                CAST(synonym AS VARCHAR) AS synonym,
+                CAST(key_length AS INTEGER) AS key_length,
+                CAST(cid AS BIGINT) AS cid
+            FROM norm_rows
+            ORDER BY norm_key
+        """)
+        con.execute("CREATE INDEX idx_synonyms_norm_key ON synonyms_norm (norm_key)")
+        con.execute("COMMIT")
+        con.unregister("norm_rows")
+
+        count = con.execute("SELECT COUNT(*) FROM synonyms_norm").fetchone()[0]
+        distinct_keys = con.execute("SELECT COUNT(DISTINCT norm_key) FROM synonyms_norm").fetchone()[0]
+        print(f"✅ Built `synonyms_norm` with {count} rows ({distinct_keys} distinct keys).")
+
+    except duckdb.Error as e:
+        print(f"Error building `synonyms_norm`: {e}")
+    finally:
+        con.close()
+        print("🔌 Database connection closed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the normalized synonym lookup table.")
+    parser.add_argument("--db", default=DB_PATH, help=f"Path to the DuckDB database (default: {DB_PATH})")
+    args = parser.parse_args()
+    build_synonyms_norm(args.db)
@@ -0,0 +1,86 @@
+import argparse
+import hashlib
+import os
+import pickle
+import time
+
+import numpy as np
+
+from app.services.model_registry import (
+    PICKLE_PATHS, REGISTRY_DIR, activate_model_version, export_model_version, load_model_version, read_current_version
+)
+
+
+def _file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _verify(original: dict, converted: dict, n_rows: int = 256) -> bool:
+    """Checks that the converted models give exactly the same outputs as the pickles."""
+    rng = np.random.default_rng(0)
+    ok = True
+    for name in ("carcinogenicity", "route"):
+        n_features = len(original[name]["feature_names"])
+        # Random rows with a spread of magnitudes, like real descriptors
+        rows = rng.standard_normal((n_rows, n_features)) * 10.0 ** rng.integers(-2, 4, size=(n_rows, n_features))
+        for method in ("predict", "predict_proba"):
+            expected = getattr(original[name]["model"], method)(rows)
+            actual = getattr(converted[name]["model"], method)(rows)
+            if not np.array_equal(np.asarray(expected), np.asarray(actual)):
+                print(f"❌ {name}.{method} differs between the pickle and the converted model.")
+                ok = False
+    return ok
+
+
+def convert_models(registry_dir: str = REGISTRY_DIR, version: str = None, activate: bool = True):
+    """
+    Converts the pickled models into a new registry version (native XGBoost boosters
+    plus a JSON manifest), verifies it against the pickles and, optionally, activates it.
+    """
+    originals = {}
+    for name, path in PICKLE_PATHS.items():
+        if not os.path.exists(path):
+            print(f"Error: Model file not found at '{path}'")
+            return
+        with open(path, "rb") as f:
+            originals[name] = pickle.load(f)
+
+    source = {path: _file_sha256(path) for path in PICKLE_PATHS.values()}
+    if version is None:
+        version = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    version_dir = os.path.join(registry_dir, version)
+    if os.path.exists(version_dir):
+        print(f"Error: Version '{version}' already exists in '{registry_dir}'")
+        return
+
+    export_model_version(originals["carcinogenicity"], originals["route"], version_dir, version, source)
+
+    start_time = time.time()
+    converted = load_model_version(version_dir)
+    print(f"Version '{version}' written to '{version_dir}' (loads in {time.time() - start_time:.2f}s).")
+
+    if not _verify(originals, converted):
+        print("❌ Converted models do not match the pickles; not activating.")
+        return
+    print("✅ Converted models match the pickles.")
+
+    if activate:
+        previous = read_current_version(registry_dir)
+        activate_model_version(version, registry_dir)
+        print(f"✅ Activated '{version}' (was: {previous or 'none'}). Running services pick it up automatically.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the pickled models into a model registry version.")
+    parser.add_argument("--registry", default=REGISTRY_DIR, help=f"Registry directory (default: {REGISTRY_DIR})")
+    parser.add_argument("--version", default=None, help="Version name (default: current UTC timestamp)")
+    parser.add_argument("--no-activate", action="store_true", help="Write the version without pointing CURRENT at it")
+    parser.add_argument("--activate-only", default=None, metavar="VERSION",
+                        help="Only point CURRENT at an existing VERSION (e.g. to roll back)")
+    args = parser.parse_args()
+    if args.activate_only:
+        activate_model_version(args.activate_only, args.registry)
+        print(f"✅ Activated '{args.activate_only}'.")
+    else:
+        convert_models(args.registry, args.version, not args.no_activate)
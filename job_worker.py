@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.predictions import analyze_image
+from app.core.config import settings
+from app.db.reference_store import shutdown_reference_store
+from app.db.session import open_db
+from app.services.descriptors import shutdown_descriptor_pool
+from app.services.job_queue import ClaimedJob, JobQueue, create_job_queue
+from app.services.ocr import get_ocr_executor, shutdown_ocr_executor
+
+# Seconds an idle worker waits before looking for new jobs again
+POLL_INTERVAL = 0.5
+
+# Seconds between two purges of expired job results
+PURGE_INTERVAL = 600
+
+
+async def _renew_lease_loop(queue: JobQueue, job: ClaimedJob):
+    """Renews the job's lease every third of the lease time, so a slow job isn't claimed again."""
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        if not await asyncio.to_thread(queue.renew_lease, job):
+            print(f"❌ Job {job.id} lost its lease (attempt {job.attempt}).")
+            return
+
+
+async def _run_job(queue: JobQueue, job: ClaimedJob):
+    """
+    Runs one job through the same analysis as POST /predict and records the outcome.
+    Client errors (unreadable image, no ingredients) fail the job right away; server
+    errors (OCR failures) are retried. The lease is renewed while the job runs. If the
+    job was claimed again after this worker's lease ran out anyway, the outcome is
+    dropped and the other worker's attempt stands.
+    """
+    heartbeat = asyncio.create_task(_renew_lease_loop(queue, job))
+    try:
+        await _analyze_job(queue, job)
+    finally:
+        heartbeat.cancel()
+
+
+async def _analyze_job(queue: JobQueue, job: ClaimedJob):
+    start_time = time.time()
+    try:
+        with open_db() as db:
+            response = await analyze_image(job.image_bytes, db)
+        if await asyncio.to_thread(queue.complete, job, response.model_dump_json()):
+            print(f"✅ Job {job.id} done in {time.time() - start_time:.2f}s (attempt {job.attempt}).")
+        else:
+            print(f"❌ Job {job.id} finished after its lease ran out (attempt {job.attempt}), result dropped.")
+    except HTTPException as e:
+        retry = e.status_code >= 500
+        if await asyncio.to_thread(queue.fail, job, str(e.detail), retry):
+            print(f"❌ Job {job.id} failed (attempt {job.attempt}, {'will retry' if retry else 'final'}): {e.detail}")
+        else:
+            print(f"❌ Job {job.id} failed after its lease ran out (attempt {job.attempt}): {e.detail}")
+    except Exception as e:
+        if await asyncio.to_thread(queue.fail, job, f"Error during image processing: {e}", True):
+            print(f"❌ Job {job.id} failed (attempt {job.attempt}, will retry): {e}")
+        else:
+            print(f"❌ Job {job.id} failed after its lease ran out (attempt {job.attempt}): {e}")
+
+
+async def _job_loop(queue: JobQueue, worker_name: str):
+    """Claims and runs jobs one after another until cancelled."""
+    while True:
+        job = await asyncio.to_thread(queue.claim, worker_name)
+        if job is None:
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+        await _run_job(queue, job)
+
+
+async def _purge_loop(queue: JobQueue):
+    while True:
+        purged = await asyncio.to_thread(queue.purge_expired)
+        if purged:
+            print(f"Purged {purged} expired jobs.")
+        await asyncio.sleep(PURGE_INTERVAL)
+
+
+async def _run_worker(worker_name: str, concurrency: int):
+    # Each job in flight holds at most one image in this process's OCR queue. Sized to
+    # the concurrency, the queue can never be full, so no attempt is spent on a 503.
+    await asyncio.to_thread(get_ocr_executor, max(settings.OCR_QUEUE_SIZE, concurrency))
+    queue = create_job_queue()
+    try:
+        # Several jobs in flight per process let the OCR executor batch their images
+        await asyncio.gather(
+            _purge_loop(queue),
+            *(_job_loop(queue, f"{worker_name}/{i}") for i in range(concurrency))
+        )
+    finally:
+        queue.close()
+
+
+def run_worker(index: int, concurrency: int):
+    """Entry point of one worker process."""
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Job worker {index} ({worker_name}) started, running up to {concurrency} jobs at a time.")
+    try:
+        asyncio.run(_run_worker(worker_name, concurrency))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_ocr_executor()
+        shutdown_descriptor_pool()
+        shutdown_reference_store()
+        print(f"Job worker {index} stopped.")
+
+
+def run_workers(processes: int, concurrency: int):
+    """
+    Starts the worker processes and waits for them. Jobs interrupted by Ctrl+C are
+    picked up again once their lease runs out.
+    """
+    print(f"Starting {processes} job worker processes on '{settings.JOB_QUEUE_PATH}'...")
+    if processes == 1:
+        run_worker(0, concurrency)
+        return
+    # Spawned rather than forked: every worker builds its own OCR and model state
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(i, concurrency)) for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the workers of the asynchronous image job queue.")
+    parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES,
+                        help=f"Worker processes (default: {settings.JOB_WORKER_PROCESSES})")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                        help=f"Jobs run at a time per process (default: {settings.JOB_WORKER_CONCURRENCY})")
+    args = parser.parse_args()
+    run_workers(max(args.processes, 1), max(args.concurrency, 1))
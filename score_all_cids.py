@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import time
+from typing import List, Optional
+
+import duckdb
+import pandas as pd
+
+from app.core.config import settings
+from app.services.descriptor_store import get_stored_descriptors
+from app.services.descriptors import calculate_rdkit_descriptors_batch, shutdown_descriptor_pool
+from app.services.predictor import (
+    get_active_models,
+    get_model_feature_names,
+    predict_carcinogenicity_batch,
+    predict_route_batch,
+)
+
+# Define the path to your database file
+DB_PATH = "app/db/carciscan.db"
+
+# CIDs scored (and committed) per chunk
+CHUNK_SIZE = 2000
+
+# Values of predictions.status
+STATUS_OK = "ok"
+STATUS_NO_DESCRIPTORS = "no_descriptors"
+
+
+def _create_predictions_table(con: duckdb.DuckDBPyConnection):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS predictions (
+            cid BIGINT PRIMARY KEY,
+            model_version VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            carcinogenicity_group VARCHAR,
+            carcinogenicity_scores VARCHAR,
+            route_prediction VARCHAR,
+            route_scores VARCHAR,
+            scored_at TIMESTAMP NOT NULL
+        )
+    """)
+
+
+def _scores_json(confidence_scores: dict) -> str:
+    return json.dumps({str(label): float(score) for label, score in confidence_scores.items()})
+
+
+def _score_chunk(rows: List[tuple], models: dict) -> pd.DataFrame:
+    """
+    Scores one chunk of (cid, smiles) rows with both models of `models` (a bundle from
+    `get_active_models`) and returns the prediction rows.
+    CIDs whose descriptors can't be calculated are recorded as such; CIDs a model
+    failed on are left out, so they are retried by the next run.
+    """
+    model_version = models["version"]
+    feature_names = get_model_feature_names(models)
+    descriptors = [get_stored_descriptors(cid, feature_names) for cid, _ in rows]
+    misses = [i for i, stored in enumerate(descriptors) if stored is None]
+    for i, descriptor_dict in zip(misses, calculate_rdkit_descriptors_batch([rows[i][1] for i in misses], feature_names)):
+        descriptors[i] = descriptor_dict
+
+    scorable = [i for i, descriptor_dict in enumerate(descriptors) if descriptor_dict]
+    carc_predictions = predict_carcinogenicity_batch([descriptors[i] for i in scorable], models["carcinogenicity"])
+    route_predictions = predict_route_batch([descriptors[i] for i in scorable], models["route"])
+
+    records = []
+    for i, (cid, _) in enumerate(rows):
+        if not descriptors[i]:
+            records.append((cid, model_version, STATUS_NO_DESCRIPTORS, None, None, None, None))
+    for i, carc, route in zip(scorable, carc_predictions, route_predictions):
+        if carc is None or route is None:
+            continue
+        records.append((
+            rows[i][0], model_version, STATUS_OK,
+            carc["prediction"], _scores_json(carc["confidence_scores"]),
+            json.dumps(list(route["prediction"])), _scores_json(route["confidence_scores"]),
+        ))
+    return pd.DataFrame(records, columns=[
+        "cid", "model_version", "status", "carcinogenicity_group", "carcinogenicity_scores",
+        "route_prediction", "route_scores",
+    ])
+
+
+def score_all_cids(db_path: str = DB_PATH, chunk_size: int = CHUNK_SIZE, workers: Optional[int] = None):
+    """
+    Scores every CID in the `smiles` table with both models and stores the results in
+    the `predictions` table, tagged with the model version. CIDs that already have
+    predictions for the current model version are skipped, so interrupted runs resume.
+    """
+    if not os.path.exists(db_path):
+        print(f"Error: Database file not found at '{db_path}'")
+        return
+    if workers:
+        settings.DESCRIPTOR_POOL_SIZE = workers
+
+    # Keep the same models for the whole run, even if a new version is activated meanwhile
+    models = get_active_models()
+    model_version = models["version"]
+    if model_version is None:
+        print("Error: Could not load the models.")
+        return
+
+    con = duckdb.connect(db_path)
+    try:
+        print(f"✅ Successfully connected to '{db_path}'")
+        _create_predictions_table(con)
+
+        todo = [row[0] for row in con.execute("""
+            SELECT s.cid
+            FROM smiles s
+            LEFT JOIN predictions p ON p.cid = s.cid AND p.model_version = ?
+            WHERE s.cid IS NOT NULL AND s.smiles IS NOT NULL AND p.cid IS NULL
+            ORDER BY s.cid
+        """, [model_version]).fetchall()]
+        total = con.execute("SELECT COUNT(*) FROM smiles WHERE cid IS NOT NULL AND smiles IS NOT NULL").fetchone()[0]
+        print(f"Model version '{model_version}': {total - len(todo)} of {total} CIDs already scored, "
+              f"{len(todo)} to go.")
+
+        start_time = time.time()
+        done = 0
+        for chunk_start in range(0, len(todo), chunk_size):
+            chunk_cids = todo[chunk_start:chunk_start + chunk_size]
+            rows = con.execute(
+                "SELECT cid, smiles FROM smiles "
+                "WHERE cid IN (SELECT UNNEST(CAST(? AS BIGINT[]))) AND smiles IS NOT NULL ORDER BY cid",
+                [chunk_cids]
+            ).fetchall()
+
+            predictions = _score_chunk(rows, models)
+
+            # One transaction per chunk: a chunk is either fully stored or redone next run
+            con.register("chunk_predictions", predictions)
+            con.execute("BEGIN TRANSACTION")
+            con.execute("""
+                INSERT OR REPLACE INTO predictions
+                SELECT
+                    CAST(cid AS BIGINT), model_version, status, carcinogenicity_group,
+                    carcinogenicity_scores, route_prediction, route_scores, now()
+                FROM chunk_predictions
+            """)
+            con.execute("COMMIT")
+            con.unregister("chunk_predictions")
+
+            done += len(chunk_cids)
+            elapsed = time.time() - start_time
+            print(f"  {done}/{len(todo)} CIDs ({done / elapsed:.1f} CIDs/s, "
+                  f"{len(chunk_cids) - len(predictions)} failed in this chunk)")
+
+        counts = dict(con.execute(
+            "SELECT status, COUNT(*) FROM predictions WHERE model_version = ? GROUP BY status", [model_version]
+        ).fetchall())
+        print(f"✅ Scored {done} CIDs in {time.time() - start_time:.1f}s. Table `predictions` now holds "
+              f"{counts.get(STATUS_OK, 0)} predictions and {counts.get(STATUS_NO_DESCRIPTORS, 0)} "
+              f"CIDs without descriptors for '{model_version}'.")
+
+    except duckdb.Error as e:
+        print(f"Error scoring CIDs: {e}")
+    finally:
+        con.close()
+        shutdown_descriptor_pool()
+        print("🔌 Database connection closed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute model predictions for every CID.")
+    parser.add_argument("--db", default=DB_PATH, help=f"Path to the DuckDB database (default: {DB_PATH})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"CIDs per chunk (default: {CHUNK_SIZE})")
+    parser.add_argument("--workers", type=int, default=None, help="Descriptor worker processes (default: all cores)")
+    args = parser.parse_args()
+    score_all_cids(args.db, args.chunk_size, args.workers)
@@ -0,0 +1,113 @@
+# This script is for development and testing purposes.
+
+import argparse
+import sys
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.constants import IARC_EVIDENCE
+from app.db.session import SessionLocal
+from app.services.descriptors import calculate_rdkit_descriptors_batch
+from app.services.predictor import (
+    _carcinogenicity_results,
+    _route_results,
+    get_carcinogenicity_model_data,
+    get_feature_aligner,
+    get_route_model_data,
+)
+
+# Database SMILES compared by default
+SMILES_LIMIT = 2000
+
+
+def _two_pass_carcinogenicity(model, encoder, features):
+    """The original implementation: separate predict and predict_proba passes."""
+    predicted_indices = model.predict(features)
+    probability_rows = model.predict_proba(features)
+    predicted_labels = encoder.inverse_transform(predicted_indices)
+    return [
+        {
+            "prediction": label,
+            "confidence_scores": dict(zip(encoder.classes_, probabilities)),
+            "evidence": IARC_EVIDENCE.get(label, "Evidence not available."),
+        }
+        for label, probabilities in zip(predicted_labels, probability_rows)
+    ]
+
+
+def _two_pass_route(model, mlb, features):
+    """The original implementation: separate predict and predict_proba passes."""
+    predicted_matrix = model.predict(features)
+    proba_list = model.predict_proba(features)
+    predicted_routes = mlb.inverse_transform(predicted_matrix)
+    return [
+        {
+            "prediction": list(routes),
+            "confidence_scores": dict(zip(mlb.classes_, [p[row_index][1] for p in proba_list])),
+        }
+        for row_index, routes in enumerate(predicted_routes)
+    ]
+
+
+def _count_mismatches(expected, actual) -> int:
+    mismatches = 0
+    for exp, act in zip(expected, actual):
+        same = exp["prediction"] == act["prediction"] and exp.get("evidence") == act.get("evidence")
+        same = same and exp["confidence_scores"].keys() == act["confidence_scores"].keys()
+        same = same and all(
+            np.float32(exp["confidence_scores"][k]) == np.float32(act["confidence_scores"][k])
+            for k in exp["confidence_scores"]
+        )
+        if not same:
+            mismatches += 1
+    return mismatches + abs(len(expected) - len(actual))
+
+
+def check_single_pass_inference(limit: int = SMILES_LIMIT) -> bool:
+    """
+    Checks that the single-pass (predict_proba only) inference gives exactly the same
+    labels and scores as running predict and predict_proba, over real database SMILES.
+    """
+    print("--- Testing Single-Pass Inference ---")
+
+    db = SessionLocal()
+    try:
+        query = text("SELECT smiles FROM smiles WHERE smiles IS NOT NULL ORDER BY cid LIMIT :limit")
+        smiles_list = [row[0] for row in db.execute(query, {"limit": limit}).fetchall()]
+    finally:
+        db.close()
+
+    descriptor_dicts = [d for d in calculate_rdkit_descriptors_batch(smiles_list) if d]
+    print(f"Computed descriptors for {len(descriptor_dicts)} of {len(smiles_list)} SMILES.")
+
+    ok = True
+    carc = get_carcinogenicity_model_data()
+    features = get_feature_aligner(carc).align(descriptor_dicts)
+    mismatches = _count_mismatches(
+        _two_pass_carcinogenicity(carc['model'], carc['label_encoder'], features),
+        _carcinogenicity_results(carc['model'], carc['label_encoder'], features)
+    )
+    print(f"{'✅ SUCCESS' if not mismatches else '❌ FAILURE'}: carcinogenicity, {mismatches} mismatching rows.")
+    ok = ok and not mismatches
+
+    route = get_route_model_data()
+    features = get_feature_aligner(route).align(descriptor_dicts)
+    mismatches = _count_mismatches(
+        _two_pass_route(route['model'], route['multi_label_binarizer'], features),
+        _route_results(route['model'], route['multi_label_binarizer'], features)
+    )
+    print(f"{'✅ SUCCESS' if not mismatches else '❌ FAILURE'}: route, {mismatches} mismatching rows.")
+    return ok and not mismatches
+
+
+def test_single_pass_inference():
+    assert check_single_pass_inference()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare single-pass inference with predict + predict_proba.")
+    parser.add_argument("--limit", type=int, default=SMILES_LIMIT,
+                        help=f"Number of SMILES to test (default: {SMILES_LIMIT})")
+    args = parser.parse_args()
+    sys.exit(0 if check_single_pass_inference(args.limit) else 1)
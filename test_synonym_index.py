@@ -0,0 +1,140 @@
+# This script is for development and testing purposes.
+
+import random
+import sys
+import time
+
+from app.crud.carciscan import find_cid_by_synonym_fuzzy
+from app.db.reader import DuckDBReader
+from app.services.synonym_index import SynonymIndex, jaro_winkler_similarity
+
+SCORE_CUTOFF = 0.95
+
+
+def _synonym_db(rows):
+    """An in-memory DuckDB with a `synonyms` table holding `rows` of (synonym, cid)."""
+    db = DuckDBReader(":memory:", read_only=False)
+    db.execute("CREATE TABLE synonyms (cid BIGINT, synonyms VARCHAR)")
+    db.cursor().executemany("INSERT INTO synonyms VALUES (?, ?)", [(cid, synonym) for synonym, cid in rows])
+    return db
+
+
+def _same_result(expected, actual) -> bool:
+    """Same score; the synonym may differ only when several tie for the best score."""
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    return abs(expected[2] - actual[2]) < 1e-9
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if kind == 1:
+        return word[:i] + rng.choice("aeioulnrst") + word[i + 1:]
+    return word[:i] + word[i + 1:]
+
+
+def _random_names(count: int, rng: random.Random) -> list:
+    """`count` distinct chemical-like names built from common name parts."""
+    parts = ["methyl", "ethyl", "propyl", "chloro", "hydroxy", "benzo", "phenyl", "amino", "acid",
+             "sodium", "glycol", "oxide", "ate", "ene", "ol", "yl", "di", "tri", "iso", " ", "-"]
+    names = set()
+    while len(names) < count:
+        name = "".join(rng.choice(parts) for _ in range(rng.randint(2, 6))).strip()
+        if name:
+            names.add(name)
+    return sorted(names)
+
+
+def test_index_finds_match_past_the_ngram_candidates():
+    """A close match with little n-gram overlap, behind many decoys with more overlap but lower scores."""
+    term, target = "methylchloroisothiazolinone", "methylcholroisothizaolinone"
+    rng = random.Random(0)
+    decoys = set()
+    while len(decoys) < 300:
+        i = rng.randrange(1, len(term))
+        decoy = term[:i] + "".join(rng.choice("qxzjkvw") for _ in range(rng.randint(4, 7))) + term[i:]
+        if jaro_winkler_similarity(decoy.encode(), term.encode()) < 0.94:
+            decoys.add(decoy)
+    rows = [(decoy, 1000 + i) for i, decoy in enumerate(sorted(decoys))] + [(target, 1)]
+
+    db = _synonym_db(rows)
+    try:
+        expected = find_cid_by_synonym_fuzzy(db, term, SCORE_CUTOFF)
+    finally:
+        db.close()
+    actual = SynonymIndex(rows).find_best_match(term, SCORE_CUTOFF)
+    assert expected is not None and expected[1] == 1
+    assert actual is not None and actual[:2] == (target, 1)
+    assert _same_result(expected, actual)
+    print("✅ SUCCESS: the index found the match the n-gram candidates missed.")
+
+
+def test_index_matches_sql_scan():
+    """Random typos of random chemical-like names give the same result as the DuckDB scan."""
+    rng = random.Random(42)
+    names = _random_names(2500, rng)
+    rows = [(name, cid) for cid, name in enumerate(names)]
+    index = SynonymIndex(rows)
+
+    db = _synonym_db(rows)
+    mismatches = 0
+    try:
+        for _ in range(300):
+            name = rng.choice(names)
+            term = _typo(name, rng) if len(name) > 3 and rng.random() < 0.8 else name
+            for cutoff in (0.85, SCORE_CUTOFF):
+                expected = find_cid_by_synonym_fuzzy(db, term, cutoff)
+                actual = index.find_best_match(term, cutoff)
+                if not _same_result(expected, actual):
+                    mismatches += 1
+                    print(f"❌ FAILURE: '{term}' at {cutoff}: SQL {expected}, index {actual}")
+    finally:
+        db.close()
+    assert mismatches == 0
+    print("✅ SUCCESS: the index matches the SQL scan on 600 lookups.")
+
+
+def test_lookup_cost_does_not_follow_the_table_size():
+    """
+    Lookups bound only a small share of their length window, so an 8x larger table
+    costs far less than 8x per lookup.
+    """
+    timings, shares = [], []
+    for count in (5000, 40000):
+        rng = random.Random(7)
+        names = _random_names(count, rng)
+        index = SynonymIndex([(name, cid) for cid, name in enumerate(names)])
+        terms = [_typo(rng.choice(names), rng) for _ in range(200)] + ["net wt 100ml"] * 20
+
+        window, bounded = 0, 0
+        for term in terms:
+            key = term.lower().encode("utf-8")
+            first_row, end_row = index._length_window(key, SCORE_CUTOFF)
+            window += end_row - first_row
+            bounded += len(index._prefix_candidates(key, SCORE_CUTOFF, first_row, end_row))
+        shares.append(bounded / window)
+
+        best = float("inf")
+        for _ in range(3):
+            start_time = time.perf_counter()
+            for term in terms:
+                index.find_best_match(term, SCORE_CUTOFF)
+            best = min(best, time.perf_counter() - start_time)
+        timings.append(best / len(terms))
+        print(f"{count} synonyms: {bounded / window:.1%} of the window bounded, {best / len(terms) * 1000:.2f} ms per lookup")
+
+    assert max(shares) < 0.15
+    assert timings[1] < 4 * timings[0]
+    print("✅ SUCCESS: the lookup cost grows well below the table size.")
+
+
+if __name__ == "__main__":
+    try:
+        test_index_finds_match_past_the_ngram_candidates()
+        test_index_matches_sql_scan()
+        test_lookup_cost_does_not_follow_the_table_size()
+    except AssertionError:
+        sys.exit(1)